@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+ Project     : The poorman's data logger.
+ File        : benchmarks/bench_channels.py
+ Description : Cost of decoding and storing a chunk of samples with 1 to 8
+               channels (ascii lines and binary frames, then
+               RingBuffer.extend), as done by DataThread and update_data.
+
+ Usage       : python3 benchmarks/bench_channels.py [samples per chunk]
+"""
+
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from tools.ringbuffer import RingBuffer     # noqa: E402
+from tools.decoders import (AsciiDecoder, FrameDecoder,  # noqa: E402
+                            encode_frame, FRAME_SAMPLES)
+
+CHANNELS = [1, 2, 4, 8]
+
+
+def ascii_chunk(values):
+    """ lines as sent by the sketch """
+    return b''.join((','.join(map(str, row)) + '\r\n').encode('ascii')
+                    for row in values.tolist())
+
+
+def binary_chunk(values):
+    """ frames holding whole samples, as sent by the sketch """
+    per_frame = FRAME_SAMPLES // values.shape[1]
+    return b''.join(encode_frame(seq, values[start:start + per_frame]
+                                 .ravel().tolist())
+                    for seq, start in enumerate(range(0, len(values),
+                                                      per_frame)))
+
+
+def bench(decoder, raw, buf, repeat):
+    """ seconds per chunk, decoding and storing """
+    start = time.perf_counter()
+    for _ in range(repeat):
+        buf.extend(decoder.feed(raw))
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    samples = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    rng = np.random.default_rng(0)
+    print(f"{samples} samples per chunk")
+    print(f"{'channels':>8} {'ascii (us)':>11} {'us/sample':>10} "
+          f"{'binary (us)':>12} {'us/sample':>10}")
+    for channels in CHANNELS:
+        values = rng.integers(0, 1024, (samples, channels))
+        row = [f"{channels:>8}"]
+        for decoder, raw in ((AsciiDecoder(channels), ascii_chunk(values)),
+                             (FrameDecoder(channels), binary_chunk(values))):
+            buf = RingBuffer(100000, channels=channels)
+            check = decoder.feed(raw)
+            assert np.array_equal(check.reshape(-1, channels), values)
+            seconds = bench(decoder, raw, buf, 200)
+            row.append(f"{seconds * 1e6:>11.0f} "
+                       f"{seconds * 1e6 / samples:>10.3f}")
+        print(' '.join(row))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+ Project     : The poorman's data logger.
+ File        : benchmarks/bench_envelope.py
+ Description : Cost of the min/max envelope drawn by plot_data, computed
+               from scratch (zoom) and after a chunk of new samples
+               (live update), for buffer sizes from 100k to 10M.
+
+ Usage       : python3 benchmarks/bench_envelope.py [pixels]
+"""
+
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from tools.ringbuffer import RingBuffer     # noqa: E402
+from tools.envelope import EnvelopeDecimator     # noqa: E402
+
+SIZES = [100000, 1000000, 10000000]
+# samples per chunk, 20 ms at 50k samples/s
+CHUNK = 1000
+
+
+def main():
+    pixels = int(sys.argv[1]) if len(sys.argv) > 1 else 1920
+    rng = np.random.default_rng(0)
+    print(f"{pixels} pixels")
+    print(f"{'size':>10} {'points':>7} {'scratch (ms)':>13} "
+          f"{'update (ms)':>12}")
+    for size in SIZES:
+        buf = RingBuffer(size)
+        buf.extend(rng.normal(size=size))
+        envelope = EnvelopeDecimator()
+        start = time.perf_counter()
+        x, _ = envelope.decimate(buf, 0, size, pixels)
+        scratch = time.perf_counter() - start
+        chunk = rng.normal(size=CHUNK)
+        start = time.perf_counter()
+        for _ in range(100):
+            buf.extend(chunk)
+            envelope.decimate(buf, 0, size, pixels)
+        update = (time.perf_counter() - start) / 100
+        print(f"{size:>10} {len(x):>7} {scratch * 1000:>13.2f} "
+              f"{update * 1000:>12.3f}")
+
+
+if __name__ == '__main__':
+    main()
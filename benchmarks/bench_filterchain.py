@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+ Project     : The poorman's data logger.
+ File        : benchmarks/bench_filterchain.py
+ Description : Throughput of every filter chain stage (tools/filterchain.py)
+               for chunks of 1 to 10000 samples, 2 channels, checking that
+               the output doesn't depend on the chunk size.
+
+ Usage       : python3 benchmarks/bench_filterchain.py
+"""
+
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from tools.filterchain import (FilterChain, MovingAverage,  # noqa: E402
+                               LowPass, RunningMedian, Decimate, Polynomial)
+
+CHUNKS = [1, 20, 1000, 10000]
+SAMPLES = 100000
+STAGES = [('average 16', lambda: MovingAverage(16)),
+          ('low-pass', lambda: LowPass(0.05)),
+          ('median 9', lambda: RunningMedian(9)),
+          ('decimate 10', lambda: Decimate(10)),
+          ('polynomial 3', lambda: Polynomial([0.1, 5 / 1024, 1e-6, 1e-9]))]
+
+
+def run(stage, values, chunk):
+    """ (output, samples per second) """
+    chain = FilterChain([stage()])
+    # fewer samples for tiny chunks, one Python call each
+    values = values[:max(chunk * 2000, min(len(values), chunk * 10))]
+    start = time.perf_counter()
+    out = [chain.process(values[pos:pos + chunk])
+           for pos in range(0, len(values), chunk)]
+    seconds = time.perf_counter() - start
+    return np.concatenate(out), len(values) / seconds
+
+
+def main():
+    values = np.random.default_rng(0).integers(0, 1024, (SAMPLES, 2)) \
+        .astype(float)
+    print('samples/s for chunks of ' + ', '.join(map(str, CHUNKS)))
+    print(f"{'stage':>12} " + ' '.join(f'{chunk:>12}' for chunk in CHUNKS))
+    for name, stage in STAGES:
+        reference = FilterChain([stage()]).process(values)
+        rates = []
+        for chunk in CHUNKS:
+            out, rate = run(stage, values, chunk)
+            assert out.tobytes() == reference[:len(out)].tobytes()
+            rates.append(rate)
+        print(f"{name:>12} " + ' '.join(f'{rate:>12,.0f}' for rate in rates))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+ Project     : The poorman's data logger.
+ File        : benchmarks/bench_filters.py
+ Description : Throughput of the datafilter applied to chunks of samples:
+               scalar filter called for every sample (former
+               filter_values), scalar filter wrapped with np.vectorize and
+               array filter (tools/arrayfilter.py).
+
+ Usage       : python3 benchmarks/bench_filters.py [samples per chunk]
+"""
+
+import os
+import sys
+import time
+import warnings
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from tools.arrayfilter import make_transform     # noqa: E402
+from tools.datafilters import datafilter     # noqa: E402
+
+
+def scalar_filter(value):
+    """ shipped filter written for single values (float() fails on
+        arrays)
+    """
+    return float(value) * 5 / 1024
+
+
+def per_sample(values):
+    """ former filter_values """
+    return np.array([scalar_filter(value) for value in values])
+
+
+def bench(function, values, repeat):
+    """ samples per second """
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function(values)
+    return repeat * len(values) / (time.perf_counter() - start)
+
+
+def main():
+    samples = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    values = np.random.default_rng(0).integers(0, 1024, samples) \
+        .astype(float)
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        wrapped = make_transform(scalar_filter)
+    array = make_transform(datafilter)
+    assert np.allclose(per_sample(values), wrapped(values))
+    assert np.allclose(per_sample(values), array(values))
+    print(f"{samples} samples per chunk")
+    print(f"{'filter':>12} {'samples/s':>14} {'speedup':>8}")
+    base = None
+    for name, function in (('per sample', per_sample),
+                           ('vectorize', wrapped), ('array', array)):
+        rate = bench(function, values, max(1, 2000000 // samples))
+        base = base or rate
+        print(f"{name:>12} {rate:>14,.0f} {rate / base:>8.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+ Project     : The poorman's data logger.
+ File        : benchmarks/bench_lfdfile.py
+ Description : Save/load times of .lfd files and csv export, using the
+               data/test*.lfd fixtures repeated up to 10M samples.
+               The former per-line code is timed as a reference (up to
+               --legacy-max samples) and its output is compared byte
+               for byte with the new one.
+
+ Usage       : python3 benchmarks/bench_lfdfile.py [--legacy-max N]
+"""
+
+import argparse
+import glob
+import os
+import sys
+import tempfile
+import time
+import numpy as np
+
+ROOT = os.path.join(os.path.dirname(__file__), '..')
+sys.path.insert(0, ROOT)
+from tools.lfdfile import (load_v1, save_v1, save_csv, save_v2,   # noqa
+                           load_v2)
+
+SIZES = [1000, 10000, 100000, 1000000, 10000000]
+
+
+def legacy_save_v1(filename, data, meta):
+    """ former savefile code """
+    with open(filename, 'w') as file:
+        file.write('Datalogger v1.0\r\n')
+        file.write(meta['title'] + '\r\n')
+        file.write(str(meta['buffersize']) + '\r\n')
+        file.write(str(meta['sample_val']) + ',' + meta['unit'] + '\r\n')
+        file.write(str(meta['pmin']) + ',' + str(meta['pmax']) + '\r\n')
+        for n in range(0, meta['buffersize']):
+            file.write(str(data[n]) + '\r\n')
+
+
+def legacy_save_csv(filename, data):
+    """ former csv export """
+    with open(filename, 'w+') as file:
+        file.write("Samples,Values" + '\r\n')
+        for n in range(0, len(data)):
+            file.write(str(n) + ',' + str(data[n]) + '\r\n')
+
+
+def legacy_load_v1(filename):
+    """ former loadfile code """
+    with open(filename, 'r') as file:
+        for _ in range(2):
+            file.readline()
+        buffersize = int(file.readline().strip())
+        file.readline()
+        file.readline()
+        data = np.zeros((buffersize,))
+        for n in range(0, buffersize):
+            data[n] = float(file.readline())
+    return data
+
+
+def timeit(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start, result
+
+
+def same_file(name1, name2):
+    with open(name1, 'rb') as f1, open(name2, 'rb') as f2:
+        return f1.read() == f2.read()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--legacy-max', type=int, default=1000000)
+    args = parser.parse_args()
+
+    fixtures = sorted(glob.glob(os.path.join(ROOT, 'data', 'test*.lfd')))
+    meta, _ = load_v1(fixtures[0])
+    source = np.concatenate([load_v1(name)[1] for name in fixtures])
+    tmp = tempfile.mkdtemp()
+    new, old = os.path.join(tmp, 'new'), os.path.join(tmp, 'old')
+
+    print(f"{'size':>9} {'op':<9} {'new (s)':>9} {'legacy (s)':>11} "
+          f"{'same':>5}")
+    for size in SIZES:
+        data = np.resize(source, size)
+        meta['buffersize'] = size
+        legacy = size <= args.legacy_max
+        rows = []
+
+        t_new, _ = timeit(save_v1, new + '.lfd', data, meta)
+        t_old = same = ''
+        if legacy:
+            t_old, _ = timeit(legacy_save_v1, old + '.lfd', data, meta)
+            same = same_file(new + '.lfd', old + '.lfd')
+        rows.append(('save v1', t_new, t_old, same))
+
+        t_new, (_, loaded) = timeit(load_v1, new + '.lfd')
+        t_old = same = ''
+        if legacy:
+            t_old, ref = timeit(legacy_load_v1, old + '.lfd')
+            same = bool((loaded == ref).all())
+        rows.append(('load v1', t_new, t_old, same))
+
+        t_new, _ = timeit(save_csv, new + '.csv', data)
+        t_old = same = ''
+        if legacy:
+            t_old, _ = timeit(legacy_save_csv, old + '.csv', data)
+            same = same_file(new + '.csv', old + '.csv')
+        rows.append(('save csv', t_new, t_old, same))
+
+        t_new, _ = timeit(save_v2, new + '.lfd2', data, meta)
+        rows.append(('save v2', t_new, '', ''))
+        t_new, (_, loaded) = timeit(load_v2, new + '.lfd2', False)
+        rows.append(('load v2', t_new, '', bool((loaded == data).all())))
+
+        for op, t_new, t_old, same in rows:
+            t_old = f'{t_old:.3f}' if t_old != '' else '-'
+            print(f"{size:>9} {op:<9} {t_new:>9.3f} {t_old:>11} "
+                  f"{str(same):>5}")
+
+    for name in os.listdir(tmp):
+        os.remove(os.path.join(tmp, name))
+    os.rmdir(tmp)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+ Project     : The poorman's data logger.
+ File        : benchmarks/bench_pyramid.py
+ Description : Cost of a zoomed out view of a recording read from its level
+               of detail pyramid, against the min/max envelope computed
+               from the samples, for recordings from 1M to 100M samples.
+
+ Usage       : python3 benchmarks/bench_pyramid.py [pixels]
+"""
+
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from tools.ringbuffer import RingBuffer     # noqa: E402
+from tools.envelope import EnvelopeDecimator     # noqa: E402
+from tools.pyramid import LodPyramid     # noqa: E402
+
+SIZES = [1000000, 10000000, 100000000]
+# samples per extend() call when building the pyramid
+CHUNK = 1000000
+
+
+def timed(function, repeat):
+    """ seconds per call """
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    pixels = int(sys.argv[1]) if len(sys.argv) > 1 else 1920
+    rng = np.random.default_rng(0)
+    print(f"{pixels} pixels")
+    print(f"{'size':>10} {'build (s)':>10} {'envelope (ms)':>14} "
+          f"{'pyramid (ms)':>13} {'pyramid zoom (ms)':>18}")
+    for size in SIZES:
+        buf = RingBuffer(size)
+        pyramid = LodPyramid()
+        start = time.perf_counter()
+        for _ in range(size // CHUNK):
+            chunk = rng.normal(size=CHUNK)
+            buf.extend(chunk)
+            pyramid.extend(chunk)
+        build = time.perf_counter() - start
+        # whole recording, then a tenth of it in the middle
+        envelope = timed(lambda: EnvelopeDecimator().decimate(
+            buf, 0, size, pixels), 1)
+        full = timed(lambda: EnvelopeDecimator().decimate(
+            buf, 0, size, pixels, pyramid=pyramid), 20)
+        zoom = timed(lambda: EnvelopeDecimator().decimate(
+            buf, size * 0.45, size * 0.55, pixels, pyramid=pyramid), 20)
+        print(f"{size:>10} {build:>10.2f} {envelope * 1000:>14.1f} "
+              f"{full * 1000:>13.2f} {zoom * 1000:>18.2f}")
+
+
+if __name__ == '__main__':
+    main()
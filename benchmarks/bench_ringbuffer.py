@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+ Project     : The poorman's data logger.
+ File        : benchmarks/bench_ringbuffer.py
+ Description : Appends per second of RingBuffer versus the former
+               shift-left array, for buffer sizes from 1k to 10M.
+
+ Usage       : python3 benchmarks/bench_ringbuffer.py [duration]
+"""
+
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from tools.ringbuffer import RingBuffer     # noqa: E402
+
+SIZES = [1000, 10000, 100000, 1000000, 10000000]
+
+
+def bench_shift(size, duration):
+    """ former update_data behaviour """
+    data = np.zeros((size,))
+    count = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < duration:
+        data[:-1] = data[1:]
+        data[-1] = 1.0
+        count += 1
+    return count / (time.perf_counter() - start)
+
+
+def bench_ring(size, duration):
+    """ RingBuffer.append """
+    data = RingBuffer(size)
+    count = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < duration:
+        data.append(1.0)
+        count += 1
+    return count / (time.perf_counter() - start)
+
+
+def main():
+    duration = float(sys.argv[1]) if len(sys.argv) > 1 else 0.5
+    print(f"{'size':>10} {'shift-left/s':>15} {'ring/s':>15} {'speedup':>9}")
+    for size in SIZES:
+        shift = bench_shift(size, duration)
+        ring = bench_ring(size, duration)
+        print(f"{size:>10} {shift:>15.0f} {ring:>15.0f} {ring / shift:>8.1f}x")
+
+
+if __name__ == '__main__':
+    main()
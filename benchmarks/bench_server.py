@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+ Project     : The poorman's data logger.
+ File        : benchmarks/bench_server.py
+ Description : Load generator for server.py over loopback: N concurrent
+               clients polling (send) and/or streaming, with throughput,
+               latency percentiles, errors and server CPU.
+
+               poll   latency is the send -> reply round trip
+               stream latency is reception time - sample timestamp
+                      (batching included), gaps are samples missing
+                      from the requested period grid
+
+ Usage       : python3 benchmarks/bench_server.py [--clients 100]
+                   [--mode poll|stream|mixed] [--poll-rate 100]
+                   [--period 0.001] [--server-rate 1000] [--duration 10]
+                   [--no-spawn --server-pid PID]
+               By default server.py is started (and stopped) with
+               --rate server-rate; server CPU is read from /proc (Linux).
+"""
+
+import argparse
+import asyncio
+import os
+import signal
+import subprocess
+import sys
+import time
+import numpy as np
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+from tools.netprotocol import (command, split_samples, FrameReader,  # noqa
+                               SAMPLES)
+
+HOST, PORT = 'localhost', 5500
+
+
+class Results():
+    """ measures of every client """
+
+    def __init__(self):
+        self.latencies = {'poll': [], 'stream': []}
+        self.samples = {'poll': 0, 'stream': 0}
+        self.gaps = 0
+        self.errors = {}
+
+    def error(self, e):
+        name = type(e).__name__
+        self.errors[name] = self.errors.get(name, 0) + 1
+
+
+async def receive_samples(reader, frames):
+    """ next (times, values) received, None if the connection closed """
+    while True:
+        data = await reader.read(65536)
+        if not data:
+            return None
+        chunks = [split_samples(body) for kind, body in frames.feed(data)
+                  if kind == SAMPLES]
+        if chunks:
+            return (np.concatenate([chunk[0] for chunk in chunks]),
+                    np.concatenate([chunk[1] for chunk in chunks]))
+
+
+async def poll_client(results, rate, end):
+    """ send/reply at rate requests per second until end """
+    reader, writer = await asyncio.open_connection(HOST, PORT)
+    frames = FrameReader()
+    period = 1 / rate
+    deadline = time.monotonic()
+    try:
+        while time.monotonic() < end:
+            start = time.perf_counter()
+            writer.write(command("send"))
+            reply = await receive_samples(reader, frames)
+            if reply is None:
+                raise ConnectionResetError('closed by server')
+            results.latencies['poll'].append(time.perf_counter() - start)
+            results.samples['poll'] += len(reply[1])
+            # fixed timeline, no catch up burst when late
+            deadline = max(deadline + period, time.monotonic())
+            await asyncio.sleep(deadline - time.monotonic())
+        writer.write(command("close"))
+    finally:
+        writer.close()
+
+
+async def stream_client(results, period, server_rate, end):
+    """ stream at period until end """
+    reader, writer = await asyncio.open_connection(HOST, PORT)
+    frames = FrameReader()
+    spacing = max(1, round(period * server_rate)) / server_rate
+    last = None
+    latencies = []
+    try:
+        writer.write(command(f"stream {period}"))
+        while time.monotonic() < end:
+            try:
+                reply = await asyncio.wait_for(
+                    receive_samples(reader, frames), end - time.monotonic())
+            except asyncio.TimeoutError:
+                break
+            if reply is None:
+                raise ConnectionResetError('closed by server')
+            times, values = reply
+            latencies.append(time.time() - times)
+            results.samples['stream'] += len(values)
+            if last is not None:
+                times = np.concatenate(([last], times))
+            results.gaps += int((np.round(np.diff(times) / spacing)
+                                 - 1).clip(0).sum())
+            last = times[-1]
+        writer.write(command("close"))
+    finally:
+        writer.close()
+        if latencies:
+            results.latencies['stream'].append(np.concatenate(latencies))
+
+
+async def guarded(results, client):
+    try:
+        await client
+    except (OSError, ValueError) as e:
+        results.error(e)
+
+
+async def run(args, results):
+    end = time.monotonic() + args.duration
+    clients = []
+    for index in range(args.clients):
+        stream = args.mode == 'stream' or \
+            (args.mode == 'mixed' and index % 2)
+        if stream:
+            client = stream_client(results, args.period, args.server_rate,
+                                   end)
+        else:
+            client = poll_client(results, args.poll_rate, end)
+        clients.append(guarded(results, client))
+    await asyncio.gather(*clients)
+
+
+def cpu_time(pid):
+    """ user + system time of a process (Linux), None if unknown """
+    try:
+        with open(f'/proc/{pid}/stat') as file:
+            fields = file.read().rsplit(')', 1)[1].split()
+    except OSError:
+        return None
+    return (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+
+
+def percentiles(values):
+    if not len(values):
+        return 'n/a'
+    p50, p99, p999 = np.percentile(values, [50, 99, 99.9]) * 1000
+    return f'p50 {p50:.2f} ms, p99 {p99:.2f} ms, p999 {p999:.2f} ms'
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Load generator for server.py over loopback: N "
+                    "concurrent clients polling (send) and/or streaming, "
+                    "with throughput, latency percentiles, errors and "
+                    "server CPU.")
+    parser.add_argument('--clients', type=int, default=100)
+    parser.add_argument('--mode', choices=('poll', 'stream', 'mixed'),
+                        default='mixed')
+    parser.add_argument('--poll-rate', type=float, default=100,
+                        help="requests per second and poll client")
+    parser.add_argument('--period', type=float, default=0.001,
+                        help="stream period (seconds)")
+    parser.add_argument('--server-rate', type=float, default=1000)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--no-spawn', action='store_true')
+    parser.add_argument('--server-pid', type=int)
+    args = parser.parse_args()
+
+    server = None
+    pid = args.server_pid
+    if not args.no_spawn:
+        server = subprocess.Popen([sys.executable, 'server.py', '--rate',
+                                   str(args.server_rate)], cwd=ROOT,
+                                  stdout=subprocess.DEVNULL)
+        pid = server.pid
+        time.sleep(1)
+    results = Results()
+    try:
+        cpu_start = cpu_time(pid) if pid else None
+        own_start = time.process_time()
+        start = time.perf_counter()
+        asyncio.run(run(args, results))
+        elapsed = time.perf_counter() - start
+        cpu_end = cpu_time(pid) if pid else None
+        own_cpu = (time.process_time() - own_start) / elapsed
+    finally:
+        if server is not None:
+            server.send_signal(signal.SIGINT)
+            server.wait()
+
+    print(f'{args.clients} clients ({args.mode}), {elapsed:.1f} s')
+    for mode in ('poll', 'stream'):
+        if results.samples[mode] or results.latencies[mode]:
+            latencies = results.latencies[mode]
+            if mode == 'stream':
+                latencies = np.concatenate(latencies) if latencies else []
+            print(f'{mode:>6}: {results.samples[mode] / elapsed:10.0f} '
+                  f'samples/s, latency {percentiles(latencies)}')
+    print(f'errors: {results.errors or "none"}, stream gaps: '
+          f'{results.gaps} samples')
+    if cpu_start is not None and cpu_end is not None:
+        print(f'server cpu: {100 * (cpu_end - cpu_start) / elapsed:.0f} %',
+              end='')
+    else:
+        print('server cpu: n/a', end='')
+    print(f', load generator cpu: {100 * own_cpu:.0f} %')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+ Project     : The poorman's data logger.
+ File        : benchmarks/bench_stats.py
+ Description : compute_stats (numpy) against the former statistics
+               module code, with a check that both agree.
+
+ Usage       : python3 benchmarks/bench_stats.py
+"""
+
+import os
+import sys
+import time
+from statistics import fmean, median, pstdev, pvariance
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from tools.stats import compute_stats     # noqa: E402
+
+SIZES = [1000, 10000, 100000, 1000000]
+
+
+def legacy_stats(data):
+    """ former StatsDialog.update computations """
+    meanval = fmean(data)
+    return {'mean': meanval, 'median': median(data),
+            'variance': pvariance(data, mu=meanval),
+            'stdev': pstdev(data, mu=meanval)}
+
+
+def main():
+    rng = np.random.default_rng(0)
+    compute_stats(np.ones(10))      # warm up
+    print(f"{'size':>9} {'statistics (s)':>15} {'numpy (s)':>10} "
+          f"{'speedup':>8} {'max rel. error':>15}")
+    for size in SIZES:
+        # 10 bits converter values, as the default filter gives
+        data = rng.integers(0, 1024, size) * 5 / 1024
+        start = time.perf_counter()
+        ref = legacy_stats(data)
+        t_old = time.perf_counter() - start
+        start = time.perf_counter()
+        new = compute_stats(data)
+        t_new = time.perf_counter() - start
+        error = max(abs(new[key] - ref[key]) / abs(ref[key]) for key in ref)
+        print(f"{size:>9} {t_old:>15.3f} {t_new:>10.4f} "
+              f"{t_old / t_new:>7.0f}x {error:>15.2e}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+ Project     : The poorman's data logger.
+ File        : benchmarks/bench_tcp.py
+ Description : Stress test of the framed TCP stream: server.py streams
+               samples over loopback, the client reassembles frames from
+               randomly sized reads and checks that nothing is lost,
+               duplicated or garbled (timestamps on the period grid,
+               10 bits values).
+
+ Usage       : python3 benchmarks/bench_tcp.py [--rate 200000]
+                   [--duration 5] [--no-spawn]
+               --no-spawn uses a server.py already listening on
+               localhost:5500 (started with the same --rate).
+"""
+
+import argparse
+import os
+import random
+import signal
+import socket
+import subprocess
+import sys
+import time
+import numpy as np
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+from tools.netprotocol import (command, split_samples, FrameReader,  # noqa
+                               SAMPLES)
+
+HOST, PORT = 'localhost', 5500
+
+
+def connect(timeout=5.0):
+    """ connect, retrying while the server starts """
+    end = time.monotonic() + timeout
+    while True:
+        try:
+            return socket.create_connection((HOST, PORT))
+        except ConnectionRefusedError:
+            if time.monotonic() > end:
+                raise
+            time.sleep(0.1)
+
+
+def run(rate, duration):
+    """ stream for duration seconds, return (times, values, reads) """
+    period = 1 / rate
+    sock = connect()
+    sock.sendall(command(f"stream {period}"))
+    reader = FrameReader()
+    times, values = [], []
+    reads = 0
+    rng = random.Random(0)
+    end = time.monotonic() + duration
+    while time.monotonic() < end:
+        # random sizes so that frames are split anywhere
+        data = sock.recv(rng.choice((1, 7, 100, 1500, 65536)))
+        if not data:
+            break
+        reads += 1
+        for kind, body in reader.feed(data):
+            if kind == SAMPLES:
+                chunk_times, chunk_values = split_samples(body)
+                times.append(chunk_times)
+                values.append(chunk_values)
+    sock.sendall(command("close"))
+    sock.close()
+    return np.concatenate(times), np.concatenate(values), reads
+
+
+def check(times, values, rate):
+    """ list of problems found """
+    period = 1 / rate
+    errors = []
+    steps = np.round(np.diff(times) / period)
+    if (steps != 1).any():
+        errors.append(f'{int((steps > 1).sum())} gaps, '
+                      f'{int((steps < 1).sum())} duplicated/out of order')
+    # absolute error: doubles hold epoch times to ~0.2 us only
+    grid = times[0] + np.arange(len(times)) * period
+    if (np.abs(times - grid) > period / 4).any():
+        errors.append('timestamps off the period grid')
+    if ((values < 0) | (values > 1023) | (values != np.round(values))).any():
+        errors.append('garbled values')
+    return errors
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Stress test of the framed TCP stream of server.py "
+                    "over loopback: nothing lost, duplicated or garbled.")
+    parser.add_argument('--rate', type=float, default=200000)
+    parser.add_argument('--duration', type=float, default=5)
+    parser.add_argument('--no-spawn', action='store_true')
+    args = parser.parse_args()
+
+    server = None
+    if not args.no_spawn:
+        server = subprocess.Popen([sys.executable, 'server.py',
+                                   '--rate', str(args.rate)], cwd=ROOT,
+                                  stdout=subprocess.DEVNULL)
+    try:
+        start = time.perf_counter()
+        times, values, reads = run(args.rate, args.duration)
+        elapsed = time.perf_counter() - start
+    finally:
+        if server is not None:
+            server.send_signal(signal.SIGINT)
+            server.wait()
+
+    errors = check(times, values, args.rate)
+    print(f'{len(values)} samples in {elapsed:.2f} s '
+          f'({len(values) / elapsed:.0f} samples/s, {reads} reads)')
+    print('errors: ' + (', '.join(errors) if errors else 'none'))
+    return 1 if errors else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
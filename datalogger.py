@@ -26,6 +26,7 @@
 import sys
 import os
 import math
+import time
 from PyQt5.QtCore import (Qt, QThread, pyqtSignal, QLocale, QTranslator,
                           QLibraryInfo, QFileInfo, QSettings)
 from PyQt5.QtWidgets import (QWidget, QMainWindow, QGridLayout, QHBoxLayout,
@@ -42,8 +43,19 @@ from tools.settingsdialogs import (SerialSettingsDialog, PreferencesDialog,
 from tools.helpdialogs import HelpHtmlDialog
 from tools.CustomWidgets import EditorDialog
 from tools.langtranslate import load_section
-from tools.datafilters import datafilter
-from tools.stats import StatsDialog
+from tools.datafilters import datafilter, channel_filters, filter_chain
+from tools.arrayfilter import make_transform, load_filters
+from tools.filterchain import FilterChain
+from tools.stats import StatsDialog, RunningStats
+from tools.ringbuffer import RingBuffer
+from tools.decoders import AsciiDecoder, FrameDecoder
+from tools.render import RenderScheduler
+from tools.envelope import EnvelopeDecimator
+from tools.pyramid import LodPyramid, BASE
+from tools.recorder import StreamRecorder
+from tools.lfdfile import make_meta, load_lfd, load_csv, channel_count
+from tools.savethread import SaveThread
+from tools.multisource import COLORS
 
 
 class MainWindow(QMainWindow):
@@ -69,10 +81,19 @@ class MainWindow(QMainWindow):
     unitsel = 1
     # data buffer size
     buffersize = int(appsettings.value("Buffer", 1200))
-    # data buffer
-    data = np.zeros((buffersize,))
+    # number of analog inputs read
+    channels = appsettings.value("Channels", 1, type=int)
+    # data buffer, one row per channel
+    data = RingBuffer(buffersize, channels=channels)
     # use internal filter function
     use_internal_filter = True
+    # continuous logging: samples are streamed to disk
+    recorder = None
+    # samples of the loaded file (memory mapped), the buffer holds the
+    # last ones
+    recording = None
+    # samples read at once from a loaded recording
+    load_chunk = 1 << 20
 
     def __init__(self):
         super(MainWindow, self).__init__()
@@ -88,6 +109,10 @@ class MainWindow(QMainWindow):
         # self.showMaximized()
 
         self.statsdlg = StatsDialog()
+        self.statsdlg.set_channels(self.channels)
+        self.statsdlg.channelChanged.connect(self.refresh_stats)
+        # statistics updated with every incoming chunk, one per channel
+        self.runstats = [RunningStats() for _ in range(self.channels)]
 
         # serial configuration dialog
         self.configdlg = SerialSettingsDialog(self)
@@ -116,11 +141,36 @@ class MainWindow(QMainWindow):
 
         # create thread for reading data from serial port
         self.Thread = DataThread(self)
+        self.Thread.interval = self.appsettings.value("ChunkInterval", 20,
+                                                      type=int) / 1000
         self.Thread.dataReady.connect(self.update_data)
 
+        # background file writer
+        self.saver = SaveThread(self)
+        self.saver.progress.connect(self.saveprogress.setValue)
+        self.saver.done.connect(self.save_done)
+
+        # datafilter() and channel_filters applied to chunks of samples
+        self.transform = make_transform(datafilter, channel_filters)
+        self.chain = FilterChain(filter_chain)
+
+        # level of detail summaries of the samples, for wide views
+        self.pyramid = LodPyramid(self.channels)
+
         # create plot
         self.create_graphs()
 
+        # refresh display at a limited frame rate
+        self.renderer = RenderScheduler(self.appsettings.value(
+            "RenderFPS", 30, type=int), self)
+        self.renderer.render.connect(self.refresh_display)
+        self.renderer.rates.connect(self.show_rates)
+        self.renderer.start()
+        # zooming or resizing shows other samples
+        view = self.pw.getViewBox()
+        view.sigXRangeChanged.connect(self.view_changed)
+        view.sigResized.connect(self.view_changed)
+
         # if no default settings stored, launch configuration
         if not self.appsettings.value('Init', False):
             reply = QMessageBox.question(self, "Configure",
@@ -147,6 +197,7 @@ class MainWindow(QMainWindow):
         self.statusBar().showMessage(self.langstr[1])
 
         self.myeditor = EditorDialog(self)
+        self.myeditor.saved.connect(self.reload_filter)
 
         # create a PlotWidget from pyqtgraph
         self.pw = pg.PlotWidget()
@@ -224,6 +275,11 @@ class MainWindow(QMainWindow):
                                                          type=bool))
         self.filterAct.triggered.connect(self.use_filter)
 
+        self.binAct = QAction('Binary protocol', self, checkable=True)
+        self.binAct.setChecked(self.appsettings.value("Binary", False,
+                                                      type=bool))
+        self.binAct.triggered.connect(self.use_binary)
+
         menubar = self.menuBar()
         fileMenu = menubar.addMenu(self.langstr[11])
         fileMenu.addAction(self.saveAct)
@@ -240,6 +296,7 @@ class MainWindow(QMainWindow):
         serialMenu = menubar.addMenu(self.langstr[12])
         serialMenu.addAction(self.scanAct)
         serialMenu.addAction(self.conAct)
+        serialMenu.addAction(self.binAct)
 
         helpMenu = menubar.addMenu(self.langstr[13])
         helpMenu.addAction(self.helpAct)
@@ -312,7 +369,17 @@ class MainWindow(QMainWindow):
         self.btnload.clicked.connect(self.loadfile)
         self.btnload.setEnabled(True)
         self.meslayout = QVBoxLayout()
+        self.contbox = QCheckBox('Continuous')
+        self.contbox.setToolTip('Record to disk without buffer size limit')
+        self.chanbox = QSpinBox()
+        self.chanbox.setRange(1, 8)
+        self.chanbox.setPrefix('Channels: ')
+        self.chanbox.setValue(self.channels)
+        self.chanbox.setToolTip('Analog inputs read, from A0')
+        self.chanbox.valueChanged.connect(self.set_channels)
         self.meslayout.addWidget(self.btnstart)
+        self.meslayout.addWidget(self.contbox)
+        self.meslayout.addWidget(self.chanbox)
         self.meslayout.addWidget(self.btnsave)
         self.meslayout.addWidget(self.btnload)
         self.meslayout.setAlignment(Qt.AlignTop)
@@ -352,6 +419,9 @@ class MainWindow(QMainWindow):
         self.grid.addWidget(self.mesbox, 3, 2)
         self.grid.addWidget(self.sysbox, 3, 3)
 
+        # measured refresh and acquisition rates
+        self.rate_label = QLabel('')
+        self.statusBar().addPermanentWidget(self.rate_label)
         # Remaining time label
         self.time_label = QLabel(self.get_rem_time())
         self.statusBar().addPermanentWidget(self.time_label)
@@ -364,6 +434,13 @@ class MainWindow(QMainWindow):
         self.statusLabel = QLabel('Buffer fill :')
         self.statusBar().addPermanentWidget(self.statusLabel)
         self.statusBar().addPermanentWidget(self.buffprogress)
+        # save progress, only shown while saving
+        self.saveprogress = QProgressBar()
+        self.saveprogress.setMaximum(100)
+        self.saveprogress.setFixedSize(60, 10)
+        self.saveprogress.setTextVisible(False)
+        self.saveprogress.hide()
+        self.statusBar().addWidget(self.saveprogress)
 
         # show window
         self.move(300, 150)
@@ -372,11 +449,21 @@ class MainWindow(QMainWindow):
 
     def show_stats(self):
         """ Show statistics dialog """
-        raw_data = self.data[0:(self.buffersize -
-                                (self.buffersize - self.chunk_size))]
-        self.statsdlg.update(raw_data)
+        self.refresh_stats()
         self.statsdlg.show()
 
+    def refresh_stats(self):
+        """ statistics of the channel selected in the dialog
+            live values while logging, whole loaded recording, computed
+            on the buffer otherwise
+        """
+        channel = self.statsdlg.channel()
+        self.statsdlg.set_live(self.isRunning)
+        if self.isRunning or self.recording is not None:
+            self.statsdlg.show_stats(self.runstats[channel].result())
+        else:
+            self.statsdlg.update(self.data.valid()[channel])
+
     def get_rem_time(self):
         multiplier = 1
         days = hours = mins = secs = msecs = 0
@@ -425,6 +512,39 @@ class MainWindow(QMainWindow):
                                   f'translations/{langue[2].strip()}')
         QMessageBox.information(self, "Language", self.langstr[38])
 
+    def use_binary(self):
+        """ Menu->Serial->binary protocol callback """
+        self.appsettings.setValue("Binary", self.binAct.isChecked())
+
+    def start_board(self):
+        """ send start command to arduino
+            Binary frames are asked for if enabled, boards that don't
+            answer (old sketches) are started in ascii mode
+            "4R" reads 4 channels, plain "R" for a single one (older
+            sketches)
+        """
+        prefix = str(self.channels).encode() if self.channels > 1 else b''
+        self.Thread.decoder = AsciiDecoder(self.channels)
+        if self.binAct.isChecked():
+            timeout = self.serport.timeout
+            self.serport.timeout = 2
+            self.serport.write(prefix + b'B')
+            reply = self.serport.readline()
+            self.serport.timeout = timeout
+            if reply.strip() == b'BIN':
+                self.Thread.decoder = FrameDecoder(self.channels)
+                return
+            self.statusBar().showMessage('No binary mode, using ascii', 2000)
+        self.serport.write(prefix + b'R')
+
+    def filter_values(self, values):
+        """ datafilter then filter_chain applied to an array, if enabled
+            channels of (samples, channels) arrays use channel_filters
+        """
+        if not self.use_internal_filter:
+            return values
+        return self.chain.process(self.transform(values))
+
     def use_filter(self):
         """ Menu->Edit->use filter callback """
         if self.filterAct.isChecked():
@@ -436,6 +556,28 @@ class MainWindow(QMainWindow):
         self.myeditor.show()
         self.myeditor.file_set('tools/datafilters.py')
 
+    def reload_filter(self, path):
+        """ editor callback, use the filter module just saved
+            update_data runs in this thread: the filters are switched
+            between two chunks, no sample is lost
+        """
+        if QFileInfo(path).canonicalFilePath() != \
+                QFileInfo('tools/datafilters.py').canonicalFilePath():
+            return
+        try:
+            filters = load_filters(path, self.channels)
+        except (OSError, ValueError) as e:
+            QMessageBox.about(self, 'Filter',
+                              f"Filter not applied, the previous one is "
+                              f"still used\n{e}")
+            return
+        self.transform = filters['transform']
+        self.chain = filters['chain']
+        message = f"Filter applied: {filters['cost'] * 1e9:.0f} ns/sample"
+        if filters['warnings']:
+            message += ' - ' + filters['warnings'][0]
+        self.statusBar().showMessage(message, 10000)
+
     def startlogging(self):
         """ Start / stop button callback """
         sval = self.sample_val.value()
@@ -453,18 +595,27 @@ class MainWindow(QMainWindow):
                                          QMessageBox.No)
             if reply == QMessageBox.Yes:
                 self.clear_data()
+            if self.contbox.isChecked() and not self.start_recording():
+                return
+            self.contbox.setEnabled(False)
+            self.chanbox.setEnabled(False)
             self.isRunning = True
+            # new samples follow the buffer, not the loaded file
+            self.recording = None
             self.btnstart.setText(self.langstr[25])
             self.btnstart.setIcon(QIcon.fromTheme('media-playback-pause'))
             self.btnload.setEnabled(False)
             self.loadAct.setEnabled(False)
             self.serport.write(bytes(tmpstr))  # send configuration to arduino
             self.serport.readline().decode('ascii')  # DO NOT REMOVE tHIS LINE
-            self.serport.write(bytes(b'R'))    # send start command to arduino
+            self.start_board()                 # send start command to arduino
             self.Thread.start()                # start reading values
             self.statusBar().showMessage(self.langstr[26])
         else:
             self.isRunning = False
+            self.stop_recording()
+            self.contbox.setEnabled(True)
+            self.chanbox.setEnabled(True)
             self.btnload.setEnabled(True)
             self.loadAct.setEnabled(True)
             self.btnstart.setText(self.langstr[17])
@@ -483,6 +634,8 @@ class MainWindow(QMainWindow):
                                      QMessageBox.No)
         if reply == QMessageBox.Yes:
             event.accept()
+            self.stop_recording(wait=True)
+            self.saver.wait()
             if self.isConnected:
                 self.serport.close()
                 if self.isRunning:
@@ -543,39 +696,147 @@ class MainWindow(QMainWindow):
         color = self.appsettings.value("LineColor", QColor(100, 200, 100))
         self.p1.setPen(color)
         self.pw.setYRange(self.pmin, self.pmax, padding=0)
-        self.p1.setData(self.data)
-
-    def update_data(self, value):
+        # one curve per channel, p1 is the first one
+        self.legend = self.pw.addLegend()
+        self.curves = [self.p1]
+        self.make_curves()
+        self.plot_data()
+
+    def make_curves(self):
+        """ add or remove curves to match the number of channels """
+        for curve in self.curves[self.channels:]:
+            self.pw.removeItem(curve)
+        del self.curves[self.channels:]
+        for channel in range(len(self.curves), self.channels):
+            self.curves.append(self.pw.plot(
+                pen=COLORS[channel % len(COLORS)]))
+        self.legend.clear()
+        if self.channels > 1:
+            for channel, curve in enumerate(self.curves):
+                self.legend.addItem(curve, f'Channel {channel + 1}')
+        self.legend.setVisible(self.channels > 1)
+        self.envelopes = [EnvelopeDecimator() for _ in self.curves]
+
+    def plot_data(self):
+        """ display the buffer, one curve per channel
+            only the visible samples are drawn, as a min/max envelope of
+            about 2 points per pixel for large buffers (read from the
+            pyramid when zoomed out). Samples that left the buffer are
+            drawn from the pyramid when scrolled to, a loaded recording
+            is drawn whole (x is the sample number).
         """
-            slot for thread signal
-            process and display data
+        view = self.pw.getViewBox()
+        # x of buffer position 0
+        shift = 0
+        if self.recording is not None:
+            shift = self.data.total - self.data.size
+        if view.autoRangeEnabled()[0]:
+            xmin, xmax = -shift, self.data.size
+        else:
+            xmin, xmax = view.viewRange()[0]
+            xmin, xmax = xmin - shift, xmax - shift
+        pixels = view.width() * self.pw.devicePixelRatioF()
+        for channel, curve in enumerate(self.curves):
+            older = None
+            if self.recording is not None:
+                older = (lambda lo, hi, channel=channel:
+                         self.recording[lo:hi, channel])
+            curve.setData(*self.envelopes[channel].decimate(
+                self.data, xmin, xmax, pixels, channel, self.pyramid,
+                older))
+            curve.setPos(shift, 0)
+
+    def view_changed(self, *args):
+        """ plot range or size changed, draw again on next frame """
+        self.renderer.notify(0)
+
+    def set_channels(self, channels):
+        """ channels spin box callback
+            buffer, curves and statistics for `channels` analog inputs,
+            samples are erased
         """
-        if(self.count < self.buffersize):
-            # process data - modify datafilter() in /tools/datafilters.py
-            # to fit your needs
-            if self.use_internal_filter:
-                value = datafilter(value)
-            self.count += 1
+        self.channels = channels
+        self.appsettings.setValue("Channels", channels)
+        self.data = RingBuffer(self.buffersize, channels=channels)
+        self.recording = None
+        self.pyramid = LodPyramid(channels)
+        self.runstats = [RunningStats() for _ in range(channels)]
+        self.chain.reset()
+        self.statsdlg.set_channels(channels)
+        self.count = self.chunk_size = 0
+        self.make_curves()
+        self.plot_data()
+
+    def update_data(self, values):
+        """
+            slot for thread signals
+            process and display a chunk of data (array or single value)
+        """
+        # (samples, channels), single channel sources send 1-D arrays
+        values = np.asarray(values, dtype=float).reshape(-1, self.channels)
+        # process data - modify datafilter() in /tools/datafilters.py
+        # to fit your needs (the chain may drop samples: decimation)
+        values = self.filter_values(values)
+        if self.recorder is not None:
+            # continuous mode: the buffer is a sliding window
+            room = len(values)
+        else:
+            room = self.buffersize - self.count
+        overflow = len(values) > room
+        if room > 0 and len(values):
+            # samples past the end of the buffer are dropped
+            values = values[:room]
+            self.count += len(values)
             self.chunk_size = self.count
-            # shift data in the array one sample left
-            self.data[:-1] = self.data[1:]
-            self.data[-1] = value           # add new value
-            self.p1.setData(self.data)      # update display
-            percent = self.count / self.buffersize * 100
-            self.statusLabel.setText('Buffer fill: {:04.2f}'
-                                     .format(round(percent, 2)) + '%')
-            self.buffprogress.setValue(int(round(percent, 2)))
-            self.time_label.setText(self.get_rem_time())
-
-        elif self.count == self.buffersize:
+            self.data.extend(values)        # add new values
+            self.pyramid.extend(values)
+            for stats, column in zip(self.runstats, values.T):
+                stats.update(column)
+            if self.recorder is not None:
+                self.recorder.write(values)
+            self.renderer.notify(len(values))   # display on next frame
+
+        if overflow and self.isRunning:
             self.btnstart.setText(self.langstr[17])
             self.btnstart.setIcon(QIcon.fromTheme('media-playback-start'))
             self.isRunning = False
+            self.contbox.setEnabled(True)
+            self.chanbox.setEnabled(True)
             self.serport.write(bytes(b'C'))     # send stop command to arduino
             self.statusBar().showMessage(self.langstr[30])
             self.Thread.stop()
             self.btnload.setEnabled((True))
 
+    def refresh_display(self):
+        """ render scheduler callback, update plot and buffer status """
+        self.plot_data()
+        if self.isRunning and self.statsdlg.isVisible():
+            self.refresh_stats()
+        if self.recorder is not None and self.recorder.error is not None:
+            # disk full...: the samples stay in the buffer
+            error, filename = self.recorder.error, self.recorder.filename
+            self.stop_recording()
+            QMessageBox.about(self, self.langstr[33],
+                              f"Recording stopped, can't write to "
+                              f"{filename}\n{error}")
+        if self.recorder is not None:
+            status = f'Recorded: {self.count} samples'
+            if self.recorder.dropped:
+                status += f' ({self.recorder.dropped} lost)'
+            self.statusLabel.setText(status)
+            self.buffprogress.setValue(100)
+            self.time_label.setText('')
+            return
+        percent = self.count / self.buffersize * 100
+        self.statusLabel.setText('Buffer fill: {:04.2f}'
+                                 .format(round(percent, 2)) + '%')
+        self.buffprogress.setValue(int(round(percent, 2)))
+        self.time_label.setText(self.get_rem_time())
+
+    def show_rates(self, fps, sps):
+        """ display measured frames/s and samples/s """
+        self.rate_label.setText(f'{fps:.0f} fps - {sps:.0f} samples/s  ')
+
     def set_axis_grid(self):
         """ display horizontal an vertical grids """
         xaxis = False
@@ -590,7 +851,16 @@ class MainWindow(QMainWindow):
     def configure_app(self, conflist):
         """ parse data from preferences dialog """
         if conflist[0] == "Ok" or conflist[0] == "Save":
-            self.data = np.zeros(conflist[1],)
+            self.buffersize = conflist[1]
+            # the buffer keeps its valid samples, renumbered from 0
+            self.pyramid.reset()
+            self.pyramid.extend(self.data.valid().T)
+            self.data.resize(self.buffersize)
+            self.recording = None
+            if self.recorder is None:
+                # a smaller buffer only kept its newest samples
+                self.count = min(self.count, self.buffersize)
+                self.chunk_size = min(self.chunk_size, self.buffersize)
             self.pw.setLabel('left', conflist[4], conflist[5])
             self.pmin = conflist[6]
             self.pmax = conflist[7]
@@ -656,8 +926,17 @@ class MainWindow(QMainWindow):
                 \nPlease check your connections!!!""")
 
     def savefile(self):
-        """ Save data to file """
-        self.Thread.stop()
+        """ Save data to file
+            A snapshot of the buffer is written by a worker thread,
+            acquisition goes on meanwhile
+        """
+        if self.saver.isRunning():
+            return
+        # take a copy of the buffer as it is now, (samples, channels)
+        snapshot = self.data.view().T.copy()
+        meta = make_meta(self.mainlabel.text(), self.buffersize,
+                         self.sample_val.value(), self.units[self.unitsel],
+                         self.pmin, self.pmax, self.channels)
         # open file selection dialog
         options = QFileDialog.Options()
         options |= QFileDialog.DontUseNativeDialog
@@ -670,41 +949,35 @@ class MainWindow(QMainWindow):
             # add lfd suffix if not in filename
             if not QFileInfo(fileName).suffix():
                 fileName += '.lfd'
-            with open(fileName, 'w')as file:
-                # write app name and version
-                file.write('Datalogger v1.0\r\n')
-                # add dataset name
-                file.write(self.mainlabel.text() + '\r\n')
-                # write used buffersize
-                file.write(str(self.buffersize) + '\r\n')
-                # write delay unit and value
-                file.write(str(self.sample_val.value()) + ',' + self.units[
-                    self.unitsel] + '\r\n')
-                # write values
-                file.write(str(self.pmin) + ',' + str(self.pmax) + '\r\n')
-                # write data
-                for n in range(0, self.buffersize):
-                    file.write(str(self.data[n]) + '\r\n')
-                # ask for optional csv file
-                reply = QMessageBox.question(self, self.langstr[31],
-                                             self.langstr[32],
-                                             QMessageBox.Yes | QMessageBox.No,
-                                             QMessageBox.No)
-                # create CSV file on demand
-                if reply == QMessageBox.Yes:
-                    # replace file suffix
-                    fileName = fileName.replace('lfd', 'csv')
-                    with open(fileName, 'w+') as file:
-                        try:
-                            header = "Samples,Values" + '\r\n'
-                            file.write(header)
-                            for n in range(0, self.buffersize):
-                                val = str(n) + ',' + str(self.data[n]) + '\r\n'
-                                file.write(val)
-                        except():
-                            print('File error')
-
-        self.Thread.start()
+            # ask for optional csv file
+            reply = QMessageBox.question(self, self.langstr[31],
+                                         self.langstr[32],
+                                         QMessageBox.Yes | QMessageBox.No,
+                                         QMessageBox.No)
+            csvname = None
+            if reply == QMessageBox.Yes:
+                # replace file suffix
+                csvname = fileName.replace('lfd', 'csv')
+            self.saveAct.setEnabled(False)
+            self.btnsave.setEnabled(False)
+            self.saveprogress.setValue(0)
+            self.saveprogress.show()
+            # binary format unless old text files are wanted
+            self.saver.save(fileName, snapshot, meta,
+                            self.appsettings.value("LfdVersion", 2, type=int),
+                            csvname)
+
+    def save_done(self, error):
+        """ save thread callback """
+        self.saveprogress.hide()
+        self.saveAct.setEnabled(True)
+        self.btnsave.setEnabled(True)
+        if error:
+            QMessageBox.about(self, self.langstr[33],
+                              f"Can't save file {self.saver.filename}\n"
+                              f"{error}")
+        else:
+            self.statusBar().showMessage(f'{self.saver.filename} saved', 2000)
 
     def loadfile(self):
         """ load data from file """
@@ -713,81 +986,170 @@ class MainWindow(QMainWindow):
         options |= QFileDialog.DontUseNativeDialog
         fileName, _ = QFileDialog.getOpenFileName(self, self.langstr[19],
                                                   "", """Datalogger Files
-                                                   (*.lfd);;All Files (*)""",
+                                                   (*.lfd *.csv);;All Files (*)""",
                                                   options=options)
         if fileName == "":
             return
         # if file exists and is a datalogger file
-        if fileName and QFileInfo(fileName).suffix() == 'lfd':
-            with open(fileName, 'r') as file:
-                # read app name : not used
-                file.readline()
-                # read dataset name
-                self.mainlabel.setText(file.readline().strip())
-                # read buffesize
-                self.buffersize = int(file.readline().strip())
-                # get delay unit
-                val = file.readline().strip().split(',')
-                if val[1] == 'm':
-                    self.sample_ms.setChecked(True)
-                elif val[1] == 's':
-                    self.sample_s.setChecked(True)
-                elif val[1] == 'M':
-                    self.sample_min.setChecked(True)
-                # read delay value
-                self.sample_val.setValue(int(val[0]))
-                # read values range and setup graph
-                val = file.readline().strip().split(',')
-                self.pmin = float(val[0])
-                self.pmax = float(val[1])
-                self.pw.setYRange(self.pmin, self.pmax, padding=0)
-                # read data
-                for n in range(0, self.buffersize):
-                    self.data[n] = float(file.readline())
-                self.p1.setData(self.data)      # update display
-                self.statbutton.setEnabled(True)
-                self.chunk_size = self.buffersize
+        suffix = QFileInfo(fileName).suffix()
+        if fileName and suffix in ('lfd', 'csv'):
+            try:
+                if suffix == 'csv':
+                    # samples only, current settings are kept
+                    values = load_csv(fileName)
+                    meta = make_meta(self.mainlabel.text(), len(values),
+                                     self.sample_val.value(),
+                                     self.units[self.unitsel], self.pmin,
+                                     self.pmax)
+                else:
+                    meta, values = load_lfd(fileName)
+                if not len(values):
+                    raise ValueError('no samples in file')
+            except (OSError, ValueError, IndexError) as e:
+                QMessageBox.about(self, self.langstr[33],
+                                  f"Can't load file {fileName}\n{e}")
+                return
+            # dataset name
+            self.mainlabel.setText(meta['title'])
+            # delay unit and value
+            if meta['unit'] == 'm':
+                self.sample_ms.setChecked(True)
+            elif meta['unit'] == 's':
+                self.sample_s.setChecked(True)
+            elif meta['unit'] == 'M':
+                self.sample_min.setChecked(True)
+            self.sample_val.setValue(meta['sample_val'])
+            # values range and setup graph
+            self.pmin = meta['pmin']
+            self.pmax = meta['pmax']
+            self.pw.setYRange(self.pmin, self.pmax, padding=0)
+            # data: the buffer holds the last samples (configured size),
+            # the rest of the recording is read from the file when needed
+            self.buffersize = min(len(values), self.appsettings.value(
+                "Buffer", 1200, type=int))
+            self.chanbox.setValue(channel_count(values))
+            self.data.load(values[len(values) - self.buffersize:],
+                           total=len(values))
+            stored = 'lod_offset' in meta
+            if stored:
+                # pyramid stored with the recording
+                self.pyramid = LodPyramid.fromfile(fileName, meta, values)
+            else:
+                self.pyramid.reset()
+            # (samples, channels) for any number of channels
+            self.recording = values.reshape(len(values), -1)
+            for stats in self.runstats:
+                stats.reset()
+            # whole recording, a chunk at a time
+            for start in range(0, len(values), self.load_chunk):
+                chunk = np.asarray(
+                    self.recording[start:start + self.load_chunk],
+                    dtype=float)
+                if not stored:
+                    self.pyramid.extend(chunk)
+                for stats, column in zip(self.runstats, chunk.T):
+                    stats.update(column)
+            self.plot_data()   # update display
+            self.statbutton.setEnabled(True)
+            self.chunk_size = self.buffersize
 
         else:
             QMessageBox.about(self, self.langstr[33],
                               f"Can't load file {fileName}\nBad file type!")
 
+    def start_recording(self):
+        """ ask for a file and start streaming samples to it """
+        options = QFileDialog.Options()
+        options |= QFileDialog.DontUseNativeDialog
+        fileName, _ = QFileDialog.getSaveFileName(self, 'Record to', "",
+                                                  """Datalogger Files
+                                                   (*.lfd);;All Files (*)""",
+                                                  options=options)
+        if not fileName:
+            return False
+        if not QFileInfo(fileName).suffix():
+            fileName += '.lfd'
+        meta = make_meta(self.mainlabel.text(), self.buffersize,
+                         self.sample_val.value(), self.units[self.unitsel],
+                         self.pmin, self.pmax, self.channels)
+        try:
+            lod_base = BASE if self.appsettings.value(
+                "StoreLod", True, type=bool) else None
+            self.recorder = StreamRecorder(fileName, meta, lod_base=lod_base)
+        except (OSError, ValueError) as e:
+            QMessageBox.about(self, self.langstr[33],
+                              f"Can't create file {fileName}\n{e}")
+            return False
+        self.recorder.start()
+        return True
+
+    def stop_recording(self, wait=False):
+        """ close recording file once pending samples are written """
+        if self.recorder is not None:
+            self.recorder.close()
+            if wait:
+                self.recorder.join()
+            self.recorder = None
+
     def clear_data(self):
         """ erase all data """
         # if not running, erase data and update display
         if self.btnstart.text() != self.langstr[25]:
-            for n in range(0, self.buffersize):
-                self.data[n] = 0
-            self.p1.setData(self.data)
+            self.data.clear()
+            self.recording = None
+            self.pyramid.reset()
+            self.chain.reset()
+            for stats in self.runstats:
+                stats.reset()
+            self.plot_data()
             self.count = self.chunk_size = 0
 
 
 class DataThread(QThread):
     """ Thread for reading serial data """
 
-    # custom signal to return data
-    dataReady = pyqtSignal(float)
+    # custom signal to return a chunk of samples (numpy array)
+    dataReady = pyqtSignal(object)
     isOpen = True
+    # minimum delay between two chunks (seconds)
+    interval = 0.02
 
     def __init__(self, parent=None):
         super(DataThread, self).__init__(parent)
         self.threadactive = True
         self.parent = parent
-        self.values = -1
+        self.decoder = AsciiDecoder()
 
     def run(self):
         """code to execute """
         self.threadactive = True
+        self.decoder.reset()
+        port = self.parent.serport
+        pending = []
+        last_emit = time.perf_counter()
         while self.threadactive:
-            try:
-                # read a string from serial and cast it to int
-                self.values = int(
-                    self.parent.serport.readline().decode('ascii'))
-                # envoi d'une valeur à afficher
-                self.dataReady.emit(self.values)
-            except (TypeError, ValueError):
-                # self.dataReady.emit(-1)
-                pass
+            # read whatever is available and parse complete lines
+            waiting = port.in_waiting
+            if waiting:
+                raw = port.read(waiting)
+            elif pending:
+                # don't block, pending values are due soon
+                self.msleep(1)
+                raw = b''
+            else:
+                raw = port.read(1)  # wait for data (port timeout)
+            values = self.decoder.feed(raw)
+            if len(values):
+                pending.append(values)
+            # send values at a bounded rate
+            now = time.perf_counter()
+            if pending and now - last_emit >= self.interval:
+                self.dataReady.emit(np.concatenate(pending))
+                pending = []
+                last_emit = now
+        # deliver values read before stop
+        if pending:
+            self.dataReady.emit(np.concatenate(pending))
 
     def stop(self):
         """ stop sending data """
@@ -26,6 +26,7 @@
 import sys
 import os
 import math
+import time
 import socket
 from PyQt5.QtCore import (Qt, QThread, pyqtSignal, QLocale, QTranslator,
                           QLibraryInfo, QFileInfo, QSettings)
@@ -41,10 +42,24 @@ import serial
 from tools.settingsdialogs import (SerialSettingsDialog, PreferencesDialog,
                                    LangSelector, TCPConfigDialog)
 from tools.helpdialogs import HelpHtmlDialog
-from tools.CustomWidgets import EditorDialog, TicTimer
+from tools.CustomWidgets import EditorDialog
 from tools.langtranslate import load_section
-from tools.datafilters import datafilter
-from tools.stats import StatsDialog
+from tools.datafilters import datafilter, channel_filters, filter_chain
+from tools.arrayfilter import make_transform, load_filters
+from tools.filterchain import FilterChain
+from tools.stats import StatsDialog, RunningStats
+from tools.ringbuffer import RingBuffer
+from tools.decoders import AsciiDecoder, FrameDecoder
+from tools.render import RenderScheduler
+from tools.envelope import EnvelopeDecimator
+from tools.pyramid import LodPyramid, BASE
+from tools.timing import DeadlineTimer
+from tools.netprotocol import (command, split_samples, FrameReader, SAMPLES,
+                               SequenceTracker)
+from tools.recorder import StreamRecorder
+from tools.lfdfile import make_meta, load_lfd, load_csv, channel_count
+from tools.savethread import SaveThread
+from tools.multisource import MultiSourceWindow, COLORS
 
 
 class MainWindow(QMainWindow):
@@ -70,10 +85,20 @@ class MainWindow(QMainWindow):
     unitsel = 1
     # data buffer size
     buffersize = int(appsettings.value("Buffer", 1200))
-    # data buffer
-    data = np.zeros((buffersize,))
+    # number of analog inputs read
+    channels = appsettings.value("Channels", 1, type=int)
+    # data buffer, one row per channel
+    data = RingBuffer(buffersize, channels=channels)
     # use internal filter function
     use_internal_filter = True
+    # continuous logging: samples are streamed to disk
+    recorder = None
+    # samples of the loaded file (memory mapped), the buffer holds the
+    # last ones
+    recording = None
+    # samples read at once from a loaded recording
+    load_chunk = 1 << 20
+    multiwin = None
     # use tcp or serial
     use_tcp_flag = appsettings.value("UseTCP", False, type=bool)
     tcp_config = ["127.0.0.1", 0]
@@ -92,6 +117,10 @@ class MainWindow(QMainWindow):
         # self.showMaximized()
 
         self.statsdlg = StatsDialog()
+        self.statsdlg.set_channels(self.channels)
+        self.statsdlg.channelChanged.connect(self.refresh_stats)
+        # statistics updated with every incoming chunk, one per channel
+        self.runstats = [RunningStats() for _ in range(self.channels)]
 
         # serial configuration dialog
         self.configdlg = SerialSettingsDialog(self)
@@ -120,15 +149,44 @@ class MainWindow(QMainWindow):
 
         # create thread for reading data from serial port
         self.Thread = DataThread(self)
+        self.Thread.interval = self.appsettings.value("ChunkInterval", 20,
+                                                      type=int) / 1000
         self.Thread.dataReady.connect(self.update_data)
 
         # Create thread for reading from network
         self.tcp_thread = TCPThread(self)
         self.tcp_thread.dataReady.connect(self.update_data)
+        self.tcp_thread.timing.connect(self.show_timing)
+        self.udp_thread = UDPThread(self)
+        self.udp_thread.dataReady.connect(self.update_data)
+        self.udp_thread.stats.connect(self.show_udp_stats)
+
+        # background file writer
+        self.saver = SaveThread(self)
+        self.saver.progress.connect(self.saveprogress.setValue)
+        self.saver.done.connect(self.save_done)
+
+        # datafilter() and channel_filters applied to chunks of samples
+        self.transform = make_transform(datafilter, channel_filters)
+        self.chain = FilterChain(filter_chain)
+
+        # level of detail summaries of the samples, for wide views
+        self.pyramid = LodPyramid(self.channels)
 
         # create plot
         self.create_graphs()
 
+        # refresh display at a limited frame rate
+        self.renderer = RenderScheduler(self.appsettings.value(
+            "RenderFPS", 30, type=int), self)
+        self.renderer.render.connect(self.refresh_display)
+        self.renderer.rates.connect(self.show_rates)
+        self.renderer.start()
+        # zooming or resizing shows other samples
+        view = self.pw.getViewBox()
+        view.sigXRangeChanged.connect(self.view_changed)
+        view.sigResized.connect(self.view_changed)
+
         # if no default settings stored, launch configuration
         if not self.appsettings.value('Init', False):
             reply = QMessageBox.question(self, "Configure",
@@ -155,6 +213,7 @@ class MainWindow(QMainWindow):
         self.statusBar().showMessage(self.langstr[1])
 
         self.myeditor = EditorDialog(self)
+        self.myeditor.saved.connect(self.reload_filter)
 
         self.tcpdialog = TCPConfigDialog()
         self.tcpdialog.set_defaults("127.0.0.1", "5500")
@@ -240,11 +299,29 @@ class MainWindow(QMainWindow):
                                                          type=bool))
         self.filterAct.triggered.connect(self.use_filter)
 
+        self.binAct = QAction('Binary protocol', self, checkable=True)
+        self.binAct.setChecked(self.appsettings.value("Binary", False,
+                                                      type=bool))
+        self.binAct.triggered.connect(self.use_binary)
+
         self.comAct = QAction(self.langstr[40], self, checkable=True)
         self.comAct.setChecked(self.appsettings.value("UseTCP", False,
                                                       type=bool))
         self.comAct.triggered.connect(self.use_tcp)
 
+        self.streamAct = QAction('Network streaming', self, checkable=True)
+        self.streamAct.setChecked(self.appsettings.value("TCPStream", False,
+                                                         type=bool))
+        self.streamAct.triggered.connect(self.use_stream)
+
+        self.udpAct = QAction('UDP transport', self, checkable=True)
+        self.udpAct.setChecked(self.appsettings.value("UseUDP", False,
+                                                      type=bool))
+        self.udpAct.triggered.connect(self.use_udp)
+
+        self.multiAct = QAction('Multi-source acquisition...', self)
+        self.multiAct.triggered.connect(self.show_multisource)
+
         menubar = self.menuBar()
         fileMenu = menubar.addMenu(self.langstr[11])
         fileMenu.addAction(self.saveAct)
@@ -262,7 +339,12 @@ class MainWindow(QMainWindow):
         serialMenu.addAction(self.scanAct)
         serialMenu.addAction(self.tcp_act)
         serialMenu.addAction(self.conAct)
+        serialMenu.addAction(self.binAct)
         serialMenu.addAction(self.comAct)
+        serialMenu.addAction(self.streamAct)
+        serialMenu.addAction(self.udpAct)
+        serialMenu.addSeparator()
+        serialMenu.addAction(self.multiAct)
 
         helpMenu = menubar.addMenu(self.langstr[13])
         helpMenu.addAction(self.helpAct)
@@ -338,7 +420,17 @@ class MainWindow(QMainWindow):
         self.btnload.clicked.connect(self.loadfile)
         self.btnload.setEnabled(True)
         self.meslayout = QVBoxLayout()
+        self.contbox = QCheckBox('Continuous')
+        self.contbox.setToolTip('Record to disk without buffer size limit')
+        self.chanbox = QSpinBox()
+        self.chanbox.setRange(1, 8)
+        self.chanbox.setPrefix('Channels: ')
+        self.chanbox.setValue(self.channels)
+        self.chanbox.setToolTip('Analog inputs read, from A0')
+        self.chanbox.valueChanged.connect(self.set_channels)
         self.meslayout.addWidget(self.btnstart)
+        self.meslayout.addWidget(self.contbox)
+        self.meslayout.addWidget(self.chanbox)
         self.meslayout.addWidget(self.btnsave)
         self.meslayout.addWidget(self.btnload)
         self.meslayout.setAlignment(Qt.AlignTop)
@@ -378,6 +470,9 @@ class MainWindow(QMainWindow):
         self.grid.addWidget(self.mesbox, 3, 2)
         self.grid.addWidget(self.sysbox, 3, 3)
 
+        # measured refresh and acquisition rates
+        self.rate_label = QLabel('')
+        self.statusBar().addPermanentWidget(self.rate_label)
         # Remaining time label
         self.time_label = QLabel(self.get_rem_time())
         self.statusBar().addPermanentWidget(self.time_label)
@@ -390,6 +485,13 @@ class MainWindow(QMainWindow):
         self.statusLabel = QLabel('Buffer fill :')
         self.statusBar().addPermanentWidget(self.statusLabel)
         self.statusBar().addPermanentWidget(self.buffprogress)
+        # save progress, only shown while saving
+        self.saveprogress = QProgressBar()
+        self.saveprogress.setMaximum(100)
+        self.saveprogress.setFixedSize(60, 10)
+        self.saveprogress.setTextVisible(False)
+        self.saveprogress.hide()
+        self.statusBar().addWidget(self.saveprogress)
 
         # show window
         self.move(300, 150)
@@ -431,11 +533,21 @@ class MainWindow(QMainWindow):
 
     def show_stats(self):
         """ Show statistics dialog """
-        raw_data = self.data[0:(self.buffersize -
-                                (self.buffersize - self.chunk_size))]
-        self.statsdlg.update(raw_data)
+        self.refresh_stats()
         self.statsdlg.show()
 
+    def refresh_stats(self):
+        """ statistics of the channel selected in the dialog
+            live values while logging, whole loaded recording, computed
+            on the buffer otherwise
+        """
+        channel = self.statsdlg.channel()
+        self.statsdlg.set_live(self.isRunning)
+        if self.isRunning or self.recording is not None:
+            self.statsdlg.show_stats(self.runstats[channel].result())
+        else:
+            self.statsdlg.update(self.data.valid()[channel])
+
     def get_rem_time(self):
         multiplier = 1
         days = hours = mins = secs = msecs = 0
@@ -484,6 +596,65 @@ class MainWindow(QMainWindow):
                                   f'translations/{langue[2].strip()}')
         QMessageBox.information(self, "Language", self.langstr[38])
 
+    def use_binary(self):
+        """ Menu->Serial->binary protocol callback """
+        self.appsettings.setValue("Binary", self.binAct.isChecked())
+
+    def use_stream(self):
+        """ Menu->Serial->network streaming callback """
+        self.appsettings.setValue("TCPStream", self.streamAct.isChecked())
+
+    def use_udp(self):
+        """ Menu->Serial->UDP transport callback """
+        self.appsettings.setValue("UseUDP", self.udpAct.isChecked())
+
+    def show_multisource(self):
+        """ Menu->Serial->multi-source acquisition callback """
+        if self.multiwin is None:
+            self.multiwin = MultiSourceWindow(
+                self.buffersize, self.convert_values,
+                self.settingsList[2] if self.settingsList else 57600)
+        self.multiwin.show()
+        self.multiwin.raise_()
+
+    def convert_values(self, values):
+        """ datafilter applied to an array, if enabled
+            (also called from the multi-source acquisition thread)
+            Channels of (samples, channels) arrays use channel_filters
+        """
+        if not self.use_internal_filter:
+            return values
+        return self.transform(values)
+
+    def filter_values(self, values):
+        """ convert_values then filter_chain, if enabled
+            (the chain keeps the state of this window's stream)
+        """
+        if not self.use_internal_filter:
+            return values
+        return self.chain.process(self.transform(values))
+
+    def start_board(self):
+        """ send start command to arduino
+            Binary frames are asked for if enabled, boards that don't
+            answer (old sketches) are started in ascii mode
+            "4R" reads 4 channels, plain "R" for a single one (older
+            sketches)
+        """
+        prefix = str(self.channels).encode() if self.channels > 1 else b''
+        self.Thread.decoder = AsciiDecoder(self.channels)
+        if self.binAct.isChecked():
+            timeout = self.serport.timeout
+            self.serport.timeout = 2
+            self.serport.write(prefix + b'B')
+            reply = self.serport.readline()
+            self.serport.timeout = timeout
+            if reply.strip() == b'BIN':
+                self.Thread.decoder = FrameDecoder(self.channels)
+                return
+            self.statusBar().showMessage('No binary mode, using ascii', 2000)
+        self.serport.write(prefix + b'R')
+
     def use_filter(self):
         """ Menu->Edit->use filter callback """
         if self.filterAct.isChecked():
@@ -495,6 +666,28 @@ class MainWindow(QMainWindow):
         self.myeditor.show()
         self.myeditor.file_set('tools/datafilters.py')
 
+    def reload_filter(self, path):
+        """ editor callback, use the filter module just saved
+            update_data runs in this thread: the filters are switched
+            between two chunks, no sample is lost
+        """
+        if QFileInfo(path).canonicalFilePath() != \
+                QFileInfo('tools/datafilters.py').canonicalFilePath():
+            return
+        try:
+            filters = load_filters(path, self.channels)
+        except (OSError, ValueError) as e:
+            QMessageBox.about(self, 'Filter',
+                              f"Filter not applied, the previous one is "
+                              f"still used\n{e}")
+            return
+        self.transform = filters['transform']
+        self.chain = filters['chain']
+        message = f"Filter applied: {filters['cost'] * 1e9:.0f} ns/sample"
+        if filters['warnings']:
+            message += ' - ' + filters['warnings'][0]
+        self.statusBar().showMessage(message, 10000)
+
     def startlogging(self):
         """ Start / stop button callback """
         sval = self.sample_val.value()
@@ -506,18 +699,28 @@ class MainWindow(QMainWindow):
         elif self.sample_min.isChecked():
             multiplier = 60
         self.tcp_thread.set_tic(multiplier * sval)
+        self.udp_thread.tic = multiplier * sval
         self.chunk_size = self.count
         # temp string to store commands for arduino
         tmpstr = '{}{}'.format(str(sval), self.units[self.unitsel])
         tmpstr = tmpstr.encode()
         if not self.isRunning:              # not running ?
+            if self.use_tcp_flag and self.channels > 1:
+                # the server sends a single channel
+                self.chanbox.setValue(1)
             reply = QMessageBox.question(self, self.langstr[23],
                                          self.langstr[24],
                                          QMessageBox.Yes | QMessageBox.No,
                                          QMessageBox.No)
             if reply == QMessageBox.Yes:
                 self.clear_data()
+            if self.contbox.isChecked() and not self.start_recording():
+                return
+            self.contbox.setEnabled(False)
+            self.chanbox.setEnabled(False)
             self.isRunning = True
+            # new samples follow the buffer, not the loaded file
+            self.recording = None
             self.btnstart.setText(self.langstr[25])
             self.btnstart.setIcon(QIcon.fromTheme('media-playback-pause'))
             self.btnload.setEnabled(False)
@@ -528,14 +731,21 @@ class MainWindow(QMainWindow):
                 # DO NOT REMOVE tHIS LINE
                 self.serport.readline().decode('ascii')
                 # send start command to arduino
-                self.serport.write(bytes(b'R'))
+                self.start_board()
                 self.Thread.start()        # start reading values
                 self.statusBar().showMessage(self.langstr[26])
             else:
                 self.connect_tcp()
-                self.tcp_thread.start()
+                if self.udpAct.isChecked():
+                    self.udp_thread.start()
+                else:
+                    self.tcp_thread.streaming = self.streamAct.isChecked()
+                    self.tcp_thread.start()
         else:
             self.isRunning = False
+            self.stop_recording()
+            self.contbox.setEnabled(True)
+            self.chanbox.setEnabled(True)
             self.btnload.setEnabled(True)
             self.loadAct.setEnabled(True)
             self.btnstart.setText(self.langstr[17])
@@ -546,8 +756,9 @@ class MainWindow(QMainWindow):
                 self.statusBar().showMessage(self.langstr[27])
             else:
                 self.isConnected = False
-                self.socket.sendall("close".encode("utf-8"))
+                self.send_close()
                 self.tcp_thread.stop()
+                self.udp_thread.stop()
 
     def closeEvent(self, event):
         """ Custom handler when user tries to close the window
@@ -559,6 +770,10 @@ class MainWindow(QMainWindow):
                                      QMessageBox.No)
         if reply == QMessageBox.Yes:
             event.accept()
+            self.stop_recording(wait=True)
+            self.saver.wait()
+            if self.multiwin is not None:
+                self.multiwin.close()
             if self.isConnected:
                 self.serport.close()
                 if self.isRunning:
@@ -566,9 +781,10 @@ class MainWindow(QMainWindow):
                         self.Thread.stop()
                         self.Thread.terminate()
                     else:
-                        self.socket.sendall("close".encode("utf-8"))
+                        self.send_close()
                         self.tcp_thread.stop()
                         self.tcp_thread.terminate()
+                        self.udp_thread.stop()
 
         else:
             event.ignore()
@@ -633,36 +849,115 @@ Released under GNU GPL license.\n
         color = self.appsettings.value("LineColor", QColor(100, 200, 100))
         self.p1.setPen(color)
         self.pw.setYRange(self.pmin, self.pmax, padding=0)
-        self.p1.setData(self.data)
-
-    def update_data(self, value):
+        # one curve per channel, p1 is the first one
+        self.legend = self.pw.addLegend()
+        self.curves = [self.p1]
+        self.make_curves()
+        self.plot_data()
+
+    def make_curves(self):
+        """ add or remove curves to match the number of channels """
+        for curve in self.curves[self.channels:]:
+            self.pw.removeItem(curve)
+        del self.curves[self.channels:]
+        for channel in range(len(self.curves), self.channels):
+            self.curves.append(self.pw.plot(
+                pen=COLORS[channel % len(COLORS)]))
+        self.legend.clear()
+        if self.channels > 1:
+            for channel, curve in enumerate(self.curves):
+                self.legend.addItem(curve, f'Channel {channel + 1}')
+        self.legend.setVisible(self.channels > 1)
+        self.envelopes = [EnvelopeDecimator() for _ in self.curves]
+
+    def plot_data(self):
+        """ display the buffer, one curve per channel
+            only the visible samples are drawn, as a min/max envelope of
+            about 2 points per pixel for large buffers (read from the
+            pyramid when zoomed out). Samples that left the buffer are
+            drawn from the pyramid when scrolled to, a loaded recording
+            is drawn whole (x is the sample number).
+        """
+        view = self.pw.getViewBox()
+        # x of buffer position 0
+        shift = 0
+        if self.recording is not None:
+            shift = self.data.total - self.data.size
+        if view.autoRangeEnabled()[0]:
+            xmin, xmax = -shift, self.data.size
+        else:
+            xmin, xmax = view.viewRange()[0]
+            xmin, xmax = xmin - shift, xmax - shift
+        pixels = view.width() * self.pw.devicePixelRatioF()
+        for channel, curve in enumerate(self.curves):
+            older = None
+            if self.recording is not None:
+                older = (lambda lo, hi, channel=channel:
+                         self.recording[lo:hi, channel])
+            curve.setData(*self.envelopes[channel].decimate(
+                self.data, xmin, xmax, pixels, channel, self.pyramid,
+                older))
+            curve.setPos(shift, 0)
+
+    def view_changed(self, *args):
+        """ plot range or size changed, draw again on next frame """
+        self.renderer.notify(0)
+
+    def set_channels(self, channels):
+        """ channels spin box callback
+            buffer, curves and statistics for `channels` analog inputs,
+            samples are erased
+        """
+        self.channels = channels
+        self.appsettings.setValue("Channels", channels)
+        self.data = RingBuffer(self.buffersize, channels=channels)
+        self.recording = None
+        self.pyramid = LodPyramid(channels)
+        self.runstats = [RunningStats() for _ in range(channels)]
+        self.chain.reset()
+        self.statsdlg.set_channels(channels)
+        self.count = self.chunk_size = 0
+        self.tcp_thread.last_time = None
+        self.make_curves()
+        self.plot_data()
+
+    def update_data(self, values):
         """
-            slot for thread signal
-            process and display data
+            slot for thread signals
+            process and display a chunk of data (array or single value)
         """
-        if(self.count < self.buffersize):
-            # process data - modify datafilter() in /tools/datafilters.py
-            # to fit your needs
-            # if value > 10000:
-            #    value = 0
-            if self.use_internal_filter:
-                value = datafilter(value)
-            self.count += 1
+        # (samples, channels), single channel sources send 1-D arrays
+        values = np.asarray(values, dtype=float).reshape(-1, self.channels)
+        # process data - modify datafilter() in /tools/datafilters.py
+        # to fit your needs (the chain may drop samples: decimation)
+        # if value > 10000:
+        #    value = 0
+        values = self.filter_values(values)
+        if self.recorder is not None:
+            # continuous mode: the buffer is a sliding window
+            room = len(values)
+        else:
+            room = self.buffersize - self.count
+        overflow = len(values) > room
+        if room > 0 and len(values):
+            # samples past the end of the buffer are dropped
+            values = values[:room]
+            self.count += len(values)
             self.chunk_size = self.count
-            # shift data in the array one sample left
-            self.data[:-1] = self.data[1:]
-            self.data[-1] = value           # add new value
-            self.p1.setData(self.data)      # update display
-            percent = self.count / self.buffersize * 100
-            self.statusLabel.setText('Buffer fill: {:04.2f}'
-                                     .format(round(percent, 2)) + '%')
-            self.buffprogress.setValue(int(round(percent, 2)))
-            self.time_label.setText(self.get_rem_time())
-
-        elif self.count == self.buffersize:
+            self.data.extend(values)        # add new values
+            self.pyramid.extend(values)
+            for stats, column in zip(self.runstats, values.T):
+                stats.update(column)
+            if self.recorder is not None:
+                self.recorder.write(values)
+            self.renderer.notify(len(values))   # display on next frame
+
+        if overflow and self.isRunning:
             self.btnstart.setText(self.langstr[17])
             self.btnstart.setIcon(QIcon.fromTheme('media-playback-start'))
             self.isRunning = False
+            self.contbox.setEnabled(True)
+            self.chanbox.setEnabled(True)
             if not self.use_tcp_flag:
                 # send stop command to arduino
                 self.serport.write(bytes(b'C'))
@@ -672,10 +967,59 @@ Released under GNU GPL license.\n
             else:
                 self.isConnected = False
                 self.tcp_thread.stop()
+                self.udp_thread.stop()
                 self.Thread.stop()
-                self.socket.sendall("close".encode("utf-8"))
+                self.send_close()
             self.btnload.setEnabled((True))
 
+    def refresh_display(self):
+        """ render scheduler callback, update plot and buffer status """
+        self.plot_data()
+        if self.isRunning and self.statsdlg.isVisible():
+            self.refresh_stats()
+        if self.recorder is not None and self.recorder.error is not None:
+            # disk full...: the samples stay in the buffer
+            error, filename = self.recorder.error, self.recorder.filename
+            self.stop_recording()
+            QMessageBox.about(self, self.langstr[33],
+                              f"Recording stopped, can't write to "
+                              f"{filename}\n{error}")
+        if self.recorder is not None:
+            status = f'Recorded: {self.count} samples'
+            if self.recorder.dropped:
+                status += f' ({self.recorder.dropped} lost)'
+            self.statusLabel.setText(status)
+            self.buffprogress.setValue(100)
+            self.time_label.setText('')
+            return
+        percent = self.count / self.buffersize * 100
+        self.statusLabel.setText('Buffer fill: {:04.2f}'
+                                 .format(round(percent, 2)) + '%')
+        self.buffprogress.setValue(int(round(percent, 2)))
+        self.time_label.setText(self.get_rem_time())
+
+    def show_rates(self, fps, sps):
+        """ display measured frames/s and samples/s """
+        self.rate_label.setText(f'{fps:.0f} fps - {sps:.0f} samples/s  ')
+
+    def show_timing(self, stats):
+        """ display network polling accuracy """
+        self.rate_label.setToolTip(
+            f"Period: {stats['period'] * 1000:.1f} ms\n"
+            f"Jitter: {stats['jitter_mean'] * 1000:.3f} ms "
+            f"(max {stats['jitter_max'] * 1000:.3f} ms)\n"
+            f"Overruns: {stats['overruns']}\n"
+            f"CPU: {stats['cpu'] * 100:.1f} %")
+
+    def show_udp_stats(self, stats):
+        """ display datagram counters """
+        self.rate_label.setToolTip(
+            f"Datagrams: {stats['received']}\n"
+            f"Lost: {stats['lost']}\n"
+            f"Reordered: {stats['reordered']}\n"
+            f"Late: {stats['late']} - duplicated: {stats['duplicates']}\n"
+            f"Errors: {stats['errors']} - restarts: {stats['restarts']}")
+
     def set_axis_grid(self):
         """ display horizontal an vertical grids """
         xaxis = False
@@ -690,7 +1034,16 @@ Released under GNU GPL license.\n
     def configure_app(self, conflist):
         """ parse data from preferences dialog """
         if conflist[0] == "Ok" or conflist[0] == "Save":
-            self.data = np.zeros(conflist[1],)
+            self.buffersize = conflist[1]
+            # the buffer keeps its valid samples, renumbered from 0
+            self.pyramid.reset()
+            self.pyramid.extend(self.data.valid().T)
+            self.data.resize(self.buffersize)
+            self.recording = None
+            if self.recorder is None:
+                # a smaller buffer only kept its newest samples
+                self.count = min(self.count, self.buffersize)
+                self.chunk_size = min(self.chunk_size, self.buffersize)
             self.pw.setLabel('left', conflist[4], conflist[5])
             self.pmin = conflist[6]
             self.pmax = conflist[7]
@@ -742,16 +1095,30 @@ Released under GNU GPL license.\n
         if not self.isConnected:
             # try to creat a new socket and connect it
             try:
-                self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+                if self.udpAct.isChecked():
+                    # no connection with udp, only sets the destination
+                    self.socket = socket.socket(socket.AF_INET,
+                                                socket.SOCK_DGRAM)
+                else:
+                    self.socket = socket.socket(socket.AF_INET,
+                                                socket.SOCK_STREAM)
                 self.socket.connect((self.tcp_config[0], self.tcp_config[1]))
                 self.isConnected = True
                 self.update_display()
                 self.statusBar().showMessage(
                     f'Connection to {self.tcp_config[0]}:{self.tcp_config[1]} successfull!', 1000)
-            except ConnectionRefusedError as e:
+            except OSError as e:
                 QMessageBox.about(self, 'Big mistake!', "Network error: " + str(e) +
                 "\nIs your server running ?")
 
+    def send_close(self):
+        """ end of acquisition message to the server """
+        try:
+            self.socket.sendall(command("close"))
+        except OSError:
+            # server gone
+            pass
+
     def connect_serial(self):
         """ Button conBtn clicked event handler
             Try to connect to selected serial port
@@ -775,8 +1142,17 @@ Released under GNU GPL license.\n
                 \nPlease check your connections!!!""")
 
     def savefile(self):
-        """ Save data to file """
-        self.Thread.stop()
+        """ Save data to file
+            A snapshot of the buffer is written by a worker thread,
+            acquisition goes on meanwhile
+        """
+        if self.saver.isRunning():
+            return
+        # take a copy of the buffer as it is now, (samples, channels)
+        snapshot = self.data.view().T.copy()
+        meta = make_meta(self.mainlabel.text(), self.buffersize,
+                         self.sample_val.value(), self.units[self.unitsel],
+                         self.pmin, self.pmax, self.channels)
         # open file selection dialog
         options = QFileDialog.Options()
         options |= QFileDialog.DontUseNativeDialog
@@ -789,41 +1165,35 @@ Released under GNU GPL license.\n
             # add lfd suffix if not in filename
             if not QFileInfo(fileName).suffix():
                 fileName += '.lfd'
-            with open(fileName, 'w')as file:
-                # write app name and version
-                file.write('Datalogger v1.0\r\n')
-                # add dataset name
-                file.write(self.mainlabel.text() + '\r\n')
-                # write used buffersize
-                file.write(str(self.buffersize) + '\r\n')
-                # write delay unit and value
-                file.write(str(self.sample_val.value()) + ',' + self.units[
-                    self.unitsel] + '\r\n')
-                # write values
-                file.write(str(self.pmin) + ',' + str(self.pmax) + '\r\n')
-                # write data
-                for n in range(0, self.buffersize):
-                    file.write(str(self.data[n]) + '\r\n')
-                # ask for optional csv file
-                reply = QMessageBox.question(self, self.langstr[31],
-                                             self.langstr[32],
-                                             QMessageBox.Yes | QMessageBox.No,
-                                             QMessageBox.No)
-                # create CSV file on demand
-                if reply == QMessageBox.Yes:
-                    # replace file suffix
-                    fileName = fileName.replace('lfd', 'csv')
-                    with open(fileName, 'w+') as file:
-                        try:
-                            header = "Samples,Values" + '\r\n'
-                            file.write(header)
-                            for n in range(0, self.buffersize):
-                                val = str(n) + ',' + str(self.data[n]) + '\r\n'
-                                file.write(val)
-                        except():
-                            print('File error')
-
-        self.Thread.start()
+            # ask for optional csv file
+            reply = QMessageBox.question(self, self.langstr[31],
+                                         self.langstr[32],
+                                         QMessageBox.Yes | QMessageBox.No,
+                                         QMessageBox.No)
+            csvname = None
+            if reply == QMessageBox.Yes:
+                # replace file suffix
+                csvname = fileName.replace('lfd', 'csv')
+            self.saveAct.setEnabled(False)
+            self.btnsave.setEnabled(False)
+            self.saveprogress.setValue(0)
+            self.saveprogress.show()
+            # binary format unless old text files are wanted
+            self.saver.save(fileName, snapshot, meta,
+                            self.appsettings.value("LfdVersion", 2, type=int),
+                            csvname)
+
+    def save_done(self, error):
+        """ save thread callback """
+        self.saveprogress.hide()
+        self.saveAct.setEnabled(True)
+        self.btnsave.setEnabled(True)
+        if error:
+            QMessageBox.about(self, self.langstr[33],
+                              f"Can't save file {self.saver.filename}\n"
+                              f"{error}")
+        else:
+            self.statusBar().showMessage(f'{self.saver.filename} saved', 2000)
 
     def loadfile(self):
         """ load data from file """
@@ -832,119 +1202,344 @@ Released under GNU GPL license.\n
         options |= QFileDialog.DontUseNativeDialog
         fileName, _ = QFileDialog.getOpenFileName(self, self.langstr[19],
                                                   "", """Datalogger Files
-                                                   (*.lfd);;All Files (*)""",
+                                                   (*.lfd *.csv);;All Files (*)""",
                                                   options=options)
         if fileName == "":
             return
         # if file exists and is a datalogger file
-        if fileName and QFileInfo(fileName).suffix() == 'lfd':
-            with open(fileName, 'r') as file:
-                # read app name : not used
-                file.readline()
-                # read dataset name
-                self.mainlabel.setText(file.readline().strip())
-                # read buffesize
-                self.buffersize = int(file.readline().strip())
-                # get delay unit
-                val = file.readline().strip().split(',')
-                if val[1] == 'm':
-                    self.sample_ms.setChecked(True)
-                elif val[1] == 's':
-                    self.sample_s.setChecked(True)
-                elif val[1] == 'M':
-                    self.sample_min.setChecked(True)
-                # read delay value
-                self.sample_val.setValue(int(val[0]))
-                # read values range and setup graph
-                val = file.readline().strip().split(',')
-                self.pmin = float(val[0])
-                self.pmax = float(val[1])
-                self.pw.setYRange(self.pmin, self.pmax, padding=0)
-                # read data
-                for n in range(0, self.buffersize):
-                    self.data[n] = float(file.readline())
-                self.p1.setData(self.data)      # update display
-                self.statbutton.setEnabled(True)
-                self.chunk_size = self.buffersize
+        suffix = QFileInfo(fileName).suffix()
+        if fileName and suffix in ('lfd', 'csv'):
+            try:
+                if suffix == 'csv':
+                    # samples only, current settings are kept
+                    values = load_csv(fileName)
+                    meta = make_meta(self.mainlabel.text(), len(values),
+                                     self.sample_val.value(),
+                                     self.units[self.unitsel], self.pmin,
+                                     self.pmax)
+                else:
+                    meta, values = load_lfd(fileName)
+                if not len(values):
+                    raise ValueError('no samples in file')
+            except (OSError, ValueError, IndexError) as e:
+                QMessageBox.about(self, self.langstr[33],
+                                  f"Can't load file {fileName}\n{e}")
+                return
+            # dataset name
+            self.mainlabel.setText(meta['title'])
+            # delay unit and value
+            if meta['unit'] == 'm':
+                self.sample_ms.setChecked(True)
+            elif meta['unit'] == 's':
+                self.sample_s.setChecked(True)
+            elif meta['unit'] == 'M':
+                self.sample_min.setChecked(True)
+            self.sample_val.setValue(meta['sample_val'])
+            # values range and setup graph
+            self.pmin = meta['pmin']
+            self.pmax = meta['pmax']
+            self.pw.setYRange(self.pmin, self.pmax, padding=0)
+            # data: the buffer holds the last samples (configured size),
+            # the rest of the recording is read from the file when needed
+            self.buffersize = min(len(values), self.appsettings.value(
+                "Buffer", 1200, type=int))
+            self.chanbox.setValue(channel_count(values))
+            self.data.load(values[len(values) - self.buffersize:],
+                           total=len(values))
+            stored = 'lod_offset' in meta
+            if stored:
+                # pyramid stored with the recording
+                self.pyramid = LodPyramid.fromfile(fileName, meta, values)
+            else:
+                self.pyramid.reset()
+            self.tcp_thread.last_time = None
+            # (samples, channels) for any number of channels
+            self.recording = values.reshape(len(values), -1)
+            for stats in self.runstats:
+                stats.reset()
+            # whole recording, a chunk at a time
+            for start in range(0, len(values), self.load_chunk):
+                chunk = np.asarray(
+                    self.recording[start:start + self.load_chunk],
+                    dtype=float)
+                if not stored:
+                    self.pyramid.extend(chunk)
+                for stats, column in zip(self.runstats, chunk.T):
+                    stats.update(column)
+            self.plot_data()   # update display
+            self.statbutton.setEnabled(True)
+            self.chunk_size = self.buffersize
 
         else:
             QMessageBox.about(self, self.langstr[33],
                               f"Can't load file {fileName}\nBad file type!")
 
+    def start_recording(self):
+        """ ask for a file and start streaming samples to it """
+        options = QFileDialog.Options()
+        options |= QFileDialog.DontUseNativeDialog
+        fileName, _ = QFileDialog.getSaveFileName(self, 'Record to', "",
+                                                  """Datalogger Files
+                                                   (*.lfd);;All Files (*)""",
+                                                  options=options)
+        if not fileName:
+            return False
+        if not QFileInfo(fileName).suffix():
+            fileName += '.lfd'
+        meta = make_meta(self.mainlabel.text(), self.buffersize,
+                         self.sample_val.value(), self.units[self.unitsel],
+                         self.pmin, self.pmax, self.channels)
+        try:
+            lod_base = BASE if self.appsettings.value(
+                "StoreLod", True, type=bool) else None
+            self.recorder = StreamRecorder(fileName, meta, lod_base=lod_base)
+        except (OSError, ValueError) as e:
+            QMessageBox.about(self, self.langstr[33],
+                              f"Can't create file {fileName}\n{e}")
+            return False
+        self.recorder.start()
+        return True
+
+    def stop_recording(self, wait=False):
+        """ close recording file once pending samples are written """
+        if self.recorder is not None:
+            self.recorder.close()
+            if wait:
+                self.recorder.join()
+            self.recorder = None
+
     def clear_data(self):
         """ erase all data """
         # if not running, erase data and update display
         if self.btnstart.text() != self.langstr[25]:
-            for n in range(0, self.buffersize):
-                self.data[n] = 0
-            self.p1.setData(self.data)
+            self.data.clear()
+            self.recording = None
+            self.pyramid.reset()
+            self.chain.reset()
+            for stats in self.runstats:
+                stats.reset()
+            self.plot_data()
             self.count = self.chunk_size = 0
+            self.tcp_thread.last_time = None
 
 
 class TCPThread(QThread):
     """
         Thread for reading data from the network
+        Poll mode asks the server for every sample, streaming mode
+        subscribes once and receives batches of timestamped samples.
+        A stream restarted without clearing the data asks the server for
+        the samples missed since the last one received (backfill).
+        Messages are framed (see tools/netprotocol.py).
     """
-    # custom signal to return data
-    dataReady = pyqtSignal(float)
-    timer = TicTimer()
-    send_msg = "send".encode("utf-8")
+    # custom signal to return data (a value or an array of values)
+    dataReady = pyqtSignal(object)
+    # timer statistics (see DeadlineTimer.stats), about once a second
+    timing = pyqtSignal(dict)
+    send_msg = command("send")
 
     def __init__(self, parent=None):
         super(TCPThread, self).__init__(parent)
         self.threadactive = True
         self.parent = parent
         self.tic = 0.1
-        self.timer.start(self.tic)
+        self.timer = DeadlineTimer(self.tic)
+        self.streaming = False
+        self.reader = FrameReader()
+        # timestamp of the last sample received, None after a clear
+        self.last_time = None
 
     def run(self):
         self.threadactive = True
-        while self.threadactive:
-            if self.timer.is_finished():
-                self.parent.socket.sendall(self.send_msg)
-                data = self.parent.socket.recv(1024)
-                self.timer.start(self.tic)
-                data = data.decode('utf-8')
-                if data != '':
-                    value = float(data)
-                    self.dataReady.emit(value)
+        self.reader.reset()
+        try:
+            if self.streaming:
+                self.run_stream()
+            else:
+                self.run_poll()
+        except (OSError, ValueError) as e:
+            print("Network error: ", e)
+
+    def receive(self, sock):
+        """ values of the sample messages in the next bytes received,
+            None if the connection is closed
+        """
+        data = sock.recv(65536)
+        if not data:
+            return None
+        chunks = []
+        for kind, body in self.reader.feed(data):
+            if kind == SAMPLES:
+                times, values = split_samples(body)
+                if len(values):
+                    self.last_time = float(times[-1])
+                    chunks.append(values)
+        if not chunks:
+            return np.zeros((0,))
+        return np.concatenate(chunks)
+
+    def run_poll(self):
+        """ ask for every sample on a fixed timeline, sleeping in between """
+        sock = self.parent.socket
+        self.timer.set_period(self.tic)
+        self.timer.start()
+        last_report = time.perf_counter()
+        while self.threadactive and self.timer.wait():
+            sock.sendall(self.send_msg)
+            # wait for the whole reply
+            values = np.zeros((0,))
+            while not len(values):
+                values = self.receive(sock)
+                if values is None:
+                    return
+            self.dataReady.emit(values)
+            if time.perf_counter() - last_report >= 1:
+                self.timing.emit(self.timer.stats())
+                last_report = time.perf_counter()
+
+    def run_stream(self):
+        """ subscribe then read samples in bulk until stopped """
+        sock = self.parent.socket
+        request = f"stream {self.tic}"
+        if self.last_time is not None:
+            request += f" since {self.last_time!r}"
+        sock.sendall(command(request))
+        # don't block forever so that stop() is noticed
+        sock.settimeout(0.2)
+        try:
+            while self.threadactive:
+                try:
+                    values = self.receive(sock)
+                except socket.timeout:
+                    continue
+                if values is None:
+                    break       # connection closed by the server
+                if len(values):
+                    self.dataReady.emit(values)
+        finally:
+            sock.settimeout(None)
 
     def set_tic(self, tic):
         self.tic = tic
-        self.timer.start(self.tic)
+        self.timer.set_period(self.tic)
 
     def stop(self):
         """ stop sending data """
         self.threadactive = False
+        self.timer.cancel()
+        self.wait()
+
+
+class UDPThread(QThread):
+    """
+        Thread for reading samples sent in datagrams
+        The subscription is sent again every second, the server forgets
+        silent clients. Datagrams are put back in order and counted by
+        a SequenceTracker (see tools/netprotocol.py).
+    """
+    # custom signal to return data (array of values)
+    dataReady = pyqtSignal(object)
+    # datagram counters (see SequenceTracker.stats), about once a second
+    stats = pyqtSignal(dict)
+
+    def __init__(self, parent=None):
+        super(UDPThread, self).__init__(parent)
+        self.threadactive = True
+        self.parent = parent
+        self.tic = 0.1
+        self.tracker = SequenceTracker()
+
+    def run(self):
+        self.threadactive = True
+        self.tracker.reset()
+        sock = self.parent.socket
+        sock.settimeout(0.05)
+        request = command(f"stream {self.tic}")
+        last_request = 0
+        refused = False
+        try:
+            while self.threadactive:
+                times, values = np.zeros((0,)), np.zeros((0,))
+                if time.monotonic() - last_request >= 1:
+                    if refused:
+                        # a restarted server numbers datagrams from 0
+                        times, values = self.tracker.resync()
+                        refused = False
+                    try:
+                        sock.send(request)
+                    except ConnectionRefusedError:
+                        refused = True
+                    last_request = time.monotonic()
+                    self.stats.emit(self.tracker.stats())
+                if len(values):
+                    self.dataReady.emit(values)
+                try:
+                    times, values = self.tracker.feed(sock.recv(2048))
+                except socket.timeout:
+                    times, values = self.tracker.flush()
+                except ConnectionRefusedError:
+                    # server not (yet) running, keep asking
+                    refused = True
+                    continue
+                if len(values):
+                    self.dataReady.emit(values)
+            sock.send(command("close"))
+        except OSError as e:
+            print("Network error: ", e)
+        finally:
+            sock.settimeout(None)
+
+    def stop(self):
+        """ stop receiving data """
+        self.threadactive = False
         self.wait()
 
 
 class DataThread(QThread):
     """ Thread for reading serial data """
 
-    # custom signal to return data
-    dataReady = pyqtSignal(float)
+    # custom signal to return a chunk of samples (numpy array)
+    dataReady = pyqtSignal(object)
     isOpen = True
+    # minimum delay between two chunks (seconds)
+    interval = 0.02
 
     def __init__(self, parent=None):
         super(DataThread, self).__init__(parent)
         self.threadactive = True
         self.parent = parent
-        self.values = -1
+        self.decoder = AsciiDecoder()
 
     def run(self):
         """code to execute """
         self.threadactive = True
+        self.decoder.reset()
+        port = self.parent.serport
+        pending = []
+        last_emit = time.perf_counter()
         while self.threadactive:
-            try:
-                # read a string from serial and cast it to int
-                self.values = int(
-                    self.parent.serport.readline().decode('ascii'))
-                # envoi d'une valeur à afficher
-                self.dataReady.emit(self.values)
-            except (TypeError, ValueError):
-                # self.dataReady.emit(-1)
-                pass
+            # read whatever is available and parse complete lines
+            waiting = port.in_waiting
+            if waiting:
+                raw = port.read(waiting)
+            elif pending:
+                # don't block, pending values are due soon
+                self.msleep(1)
+                raw = b''
+            else:
+                raw = port.read(1)  # wait for data (port timeout)
+            values = self.decoder.feed(raw)
+            if len(values):
+                pending.append(values)
+            # send values at a bounded rate
+            now = time.perf_counter()
+            if pending and now - last_emit >= self.interval:
+                self.dataReady.emit(np.concatenate(pending))
+                pending = []
+                last_emit = now
+        # deliver values read before stop
+        if pending:
+            self.dataReady.emit(np.concatenate(pending))
 
     def stop(self):
         """ stop sending data """
@@ -17,12 +17,27 @@
 
 
 
-const int analogPin = A0; // Analog pin
+// Analog pins, the first `channels` ones are read
+const int analogPins[] = {A0, A1, A2, A3, A4, A5, A6, A7};
+const int MAX_CHANNELS = 8;
+int channels = 1;
 long delayTime = 1;     // Delay between readings
 long multiplier = 1000;      // Used to calculate delay
 String delayStr;          // Get delay from serial port commands
 String delayTmpStr;
 bool isRunning = false;
+bool binaryMode = false;  // send binary frames instead of ascii lines
+
+// Binary frame: 0xA5 0x5A, sequence counter, number of values,
+// FRAME_SAMPLES values (2 bytes, high byte first), checksum (xor of
+// every byte between sync and checksum)
+// With several channels a frame holds whole samples (one value per
+// channel, A0 first). In ascii mode a sample is one line, values are
+// separated by commas.
+const int FRAME_SAMPLES = 8;
+byte frame[4 + 2 * FRAME_SAMPLES + 1];
+byte frameSeq = 0;
+int frameCount = 0;
 
 /*******************************
    Initialise
@@ -51,15 +66,40 @@ void setParams() {
     multiplier = 60000;
     setDelay();
   }else if(delayStr.charAt(delayStr.length()-1) == 'R'){
+    // start in ascii mode, "4R" reads 4 channels
+    setChannels();
+    binaryMode = false;
+    isRunning = true;
+    return;
+  }else if(delayStr.charAt(delayStr.length()-1) == 'B'){
+    // start in binary mode, tell the host we can do it
+    setChannels();
+    Serial.println("BIN");
+    binaryMode = true;
+    frameCount = 0;
     isRunning = true;
     return;
   }else if(delayStr.charAt(delayStr.length()-1) == 'C'){
+    if(binaryMode){
+      sendFrame();
+    }
     isRunning = false;
     return;
   }
   
 }
 
+void setChannels() {
+
+  channels = delayStr.substring(0, delayStr.length()-1).toInt();
+  if(channels < 1){
+    channels = 1;
+  }else if(channels > MAX_CHANNELS){
+    channels = MAX_CHANNELS;
+  }
+
+}
+
 void setDelay() {
   
   delayTmpStr = delayStr.substring(0, delayStr.length()-1);
@@ -68,19 +108,73 @@ void setDelay() {
   
 }
 
+void sendFrame() {
+
+  if(frameCount == 0){
+    return;
+  }
+  for(int i = frameCount; i < FRAME_SAMPLES; i++){
+    frame[4 + 2 * i] = 0;
+    frame[5 + 2 * i] = 0;
+  }
+  frame[0] = 0xA5;
+  frame[1] = 0x5A;
+  frame[2] = frameSeq++;
+  frame[3] = frameCount;
+  byte checksum = 0;
+  for(int i = 2; i < 4 + 2 * FRAME_SAMPLES; i++){
+    checksum ^= frame[i];
+  }
+  frame[4 + 2 * FRAME_SAMPLES] = checksum;
+  Serial.write(frame, sizeof(frame));
+  frameCount = 0;
+
+}
+
+void addValue(int val) {
+
+  frame[4 + 2 * frameCount] = (val >> 8) & 0xff;
+  frame[5 + 2 * frameCount] = val & 0xff;
+  frameCount++;
+
+}
+
+void addSample() {
+
+  for(int i = 0; i < channels; i++){
+    addValue(analogRead(analogPins[i]));
+  }
+  // whole samples only, slow sampling: don't wait for a full frame
+  if(frameCount + channels > FRAME_SAMPLES || delayTime >= 20){
+    sendFrame();
+  }
+
+}
+
+void printSample() {
+
+  for(int i = 0; i < channels; i++){
+    if(i > 0){
+      Serial.print(',');
+    }
+    Serial.print(analogRead(analogPins[i]));
+  }
+  Serial.println();
+
+}
+
 /*********************************
    Main loop
  ********************************/
 void loop() {
 
   if(isRunning){
-    // Read analog pin
-    int val = analogRead(analogPin);
-    // Write analog value to serial port: (send an int with 3 bytes)
-//    Serial.write( 0xff );
-//    Serial.write( (val >> 8) & 0xff );
-//    Serial.write( val & 0xff );
-    Serial.println(val);
+    // Read analog pins and write values to serial port
+    if(binaryMode){
+      addSample();
+    }else{
+      printSample();
+    }
     //delay betwwen two data transmission
     delay(delayTime);  
   }
@@ -1,33 +1,76 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-import socket
-import threading
-import time
-import random
-import signal
+"""
+ Data server for datalogger2 (network mode).
 
+ A single sampling task feeds every client from a shared buffer: poll
+ clients get the latest sample, streaming clients get the samples on the
+ common timeline in batches. Clients that can't keep up lose their
+ oldest pending samples (counted) instead of slowing down the others.
+ Everything runs in one asyncio loop.
 
-class TicTimer():
-    """
-        A simple timer
-    """
-    start_time = 0
-    tic_time = 0
-    completed = False
+ Commands (see tools/netprotocol.py for the framing):
+    send            reply with the latest sample
+    stream period   push one sample every period (seconds, rounded to
+                    the server rate) until the client sends close
+    stream period since T
+    stream period last N
+                    replay the samples newer than timestamp T, or the
+                    last N samples, in bulk then stream without gap
+    history period since T
+    history period last N
+                    replay only
+    close           end connection
+ A replay is at most MAX_HISTORY samples (the newest ones). A bad
+ command is answered with "error <reason>" (a command frame, or a text
+ line), the connection stays open.
+ Former clients sending bare strings are still answered in text: a
+ number for send, batches of "timestamp value\\n" lines for stream.
 
-    def __init__(self, tic=0):
-        self.tic_time = tic
+ Gateway mode: the samples come from an Arduino running logger_sketch3
+ on a serial port instead of random values, so that several stations can
+ watch one board (python3 -m tools.fakearduino gives a fake one).
 
-    def start(self, tic):
-        if tic != 0:
-            self.tic = tic
-            self.start_time = time.perf_counter()
+ With --udp the same commands are accepted as datagrams on the same port
+ number, samples are sent back as numbered datagrams (stream must be sent
+ again every few seconds, silent clients are forgotten). Datagram loss and
+ reordering can be simulated with --udp-drop and --udp-reorder.
 
-    def is_finished(self):
-        if((time.perf_counter() - self.start_time) >= self.tic):
-            return True
-        return False
+ History comes from the shared buffer (--buffer samples), and from a file
+ holding every sample when --history-file is given (kept across restarts).
+
+ Usage : python3 server.py [--host localhost] [--port 5500] [--rate 1000]
+                           [--buffer 100000] [--history-file FILE]
+                           [--udp [--udp-drop 0.01] [--udp-reorder 0.01]]
+                           [--serial PORT [--baud 57600] [--sample 10m]
+                           [--binary]]
+"""
+
+import argparse
+import asyncio
+import collections
+import os
+import random
+import time
+import numpy as np
+import serial
+from tools.ringbuffer import RingBuffer
+from tools.decoders import FrameDecoder
+from tools.timing import ArrivalClock
+from tools.acquisition import start_board, sample_period
+from tools.recorder import StreamRecorder
+from tools.netprotocol import (FrameReader, COMMAND, command, samples,
+                               SAMPLE_DTYPE, read_command, datagrams)
+
+# samples due are published every BATCH_TIME seconds at most
+BATCH_TIME = 0.02
+# most samples in one block
+MAX_BATCH = 65536
+# most samples in one history message
+REPLAY_CHUNK = 1 << 19
+# most samples of a replay
+MAX_HISTORY = 1 << 22
 
 
 class GetData():
@@ -42,52 +85,653 @@ class GetData():
         self.data = str(random.randint(0, 1023)).encode("utf-8")
         return self.data
 
+    def get_values(self, nb):
+        """ nb values at once (numpy array) """
+        return np.random.randint(0, 1024, nb)
+
+
+def encode(times, values, framed):
+    """ samples message, framed or former text lines """
+    if framed:
+        return b''.join(samples(times[start:start + REPLAY_CHUNK],
+                                values[start:start + REPLAY_CHUNK])
+                        for start in range(0, len(values), REPLAY_CHUNK))
+    return "".join(f"{t:.6f} {v:g}\n"
+                   for t, v in zip(times, values)).encode("utf-8")
+
+
+class HistoryFile():
+    """ Every published sample, as (timestamp, value) records
+        Records are appended by a StreamRecorder thread and read back with
+        np.memmap. Timestamps are searched with a binary search, they
+        must increase (wall clock) across server runs.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        if os.path.exists(filename):
+            # a crash may have left a partial record, later ones would
+            # be misaligned
+            size = os.path.getsize(filename)
+            whole = size // SAMPLE_DTYPE.itemsize * SAMPLE_DTYPE.itemsize
+            if whole != size:
+                os.truncate(filename, whole)
+        self.recorder = StreamRecorder(filename, dtype=SAMPLE_DTYPE,
+                                       append=True)
+        self.recorder.start()
+        self.reported = False   # write error printed
+
+    def write(self, times, values):
+        if self.recorder.error is not None and not self.reported:
+            print(f"Can't write history file {self.filename}: "
+                  f"{self.recorder.error}")
+            self.reported = True
+        records = np.empty(len(values), dtype=SAMPLE_DTYPE)
+        records['t'] = times
+        records['v'] = values
+        self.recorder.write(records)
+
+    def read(self, before, step=1, skip=0, since=None, last=None):
+        """ (times, values) older than timestamp before, one every step
+            once the skip newest ones are left out, newer than since or
+            the last ones only
+        """
+        size = os.path.getsize(self.filename) // SAMPLE_DTYPE.itemsize
+        if size == 0:
+            return np.zeros((0,)), np.zeros((0,))
+        records = np.memmap(self.filename, dtype=SAMPLE_DTYPE, mode='r',
+                            shape=(size,))
+        end = int(np.searchsorted(records['t'], before)) - skip
+        start = 0
+        if since is not None:
+            start = int(np.searchsorted(records['t'], since, side='right'))
+        if last is not None:
+            start = max(start, end - last * step)
+        if end <= start:
+            return np.zeros((0,)), np.zeros((0,))
+        records = np.array(records[start:end][::-1][::step][::-1])
+        return records['t'], records['v']
+
+    def close(self):
+        self.recorder.close()
+        self.recorder.join()
+
+
+class Block():
+    """ samples published at once
+        Encoded messages are cached: subscribers asking for the same
+        period share them.
+    """
+
+    def __init__(self, index, times, values):
+        self.index = index      # number of the first sample since start
+        self.times = times
+        self.values = values
+        self.cache = {}
+
+    def select(self, step):
+        """ (times, values) of the samples kept when sending one every
+            step samples of the common timeline
+        """
+        offset = (-self.index) % step
+        return self.times[offset::step], self.values[offset::step]
+
+    def encode(self, step, framed):
+        key = (step, framed)
+        if key not in self.cache:
+            times, values = self.select(step)
+            self.cache[key] = encode(times, values, framed) \
+                if len(values) else b''
+        return self.cache[key]
+
+
+class Hub():
+    """ Shared buffer of the newest samples, and fan out to subscribers """
+
+    def __init__(self, rate, size=100000, archive=None):
+        self.rate = rate
+        self.times = RingBuffer(size)
+        self.values = RingBuffer(size)
+        # HistoryFile or None
+        self.archive = archive
+        self.total = 0
+        self.subscribers = set()
+        self.ready = asyncio.Event()
 
-# ------------------------------------------
-class ThreadForClient(threading.Thread):
-    """ Thread for managing a client """
-    data = GetData()
+    def publish(self, times, values):
+        """ add samples, queue them for every subscriber """
+        block = Block(self.total, np.asarray(times, dtype=float),
+                      np.asarray(values, dtype=float))
+        self.total += len(block.values)
+        self.times.extend(block.times)
+        self.values.extend(block.values)
+        if self.archive is not None:
+            self.archive.write(block.times, block.values)
+        for subscriber in self.subscribers:
+            subscriber.push(block)
+        self.ready.set()
 
-    def __init__(self, conn):
-        threading.Thread.__init__(self)
-        self.conn = conn
+    def latest(self):
+        """ (timestamp, value) of the newest sample """
+        return self.times.last(), self.values.last()
+
+    def step(self, period):
+        """ samples of the common timeline between two sent samples """
+        return max(1, round(period * self.rate))
+
+    def history(self, step, since=None, last=None):
+        """ (times, values, older) of past samples, one every step (same
+            ones as a stream), newer than timestamp since or the last ones
+            only, at most MAX_HISTORY (the newest). times and values are
+            copied from the shared buffer; older() reads the samples
+            before them from the history file (slow: call it in an
+            executor), None when none are needed.
+        """
+        times = self.times.valid()
+        values = self.values.valid()
+        oldest = times[0] if len(times) else np.inf
+        offset = (-(self.total - len(values))) % step
+        times, values = times[offset::step], values[offset::step]
+        limit = MAX_HISTORY if last is None else min(last, MAX_HISTORY)
+        start = max(0, len(times) - limit)
+        if since is not None:
+            start = max(start, int(np.searchsorted(times, since,
+                                                   side='right')))
+        times, values = times[start:].copy(), values[start:].copy()
+        # the file is only searched for samples older than the buffer
+        if since is not None:
+            missing = since < oldest
+        else:
+            missing = last is not None and len(values) < last
+        if self.archive is None or not missing or len(values) >= limit:
+            return times, values, None
+        # keep the step between file and buffer samples
+        skip = step - 1 - offset if np.isfinite(oldest) else 0
+        archive = self.archive
+        count = limit - len(values)
+        return times, values, \
+            lambda: archive.read(oldest, step, skip, since, count)
+
+
+class Subscriber():
+    """ Blocks waiting to be sent to a streaming client
+        At most max_samples (of the common timeline) wait: when the
+        client is too slow the oldest blocks are dropped and counted,
+        so memory stays bounded and the client gets recent data again
+        as soon as it catches up.
+    """
 
-    def run(self):
+    def __init__(self, step, framed, max_samples):
+        self.step = step
+        self.framed = framed
+        self.max_samples = max_samples
+        self.pending = collections.deque()
+        self.pending_samples = 0
+        self.event = asyncio.Event()
+        self.sent = 0
+        self.dropped = 0
+
+    def push(self, block):
+        self.pending.append(block)
+        self.pending_samples += len(block.values)
+        while self.pending_samples > self.max_samples and \
+                len(self.pending) > 1:
+            old = self.pending.popleft()
+            self.pending_samples -= len(old.values)
+            self.dropped += len(old.select(self.step)[1])
+        self.event.set()
+
+    async def send_to(self, writer):
+        """ writer loop: send pending blocks as they come """
+        try:
+            while True:
+                await self.event.wait()
+                self.event.clear()
+                blocks = list(self.pending)
+                self.pending.clear()
+                self.pending_samples = 0
+                data = b''.join(block.encode(self.step, self.framed)
+                                for block in blocks)
+                self.sent += sum(len(block.select(self.step)[1])
+                                 for block in blocks)
+                if data:
+                    writer.write(data)
+                    await writer.drain()
+        except ConnectionError:
+            pass
+
+
+class UdpSubscriber():
+    """ A UDP client, published samples are sent at once as datagrams
+        drop and reorder are probabilities (per datagram) of simulated
+        loss and swap with the next datagram, for tests.
+    """
+
+    def __init__(self, transport, address, step, drop=0.0, reorder=0.0):
+        self.transport = transport
+        self.address = address
+        self.step = step
+        self.drop = drop
+        self.reorder = reorder
+        self.seq = 0
+        self.sent = 0
+        self.dropped = 0        # simulated losses
+        self.held = None
+        self.last_seen = time.monotonic()
+
+    def push(self, block):
+        times, values = block.select(self.step)
+        packets = datagrams(self.seq, times, values)
+        self.seq += len(packets)
+        self.sent += len(values)
+        for packet in packets:
+            if random.random() < self.drop:
+                self.dropped += 1
+                continue
+            if self.held is None and random.random() < self.reorder:
+                self.held = packet
+                continue
+            self.transport.sendto(packet, self.address)
+            if self.held is not None:
+                self.transport.sendto(self.held, self.address)
+                self.held = None
+
+
+class UdpServer(asyncio.DatagramProtocol):
+    """ Commands received as datagrams, one subscriber per address
+        Subscribers that didn't send stream for `timeout` seconds are
+        removed.
+    """
+
+    def __init__(self, hub, drop=0.0, reorder=0.0, timeout=5.0):
+        self.hub = hub
+        self.drop = drop
+        self.reorder = reorder
+        self.timeout = timeout
+        self.clients = {}
+        self.transport = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, address):
+        value = read_command(data)
+        if value is None:
+            return
+        if value == "close":
+            self.remove(address)
+        elif value == "send" and self.hub.total:
+            timestamp, sample = self.hub.latest()
+            self.transport.sendto(datagrams(0, [timestamp], [sample])[0],
+                                  address)
+        elif value.startswith("stream "):
+            try:
+                step = self.hub.step(float(value.split()[1]))
+            except (ValueError, IndexError):
+                print(">>> Bad stream period!")
+                return
+            client = self.clients.get(address)
+            if client is None:
+                print(f">>> [CONNECTING] new UDP client from {address}")
+                client = UdpSubscriber(self.transport, address, step,
+                                       self.drop, self.reorder)
+                self.clients[address] = client
+                self.hub.subscribers.add(client)
+            client.step = step
+            client.last_seen = time.monotonic()
+
+    def remove(self, address):
+        client = self.clients.pop(address, None)
+        if client is not None:
+            self.hub.subscribers.discard(client)
+            print(f">>> [CLOSING] UDP {address}: {client.sent} samples "
+                  f"sent, {client.dropped} dropped (simulated)")
+
+    async def expire(self):
+        """ forget silent clients """
         while True:
+            await asyncio.sleep(1)
+            now = time.monotonic()
+            for address, client in list(self.clients.items()):
+                if now - client.last_seen > self.timeout:
+                    self.remove(address)
+
+
+class RandomSource():
+    """ GetData values on a grid of rate samples per second
+        The task wakes up every BATCH_TIME (or every sample for slow
+        rates) and publishes every sample due at once.
+    """
+
+    def __init__(self, hub, rate):
+        self.hub = hub
+        self.rate = rate
+        self.data = GetData()
+
+    async def run(self):
+        period = 1 / self.rate
+        wakeup = max(period, BATCH_TIME)
+        start = time.monotonic()
+        start_time = time.time()
+        tick = sent = 0
+        while True:
+            tick += 1
+            await asyncio.sleep(max(0.0, start + tick * wakeup
+                                    - time.monotonic()))
+            due = int((time.monotonic() - start) / period) + 1
+            due = min(due, sent + MAX_BATCH)
+            if due > sent:
+                self.hub.publish(start_time + np.arange(sent, due) * period,
+                                 self.data.get_values(due - sent))
+                sent = due
+
+
+class SerialSource():
+    """ Samples of an Arduino running logger_sketch3 (gateway mode)
+        The port is read from a worker thread with the decoders used by
+        DataThread; chunks are published in the event loop. The sketch
+        doesn't timestamp samples: a chunk gets timestamps one sample
+        period apart (less if needed to stay in order) ending at its
+        arrival time. Values are sent raw, clients apply their filter.
+    """
+
+    def __init__(self, hub, port, baudrate=57600, sample='10m',
+                 binary=False):
+        self.hub = hub
+        self.sample = sample
+        self.binary = binary
+        self.clock = ArrivalClock(sample_period(sample))
+        hub.rate = 1 / self.clock.period
+        self.serport = serial.Serial(port, baudrate, timeout=1)
+        self.decoder = None
+        self.active = True
+
+    def read_loop(self, loop):
+        """ worker thread: read, decode and publish chunks """
+        pending = []
+        last = time.monotonic()
+        try:
+            self.decoder = start_board(self.serport, self.sample,
+                                       self.binary)
+            if self.binary and not isinstance(self.decoder, FrameDecoder):
+                print("No binary mode, using ascii")
+            while self.active:
+                values = self.decoder.feed(
+                    self.serport.read(self.serport.in_waiting or 1))
+                if len(values):
+                    pending.append(values)
+                if pending and time.monotonic() - last >= BATCH_TIME:
+                    values = np.concatenate(pending)
+                    pending = []
+                    loop.call_soon_threadsafe(
+                        self.hub.publish, self.clock.stamp(len(values)),
+                        values)
+                    last = time.monotonic()
+        finally:
+            self.serport.write(b'C')
+            self.serport.close()
+            if isinstance(self.decoder, FrameDecoder):
+                print(f">>> Serial: {self.decoder.errors} bad frames, "
+                      f"{self.decoder.lost} lost frames")
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(None, self.read_loop, loop)
+        finally:
+            # stops the thread when the server exits
+            self.active = False
+
+
+class Connection():
+    """ Commands of one client """
+
+    def __init__(self, hub, reader, writer, queue_time):
+        self.hub = hub
+        self.reader = reader
+        self.writer = writer
+        self.queue_time = queue_time
+        self.frames = FrameReader()
+        self.framed = None
+        self.subscriber = None
+        self.task = None
+
+    async def commands(self):
+        """ commands received, until the connection is closed """
+        while True:
+            data = await self.reader.read(65536)
+            if not data:
+                return
+            if self.framed is None:
+                # frames start with a null byte (length), text doesn't
+                self.framed = data[:1] == b'\x00'
+            if not self.framed:
+                yield data.decode("utf-8")
+                continue
+            for kind, body in self.frames.feed(data):
+                if kind == COMMAND:
+                    yield body.decode("utf-8")
+
+    async def run(self):
+        async for value in self.commands():
+            if value == "close":
+                break
             try:
-                value = self.conn.recv(1024)
-                value = value.decode("utf-8")
-                if value == "close":
-                    break
-                elif value == "send":
-                    self.conn.sendall(self.data.get_value())
+                if value == "send":
+                    await self.send_latest()
+                elif value.startswith("stream "):
+                    self.start_stream(*self.parse_request(value))
+                elif value.startswith("history "):
+                    await self.send_history(*self.parse_request(value))
                 else:
-                    print(">>> Bad command!")
-            except (ConnectionResetError, BrokenPipeError) as e:
-                print(">>> ", e, " exiting...")
-                break
-        self.conn.close()
-# ------------------------------------------
+                    raise ValueError("Bad command!")
+            except ValueError as e:
+                print(">>> ", e)
+                await self.send_error(e)
+
+    def parse_request(self, value):
+        """ period and history range (since, last) of a stream or
+            history command
+        """
+        words = value.split()
+        period = float(words[1]) if len(words) > 1 else 0
+        if period <= 0:
+            raise ValueError("Bad stream period!")
+        since = last = None
+        if len(words) == 4 and words[2] == "since":
+            since = float(words[3])
+        elif len(words) == 4 and words[2] == "last":
+            last = max(int(words[3]), 0)
+        elif len(words) != 2:
+            raise ValueError("Bad history range!")
+        return period, since, last
+
+    async def send_error(self, error):
+        if self.framed:
+            self.writer.write(command(f"error {error}"))
+        else:
+            self.writer.write(f"error {error}\n".encode("utf-8"))
+        await self.writer.drain()
+
+    async def send_samples(self, times, values):
+        """ samples in messages of REPLAY_CHUNK samples, the client reads
+            one before the next is encoded
+        """
+        for start in range(0, len(values), REPLAY_CHUNK):
+            stop = start + REPLAY_CHUNK
+            self.writer.write(encode(times[start:stop], values[start:stop],
+                                     self.framed))
+            await self.writer.drain()
+
+    async def send_history(self, period, since, last):
+        if since is None and last is None:
+            return
+        await self.send_stored(*self.hub.history(self.hub.step(period),
+                                                 since, last))
+
+    async def send_stored(self, times, values, older):
+        """ send a history: the file part, read in a thread (the loop
+            goes on publishing meanwhile), then the buffer part
+        """
+        if older is not None:
+            old_times, old_values = \
+                await asyncio.get_running_loop().run_in_executor(None, older)
+            await self.send_samples(old_times, old_values)
+        await self.send_samples(times, values)
 
+    async def send_latest(self):
+        await self.hub.ready.wait()
+        timestamp, value = self.hub.latest()
+        if self.framed:
+            self.writer.write(samples([timestamp], [value]))
+        else:
+            self.writer.write(f"{value:g}".encode("utf-8"))
+        await self.writer.drain()
 
-host, port = ('localhost', 5500)
+    def start_stream(self, period, since=None, last=None):
+        if self.subscriber is not None:
+            return
+        step = self.hub.step(period)
+        self.subscriber = Subscriber(
+            step, self.framed,
+            max(int(self.queue_time * self.hub.rate), MAX_BATCH))
+        # history and subscription in the same step of the event loop:
+        # no sample missed or sent twice in between. New blocks wait in
+        # the subscriber while the history is sent.
+        history = np.zeros((0,)), np.zeros((0,)), None
+        if since is not None or last is not None:
+            history = self.hub.history(step, since, last)
+        self.hub.subscribers.add(self.subscriber)
+        self.task = asyncio.create_task(self.send_stream(*history))
 
-socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-socket.bind((host, port))
-print(">>> [STARTING] server is starting...")
+    async def send_stream(self, times, values, older):
+        try:
+            await self.send_stored(times, values, older)
+        except ConnectionError:
+            return
+        await self.subscriber.send_to(self.writer)
 
-try:
-    while True:
-        socket.listen(5)
-        print(f">>> [LISTENING] server is listening on {host} (CTL+C to exit)")
-        conn, address = socket.accept()
+    def stop_stream(self):
+        if self.subscriber is not None:
+            self.hub.subscribers.discard(self.subscriber)
+            self.task.cancel()
+
+
+class Server():
+    """ Accept clients and run the sampling task """
+
+    def __init__(self, host, port, rate, queue_time=2.0, buffersize=100000,
+                 serial_config=None, history_file=None, udp_config=None):
+        self.host = host
+        self.port = port
+        self.rate = rate
+        self.queue_time = queue_time
+        self.buffersize = buffersize
+        self.history_file = history_file
+        # UdpServer options (drop, reorder), no UDP if None
+        self.udp_config = udp_config
+        # SerialSource arguments, random values if None
+        self.serial_config = serial_config
+        self.clients = 0
+
+    async def handle_client(self, reader, writer):
+        address = writer.get_extra_info('peername')
         print(f">>> [CONNECTING] new client from {address}")
-        my_thread = ThreadForClient(conn)
-        my_thread.start()
-        print(">>> Number of connected clients: " +
-            str(threading.active_count() - 1) + "\n")
-except KeyboardInterrupt:
-    print(">>> Keyboard interrupt caught!")
-    socket.close()
-finally:
-    print(">>> [STOPING] server stoping...")
+        self.clients += 1
+        print(f">>> Number of connected clients: {self.clients}")
+        connection = Connection(self.hub, reader, writer, self.queue_time)
+        try:
+            await connection.run()
+        except (ConnectionError, ValueError) as e:
+            print(">>> ", e, " exiting...")
+        finally:
+            connection.stop_stream()
+            writer.close()
+            self.clients -= 1
+            subscriber = connection.subscriber
+            if subscriber is not None:
+                print(f">>> [CLOSING] {address}: {subscriber.sent} samples "
+                      f"sent, {subscriber.dropped} dropped")
+
+    async def run(self):
+        archive = None
+        if self.history_file:
+            archive = HistoryFile(self.history_file)
+        self.hub = Hub(self.rate, self.buffersize, archive)
+        transport = None
+        try:
+            if self.serial_config is not None:
+                source = SerialSource(self.hub, **self.serial_config)
+            else:
+                source = RandomSource(self.hub, self.rate)
+            tasks = [source.run()]
+            if self.udp_config is not None:
+                transport, udp = await \
+                    asyncio.get_running_loop().create_datagram_endpoint(
+                        lambda: UdpServer(self.hub, **self.udp_config),
+                        local_addr=(self.host, self.port))
+                tasks.append(udp.expire())
+            server = await asyncio.start_server(self.handle_client,
+                                                self.host, self.port)
+            print(f">>> [LISTENING] server is listening on {self.host}:"
+                  f"{self.port} (CTL+C to exit)")
+            async with server:
+                await asyncio.gather(server.serve_forever(), *tasks)
+        finally:
+            if transport is not None:
+                transport.close()
+            if archive is not None:
+                archive.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="datalogger data server")
+    parser.add_argument('--host', default='localhost')
+    parser.add_argument('--port', type=int, default=5500)
+    parser.add_argument('--rate', type=float, default=1000,
+                        help="samples per second")
+    parser.add_argument('--queue', type=float, default=2.0,
+                        help="seconds of samples kept for a slow client")
+    parser.add_argument('--buffer', type=int, default=100000,
+                        help="samples kept in the shared buffer")
+    parser.add_argument('--serial', metavar='PORT',
+                        help="serve an Arduino on PORT (gateway mode)")
+    parser.add_argument('--baud', type=int, default=57600)
+    parser.add_argument('--sample', default='10m',
+                        help="sample period sent to the Arduino "
+                        "(10m = 10 ms, 2s, 1M = 1 minute)")
+    parser.add_argument('--binary', action='store_true',
+                        help="ask the Arduino for binary frames")
+    parser.add_argument('--history-file', metavar='FILE',
+                        help="also keep every sample in FILE for history "
+                        "requests")
+    parser.add_argument('--udp', action='store_true',
+                        help="also serve UDP clients on the same port")
+    parser.add_argument('--udp-drop', type=float, default=0.0,
+                        help="simulated datagram loss (probability)")
+    parser.add_argument('--udp-reorder', type=float, default=0.0,
+                        help="simulated datagram swaps (probability)")
+    args = parser.parse_args()
+
+    serial_config = None
+    if args.serial:
+        serial_config = {'port': args.serial, 'baudrate': args.baud,
+                         'sample': args.sample, 'binary': args.binary}
+    udp_config = None
+    if args.udp:
+        udp_config = {'drop': args.udp_drop, 'reorder': args.udp_reorder}
+    print(">>> [STARTING] server is starting...")
+    try:
+        asyncio.run(Server(args.host, args.port, args.rate, args.queue,
+                           args.buffer, serial_config,
+                           args.history_file, udp_config).run())
+    except KeyboardInterrupt:
+        print(">>> Keyboard interrupt caught!")
+    except (serial.SerialException, OSError, ValueError) as e:
+        print(">>> ", e)
+    finally:
+        print(">>> [STOPING] server stoping...")
+
+
+if __name__ == '__main__':
+    main()
@@ -126,9 +126,11 @@ class ClickableLabel(QLabel):
 class EditorDialog(QDialog):
     """ Open a text editor
         Pass file name as an argument or use controls to load files
+        saved gives the path of every file written
     """
 
     clicked = pyqtSignal(bool)
+    saved = pyqtSignal(str)
 
     def __init__(self, parent=None):
         super(EditorDialog, self).__init__()
@@ -294,6 +296,7 @@ class EditorDialog(QDialog):
         else:
             self.path = path
             self.update_title()
+            self.saved.emit(path)
 
     def file_print(self):
         dlg = QPrintDialog()
@@ -0,0 +1,447 @@
+# -*- coding: utf-8 -*-
+
+"""
+
+ Project     : The poorman's data logger.
+ File        : tools/acquisition.py
+ Version     : 1.0
+ Description : Read several boards and network nodes at the same time
+               from a single thread.
+
+
+ This program is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ This program is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import selectors
+import socket
+import threading
+import time
+import numpy as np
+import serial
+from tools.ringbuffer import RingBuffer
+from tools.decoders import AsciiDecoder, FrameDecoder
+from tools.timing import ArrivalClock
+from tools.netprotocol import (command, split_samples, FrameReader, SAMPLES,
+                               SequenceTracker)
+
+# sketch sampling units
+MULTIPLIERS = {'m': 0.001, 's': 1, 'M': 60}
+# clock offset estimates follow drifts of up to LEAK s/s
+LEAK = 1e-4
+
+
+def sample_period(sample):
+    """ seconds of a sketch sample setting: 10m (ms), 2s, 1M (minutes) """
+    if sample[-1:] not in MULTIPLIERS:
+        raise ValueError(f"Bad sample period {sample}, "
+                         "use <number>m, s or M")
+    return max(float(sample[:-1]), 1) * MULTIPLIERS[sample[-1]]
+
+
+def start_board(serport, sample, binary=False, channels=1):
+    """ configure and start an Arduino running logger_sketch3, as
+        MainWindow does, return the decoder for its data (an AsciiDecoder
+        if binary frames were asked for and the board has no binary mode)
+    """
+    serport.write(sample.encode('ascii'))
+    # the sketch reads settings until its 1 s timeout
+    serport.readline()
+    # "4R" reads 4 channels, plain "R" for older sketches
+    prefix = str(channels).encode('ascii') if channels > 1 else b''
+    if binary:
+        timeout = serport.timeout
+        serport.timeout = 2
+        serport.write(prefix + b'B')
+        reply = serport.readline()
+        serport.timeout = timeout
+        if reply.strip() == b'BIN':
+            return FrameDecoder(channels)
+    serport.write(prefix + b'R')
+    return AsciiDecoder(channels)
+
+
+class Source():
+    """ Common part of the sources: buffers, clock offset, counters
+        Subclasses open their port in open() (may block, called from a
+        helper thread), give a selectable object in fileobj(), return
+        (times, values) from read() when it is readable and from tick()
+        called periodically.
+        Timestamps of remote nodes come from their own clock: offset is
+        the lower envelope of (arrival - timestamp), i.e. the clock
+        difference plus the smallest transport delay, and times + offset
+        puts every source on the local time base.
+    """
+
+    kind = ''
+
+    def __init__(self, address, size=100000):
+        self.address = address
+        self.name = f'{self.kind} {address}'
+        self.times = RingBuffer(size)
+        self.values = RingBuffer(size)
+        self.offset = None
+        self.last_arrival = None
+        self.lost = 0
+        self.status = 'opening'
+
+    def store(self, times, values, now):
+        """ add samples received at now (wall clock) """
+        if not len(values):
+            return
+        delay = now - times[-1]
+        if self.offset is None:
+            self.offset = delay
+        else:
+            leak = LEAK * (now - self.last_arrival)
+            self.offset = min(self.offset + leak, delay)
+        self.last_arrival = now
+        self.times.extend(times)
+        self.values.extend(values)
+
+    def open(self):
+        pass
+
+    def fileobj(self):
+        return None
+
+    def read(self):
+        return np.zeros((0,)), np.zeros((0,))
+
+    def tick(self, now):
+        return np.zeros((0,)), np.zeros((0,))
+
+    def close(self):
+        pass
+
+
+class SerialSource(Source):
+    """ Arduino running logger_sketch3
+        Where serial ports can't be selected (Windows: sockets only), a
+        relay thread copies the port to a socket pair read by the loop.
+    """
+
+    kind = 'Serial'
+
+    def __init__(self, port, baudrate=57600, sample='10m', binary=False,
+                 size=100000):
+        super(SerialSource, self).__init__(port, size)
+        self.baudrate = baudrate
+        self.sample = sample
+        self.binary = binary
+        self.clock = ArrivalClock(sample_period(sample))
+        self.serport = None
+        self.decoder = None
+        self.pipe = None        # relay socket
+
+    def open(self):
+        self.serport = serial.Serial(self.address, self.baudrate, timeout=1)
+        self.decoder = start_board(self.serport, self.sample, self.binary)
+        if self.binary and not isinstance(self.decoder, FrameDecoder):
+            self.status = 'running (no binary mode, ascii)'
+        if hasattr(self.serport, 'fileno'):
+            # reads from the selector loop never wait
+            self.serport.timeout = 0
+            return
+        self.pipe, feed = socket.socketpair()
+        self.pipe.setblocking(False)
+        threading.Thread(target=self._relay, args=(feed,),
+                         daemon=True).start()
+
+    def _relay(self, feed):
+        """ relay thread: port to socket until the port is closed """
+        try:
+            while self.serport.is_open:
+                data = self.serport.read(max(self.serport.in_waiting, 1))
+                if data:
+                    feed.sendall(data)
+        except Exception:
+            pass
+        finally:
+            feed.close()
+
+    def fileobj(self):
+        return self.pipe if self.pipe is not None \
+            else self.serport.fileno()
+
+    def read(self):
+        if self.pipe is not None:
+            data = self.pipe.recv(65536)
+            if not data:
+                raise ConnectionResetError('serial port closed')
+        else:
+            data = self.serport.read(max(self.serport.in_waiting, 1))
+        values = self.decoder.feed(data)
+        if isinstance(self.decoder, FrameDecoder):
+            self.lost = self.decoder.lost
+        return self.clock.stamp(len(values)), values
+
+    def close(self):
+        if self.serport is not None and self.serport.is_open:
+            try:
+                self.serport.write(b'C')
+            except OSError:
+                pass
+            self.serport.close()
+        if self.pipe is not None:
+            self.pipe.close()
+
+
+class TcpSource(Source):
+    """ server.py (or gateway) stream, framed messages """
+
+    kind = 'TCP'
+
+    def __init__(self, host, port, period=0.01, size=100000):
+        super(TcpSource, self).__init__(f'{host}:{port}', size)
+        self.host = host
+        self.port = port
+        self.period = period
+        self.reader = FrameReader()
+        self.sock = None
+
+    def open(self):
+        self.sock = socket.create_connection((self.host, self.port),
+                                             timeout=5)
+        self.sock.sendall(command(f"stream {self.period}"))
+        self.sock.setblocking(False)
+
+    def fileobj(self):
+        return self.sock
+
+    def read(self):
+        data = self.sock.recv(65536)
+        if not data:
+            raise ConnectionResetError('connection closed by the server')
+        chunks = [split_samples(body) for kind, body
+                  in self.reader.feed(data) if kind == SAMPLES]
+        if not chunks:
+            return np.zeros((0,)), np.zeros((0,))
+        return (np.concatenate([chunk[0] for chunk in chunks]),
+                np.concatenate([chunk[1] for chunk in chunks]))
+
+    def close(self):
+        if self.sock is not None:
+            try:
+                self.sock.setblocking(True)
+                self.sock.sendall(command("close"))
+            except OSError:
+                pass
+            self.sock.close()
+
+
+class UdpSource(Source):
+    """ server.py --udp datagrams """
+
+    kind = 'UDP'
+
+    def __init__(self, host, port, period=0.01, size=100000):
+        super(UdpSource, self).__init__(f'{host}:{port}', size)
+        self.host = host
+        self.port = port
+        self.period = period
+        self.tracker = SequenceTracker()
+        self.last_request = 0
+        self.refused = False    # server not running when last asked
+        self.sock = None
+
+    def open(self):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.connect((self.host, self.port))
+        self.sock.setblocking(False)
+
+    def fileobj(self):
+        return self.sock
+
+    def read(self):
+        chunks = []
+        # every datagram waiting
+        for _ in range(64):
+            try:
+                chunks.append(self.tracker.feed(self.sock.recv(2048)))
+            except BlockingIOError:
+                break
+            except ConnectionRefusedError:
+                self.refused = True
+                break
+        self.lost = self.tracker.lost
+        return (np.concatenate([chunk[0] for chunk in chunks]),
+                np.concatenate([chunk[1] for chunk in chunks])) \
+            if chunks else (np.zeros((0,)), np.zeros((0,)))
+
+    def tick(self, now):
+        # the server forgets silent clients
+        chunk = None
+        if now - self.last_request >= 1:
+            if self.refused:
+                # a restarted server numbers datagrams from 0
+                chunk = self.tracker.resync()
+                self.refused = False
+            try:
+                self.sock.send(command(f"stream {self.period}"))
+            except OSError:
+                pass
+            self.last_request = now
+        return chunk or self.tracker.flush()
+
+    def close(self):
+        if self.sock is not None:
+            try:
+                self.sock.send(command("close"))
+            except OSError:
+                pass
+            self.sock.close()
+
+
+class AcquisitionEngine(threading.Thread):
+    """ Read any number of sources from one selector loop
+        Usage : engine = AcquisitionEngine(transform=my_filter)
+                engine.start()
+                engine.add(SerialSource('/dev/ttyUSB0', sample='10m'))
+                engine.add(TcpSource('localhost', 5500, 0.01))
+                ...
+                for source, times, values in engine.snapshot():
+                    plot(times - engine.start_time, values)
+                ...
+                engine.stop()
+        Ports are opened by short lived helper threads (opening a board
+        takes about a second) then handed to the loop. Each source keeps
+        its samples and timestamps; snapshot() returns them on the local
+        time base. A failing source is closed, its status tells why,
+        the others go on.
+    """
+
+    def __init__(self, transform=None):
+        super(AcquisitionEngine, self).__init__(daemon=True)
+        # applied to every chunk of values (filter), None for raw values
+        self.transform = transform
+        self.selector = selectors.DefaultSelector()
+        self.sources = []
+        self.lock = threading.Lock()
+        self.opened = []
+        self.removed = []
+        self.active = True
+        self.start_time = time.time()
+        self.wakeup, self.waker = socket.socketpair()
+        self.wakeup.setblocking(False)
+
+    def add(self, source):
+        """ open source in the background, then read it """
+        with self.lock:
+            self.sources.append(source)
+        threading.Thread(target=self._open, args=(source,),
+                         daemon=True).start()
+
+    def _open(self, source):
+        try:
+            source.open()
+        except Exception as e:
+            source.status = f'error: {e}'
+            try:
+                source.close()
+            except Exception:
+                pass
+            return
+        with self.lock:
+            self.opened.append(source)
+        self.waker.send(b'x')
+
+    def remove(self, source):
+        """ close source and forget it """
+        with self.lock:
+            if source in self.sources:
+                self.sources.remove(source)
+            self.removed.append(source)
+        self.waker.send(b'x')
+
+    def stop(self):
+        self.active = False
+        self.waker.send(b'x')
+        self.join()
+
+    def snapshot(self):
+        """ [(source, times on the local time base, values)] (copies) """
+        with self.lock:
+            return [(source, source.times.valid() + (source.offset or 0.0),
+                     source.values.valid().copy())
+                    for source in self.sources]
+
+    def _store(self, source, times, values, now):
+        if not len(values):
+            return
+        if self.transform is not None:
+            values = self.transform(values)
+        with self.lock:
+            source.store(times, values, now)
+
+    def _close(self, source, status):
+        try:
+            self.selector.unregister(source.fileobj())
+        except Exception:
+            pass
+        try:
+            source.close()
+        except Exception:
+            pass
+        source.status = status
+
+    def _changes(self):
+        """ register opened sources, close removed ones """
+        with self.lock:
+            opened, self.opened = self.opened, []
+            removed, self.removed = self.removed, []
+            # removed while opening
+            dropped = [source for source in opened
+                       if source not in self.sources]
+        for source in removed + dropped:
+            self._close(source, 'removed')
+        for source in opened:
+            if source not in dropped:
+                try:
+                    self.selector.register(source.fileobj(),
+                                           selectors.EVENT_READ, source)
+                except Exception as e:
+                    self._close(source, f'error: {e}')
+                    continue
+                if source.status == 'opening':
+                    source.status = 'running'
+
+    def run(self):
+        self.selector.register(self.wakeup, selectors.EVENT_READ, None)
+        try:
+            while self.active:
+                events = self.selector.select(0.05)
+                now = time.time()
+                for key, _ in events:
+                    source = key.data
+                    if source is None:
+                        self.wakeup.recv(4096)
+                        continue
+                    # a source failing in any way (or its filter)
+                    # doesn't stop the others
+                    try:
+                        self._store(source, *source.read(), now)
+                    except Exception as e:
+                        self._close(source, f'error: {e}')
+                self._changes()
+                for key in list(self.selector.get_map().values()):
+                    if key.data is not None:
+                        try:
+                            self._store(key.data, *key.data.tick(now), now)
+                        except Exception as e:
+                            self._close(key.data, f'error: {e}')
+        finally:
+            for key in list(self.selector.get_map().values()):
+                if key.data is not None:
+                    self._close(key.data, 'stopped')
+            self.selector.close()
@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+
+"""
+
+ Project     : The poorman's data logger.
+ File        : tools/arrayfilter.py
+ Version     : 1.0
+ Description : Filters of tools/datafilters.py applied to whole chunks of
+               samples.
+
+
+ This program is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ This program is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+ A filter takes a 1-D array of samples (floats) and returns the array of
+ filtered samples, of the same length. Older filters taking one float
+ are detected by a trial call and wrapped with np.vectorize: they work,
+ one Python call per sample, and a warning tells they should be
+ rewritten.
+ load_filters() compiles the filter module again (after editing it) and
+ tests it, so the application can switch to it without restarting.
+"""
+
+import time
+import types
+import warnings
+import numpy as np
+from tools.filterchain import FilterChain
+
+# samples of the trial call, analog readings of the Arduino board
+PROBE = np.array([0.0, 1.0, 37.0, 511.0, 512.0, 1023.0])
+# samples per channel of the test of load_filters, and its duration
+TEST_SAMPLES = 10000
+TEST_TIME = 0.05
+
+
+def array_filter(function):
+    """ decorator: function takes arrays, don't try it on sample values
+        (filters with side effects)
+    """
+    function.array_filter = True
+    return function
+
+
+def takes_arrays(function, probe=PROBE):
+    """ True if function gives for an array what it gives for each of
+        its values
+    """
+    if getattr(function, 'array_filter', False):
+        return True
+    with np.errstate(all='ignore'):
+        try:
+            result = function(probe.copy())
+        except Exception:
+            return False
+        if not isinstance(result, np.ndarray) or \
+                result.shape != probe.shape:
+            return False
+        try:
+            expected = np.array([function(float(value)) for value in probe],
+                                dtype=float)
+        except Exception:
+            # no scalar version to compare with (math domain...)
+            return True
+    return np.allclose(result.astype(float), expected, equal_nan=True)
+
+
+def vectorized(function):
+    """ function taking arrays, np.vectorize wrapper for scalar ones """
+    if takes_arrays(function):
+        return function
+    name = getattr(function, '__name__', repr(function))
+    warnings.warn(f'filter {name}() takes one sample at a time, it is '
+                  'called for every sample (slow): make it take a NumPy '
+                  'array, see tools/arrayfilter.py', RuntimeWarning,
+                  stacklevel=2)
+    return np.vectorize(function, otypes=[float])
+
+
+def make_transform(default, channel_filters=None):
+    """ function filtering chunks, 1-D or (samples, channels) arrays
+        default is used for channels missing from channel_filters
+        (numbered from 1)
+    """
+    default = vectorized(default)
+    filters = {channel: vectorized(function) for channel, function
+               in (channel_filters or {}).items()}
+
+    def transform(values):
+        # a copy: filters may work in place
+        values = np.array(values, dtype=float)
+        if values.ndim == 1:
+            return np.asarray(default(values), dtype=float)
+        out = np.empty(values.shape)
+        for channel in range(values.shape[1]):
+            out[:, channel] = filters.get(channel + 1, default)(
+                values[:, channel])
+        return out
+
+    return transform
+
+
+def load_filters(path, channels=1):
+    """ transform and chain of a filter module (tools/datafilters.py)
+        The module is compiled in a new namespace and its filters are
+        tested on readings of `channels` channels: ValueError if it
+        fails (the filters in use are left alone).
+        Dictionary: transform, chain (reset), cost (seconds per sample
+        and channel), warnings (scalar filters).
+    """
+    with open(path, 'r') as file:
+        source = file.read()
+    module = types.ModuleType('tools.datafilters')
+    module.__file__ = path
+    values = np.random.default_rng(0).integers(
+        0, 1024, (TEST_SAMPLES, channels)).astype(float)
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter('always')
+        try:
+            exec(compile(source, path, 'exec'), module.__dict__)
+            transform = make_transform(
+                module.datafilter, getattr(module, 'channel_filters', {}))
+            chain = FilterChain(getattr(module, 'filter_chain', []))
+            out = transform(values)
+            if out.shape != values.shape:
+                raise ValueError(f'datafilter() gives {out.shape} samples '
+                                 f'for {values.shape}')
+            out = chain.process(out)
+            if out.ndim != 2 or out.shape[1] != channels or \
+                    len(out) > len(values):
+                raise ValueError(f'filter_chain gives {out.shape} samples '
+                                 f'for {values.shape}')
+            # per sample cost, as many runs as fit in TEST_TIME
+            runs = 0
+            start = time.perf_counter()
+            while not runs or time.perf_counter() - start < TEST_TIME:
+                chain.process(transform(values))
+                runs += 1
+            cost = (time.perf_counter() - start) / (runs * values.size)
+            chain.reset()
+        except ValueError:
+            raise
+        except Exception as e:
+            raise ValueError(f'{type(e).__name__}: {e}') from e
+    return {'transform': transform, 'chain': chain, 'cost': cost,
+            'warnings': list(dict.fromkeys(str(warning.message)
+                                           for warning in caught))}
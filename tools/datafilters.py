@@ -2,12 +2,29 @@
 
 """
     This function is used to process data from the Arduino board.
-    It takes a float as input then ... modify it to fit your needs.
-    You will need to restart to apply changes.
+    It takes a NumPy array of samples (floats) as input then ... modify it
+    to fit your needs, it must return an array of the same length.
+    Functions taking a single float still work, one call per sample
+    (much slower, see tools/arrayfilter.py).
+    Saving it in the editor (Edit menu) applies the changes at once, once
+    the filters pass a test on sample readings (the status bar gives
+    their cost); the filters in use are kept if they fail.
+    With several channels, channel_filters gives the function used for a
+    channel (1 for A0, as on the plot); other channels use datafilter().
+    filter_chain lists stateful filters (smoothing, decimation...) applied
+    next, see tools/filterchain.py.
 """
 
 
-def datafilter(value):
+def datafilter(values):
     # converts arduino analog input(0 - 1023) to voltage(0 - 5v)
-    value = value * 5 / 1024
-    return value
+    values = values * 5 / 1024
+    return values
+
+
+# e.g. channel_filters = {2: my_sensor_filter}
+channel_filters = {}
+
+# e.g. from tools.filterchain import MovingAverage, Decimate
+#      filter_chain = [MovingAverage(10), Decimate(10)]
+filter_chain = []
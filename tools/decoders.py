@@ -0,0 +1,219 @@
+# -*- coding: utf-8 -*-
+
+"""
+
+ Project     : The poorman's data logger.
+ File        : tools/decoders.py
+ Version     : 1.0
+ Description : Turn raw bytes received from the Arduino into numpy arrays.
+
+
+ This program is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ This program is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import numpy as np
+
+DIGITS = b'0123456789'
+
+
+def empty(channels=1):
+    """ no samples, shaped like the decoder output """
+    return np.zeros((0,)) if channels == 1 else np.zeros((0, channels))
+
+
+def _parse_fields(compact, nlines, channels):
+    """ values of lines made of digits, commas and \\n only, parsed by
+        numpy all at once; None unless every line holds `channels`
+        non empty fields
+    """
+    arr = np.frombuffer(compact, dtype=np.uint8)
+    # a separator follows every field
+    ends = np.flatnonzero((arr == ord(',')) | (arr == ord('\n')))
+    if len(ends) != nlines * channels:
+        return None
+    line_ends = np.flatnonzero(arr[ends] == ord('\n'))
+    if not (np.diff(line_ends, prepend=-1) == channels).all():
+        return None
+    starts = np.concatenate(([0], ends[:-1] + 1))
+    lengths = ends - starts
+    # empty fields, or too long to be exact
+    if lengths.min() < 1 or lengths.max() > 15:
+        return None
+    # digits right aligned in a (fields, width) array, zero padded
+    width = int(lengths.max())
+    pos = ends[:, None] - np.arange(width, 0, -1)
+    digits = arr[np.maximum(pos, 0)].astype(np.int64) - ord('0')
+    digits[pos < starts[:, None]] = 0
+    return (digits @ 10 ** np.arange(width - 1, -1, -1)).astype(float)
+
+
+def parse_lines(buf, channels=1):
+    """ parse complete ascii lines holding one integer per channel
+        Values of a line are separated by commas, the result is a
+        (lines, channels) array (1-D for a single channel).
+        Lines that int() would reject or with a wrong number of values
+        are skipped, like the former per-line code did.
+    """
+    nlines = buf.count(b'\n')
+    if nlines == 0:
+        return empty(channels)
+    # fast path: only digits, commas and line ends, one number in every
+    # field
+    allowed = DIGITS + b'\r\n' + (b',' if channels > 1 else b'')
+    if not buf.translate(None, allowed) and \
+            buf.count(b'\r') == buf.count(b'\r\n'):
+        values = _parse_fields(buf.replace(b'\r\n', b'\n'), nlines,
+                               channels)
+        if values is not None:
+            return values if channels == 1 else \
+                values.reshape(nlines, channels)
+    # slow path: garbage on the line (start up, noise...)
+    values = []
+    for line in buf.split(b'\n')[:nlines]:
+        try:
+            fields = [int(field) for field in
+                      line.decode('ascii').split(',')]
+        except ValueError:
+            continue
+        if len(fields) == channels:
+            values.append(fields)
+    if not values:
+        return empty(channels)
+    values = np.array(values, dtype=float)
+    return values.ravel() if channels == 1 else values
+
+
+class AsciiDecoder():
+    """ Decoder for boards sending one sample per line (Serial.println)
+        Usage : decoder = AsciiDecoder()
+                values = decoder.feed(serport.read(serport.in_waiting))
+        An incomplete line is kept until the rest of it is received.
+        With several channels, lines hold comma separated values and
+        feed() returns (samples, channels) arrays.
+    """
+
+    def __init__(self, channels=1):
+        self.channels = channels
+        self.reset()
+
+    def reset(self):
+        """ forget any partial line """
+        self.remainder = b''
+
+    def feed(self, raw):
+        """ add received bytes, return values of all completed lines """
+        buf = self.remainder + raw
+        end = buf.rfind(b'\n')
+        if end < 0:
+            self.remainder = buf
+            return empty(self.channels)
+        self.remainder = buf[end + 1:]
+        return parse_lines(buf[:end + 1], self.channels)
+
+
+# binary frames: sync (2 bytes), sequence counter, number of values,
+# FRAME_SAMPLES big endian unsigned 16 bits values, checksum
+# (xor of every byte between sync and checksum)
+# with several channels a frame holds whole samples, channels interleaved
+SYNC = b'\xa5\x5a'
+FRAME_SAMPLES = 8
+FRAME_SIZE = 2 + 1 + 1 + 2 * FRAME_SAMPLES + 1
+
+
+def encode_frame(seq, values):
+    """ build one binary frame, as sent by the sketch (used for tests) """
+    values = list(values)[:FRAME_SAMPLES]
+    body = bytes([seq & 0xff, len(values)])
+    body += np.array(values + [0] * (FRAME_SAMPLES - len(values)),
+                     dtype='>u2').tobytes()
+    checksum = 0
+    for byte in body:
+        checksum ^= byte
+    return SYNC + body + bytes([checksum])
+
+
+class FrameDecoder():
+    """ Decoder for boards sending binary frames (see logger_sketch3)
+        Usage : decoder = FrameDecoder()
+                values = decoder.feed(serport.read(serport.in_waiting))
+        Frames are checked in bulk with numpy. Corrupted frames are skipped
+        (errors counter) and missing sequence numbers are counted as lost
+        frames. With several channels feed() returns (samples, channels)
+        arrays, frames not holding whole samples are errors.
+    """
+
+    def __init__(self, channels=1):
+        self.channels = channels
+        self.reset()
+
+    def reset(self):
+        """ forget partial frame and counters """
+        self.remainder = b''
+        self.seq = None
+        self.errors = 0
+        self.lost = 0
+
+    def _valid(self, block):
+        """ mask of good frames in a (n, FRAME_SIZE) array """
+        checksum = np.bitwise_xor.reduce(block[:, 2:-1], axis=1)
+        return ((block[:, 0] == SYNC[0]) & (block[:, 1] == SYNC[1])
+                & (checksum == block[:, -1])
+                & (block[:, 3] >= 1) & (block[:, 3] <= FRAME_SAMPLES)
+                & (block[:, 3] % self.channels == 0))
+
+    def _resync(self, buf, pos):
+        """ position of the next sync pattern after a bad frame """
+        nxt = buf.find(SYNC, pos + 1)
+        if nxt < 0:
+            # keep a possible first sync byte at the very end
+            return len(buf) - 1 if buf.endswith(SYNC[:1]) else len(buf)
+        return nxt
+
+    def feed(self, raw):
+        """ add received bytes, return values of all complete frames """
+        buf = self.remainder + raw
+        pos = buf.find(SYNC)
+        if pos < 0:
+            pos = self._resync(buf, -1)
+        arr = np.frombuffer(buf, dtype=np.uint8)
+        chunks = []
+        while len(buf) - pos >= FRAME_SIZE:
+            nb = (len(buf) - pos) // FRAME_SIZE
+            block = arr[pos:pos + nb * FRAME_SIZE].reshape(nb, FRAME_SIZE)
+            valid = self._valid(block)
+            good = nb if valid.all() else int(np.argmin(valid))
+            if good:
+                chunks.append(block[:good])
+                pos += good * FRAME_SIZE
+            if good < nb:
+                self.errors += 1
+                pos = self._resync(buf, pos)
+        self.remainder = buf[pos:]
+        if not chunks:
+            return empty(self.channels)
+        frames = np.concatenate(chunks)
+        self._check_sequence(frames[:, 2])
+        samples = frames[:, 4:-1].copy().view('>u2')
+        mask = np.arange(FRAME_SAMPLES) < frames[:, 3:4]
+        values = samples[mask].astype(float)
+        return values if self.channels == 1 else \
+            values.reshape(-1, self.channels)
+
+    def _check_sequence(self, seqs):
+        """ count frames missing from the sequence counter """
+        seqs = seqs.astype(int)
+        if self.seq is not None:
+            seqs = np.concatenate(([self.seq], seqs))
+        self.lost += int(((np.diff(seqs) - 1) % 256).sum())
+        self.seq = int(seqs[-1])
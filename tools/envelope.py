@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+
+"""
+
+ Project     : The poorman's data logger.
+ File        : tools/envelope.py
+ Version     : 1.0
+ Description : Min/max envelope decimation of ring buffers for plotting.
+
+
+ This program is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ This program is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import numpy as np
+
+
+def bin_extremes(block, first):
+    """ (min position, min, max position, max) of every row of block
+        positions are sample numbers, row i starts at sample first + i *
+        width
+    """
+    rows = np.arange(len(block))
+    width = block.shape[1]
+    imin = block.argmin(axis=1)
+    imax = block.argmax(axis=1)
+    starts = first + rows * width
+    return (starts + imin, block[rows, imin], starts + imax,
+            block[rows, imax])
+
+
+def interleave(pmin, vmin, pmax, vmax):
+    """ (x, y) with the min and max of every bin, in sample order """
+    min_first = pmin <= pmax
+    x = np.empty(2 * len(pmin))
+    y = np.empty(2 * len(pmin))
+    x[0::2] = np.where(min_first, pmin, pmax)
+    x[1::2] = np.where(min_first, pmax, pmin)
+    y[0::2] = np.where(min_first, vmin, vmax)
+    y[1::2] = np.where(min_first, vmax, vmin)
+    return x, y
+
+
+class EnvelopeDecimator():
+    """ Points to plot for the visible part of a RingBuffer
+        Usage : envelope = EnvelopeDecimator()
+                x, y = envelope.decimate(buf, xmin, xmax, pixels)
+                curve.setData(x, y)
+        When the visible range holds more than 2 samples per pixel it is
+        cut in bins no wider than a pixel, and the min and max of every
+        bin are kept at their own positions: a line through them covers
+        the same pixels as the full resolution one, spikes included, with
+        about 2 points per pixel.
+        Bins are aligned on sample numbers (not on buffer positions), so
+        they don't move when the buffer scrolls: complete bins are cached
+        and only bins receiving new samples are computed again.
+        x is the buffer position, as in plot.setData(buf.view()).
+        A LodPyramid of the buffer samples (same total) can be given:
+        wide bins are then read from it instead of the buffer, and the
+        samples that left the buffer can be drawn (negative positions).
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        """ forget cached bins """
+        self.key = None
+        self.first = 0          # number of the first cached bin
+        self.cache = [np.zeros((0,))] * 4
+
+    def _bins(self, values, offset, start, stop, width):
+        """ extremes of bins start..stop (all samples available) """
+        if stop <= start:
+            return [np.zeros((0,))] * 4
+        block = values[start * width - offset:stop * width - offset]
+        return bin_extremes(block.reshape(-1, width), start * width)
+
+    def _update_cache(self, values, offset, start, stop, width):
+        """ cache complete bins start..stop, reusing cached ones """
+        last = self.first + len(self.cache[0])
+        low, high = max(start, self.first), min(stop, last)
+        if low >= high:
+            self.cache = self._bins(values, offset, start, stop, width)
+        else:
+            keep = slice(low - self.first, high - self.first)
+            before = self._bins(values, offset, start, low, width)
+            after = self._bins(values, offset, high, stop, width)
+            self.cache = [np.concatenate((b, c[keep], a)) for b, c, a
+                          in zip(before, self.cache, after)]
+        self.first = start
+
+    def _partial(self, values, offset, start, stop):
+        """ extremes of one incomplete bin, buffer positions start..stop """
+        if stop <= start:
+            return [np.zeros((0,))] * 4
+        return bin_extremes(values[start:stop].reshape(1, -1),
+                            start + offset)
+
+    def _from_pyramid(self, pyramid, raw, offset, start, stop, pixels,
+                      channel):
+        """ decimate() points read from a pyramid, None if its bins are
+            too big for the range
+        """
+        zeros = min(max(-offset - start, 0), stop - start)
+        points = pyramid.envelope(offset + start + zeros, offset + stop,
+                                  pixels, raw, channel)
+        if points is None:
+            return None
+        x, y = points
+        if zeros:
+            # the leading zeros aren't samples
+            x = np.concatenate(([start + offset, start + zeros - 1 + offset],
+                                x))
+            y = np.concatenate(([0.0, 0.0], y))
+        return x - offset, y
+
+    def decimate(self, buf, xmin, xmax, pixels, channel=None,
+                 pyramid=None, older=None):
+        """ (x, y) of buffer positions xmin..xmax for `pixels` pixels
+            channel selects the row of a multi-channel buffer
+            With a pyramid, positions before the buffer (negative, down
+            to the first sample of the pyramid) are drawn too: from its
+            bins, and from older(lo, hi) giving samples lo..hi (sample
+            numbers) of the channel that left the buffer when zoomed in
+            (only bins without it).
+        """
+        values = buf.view() if channel is None else buf.view()[channel]
+        size = len(values)
+        # sample number of buffer position 0 (negative while the buffer
+        # is filling up: leading zeros)
+        offset = buf.total - size
+        if pyramid is None or pyramid.total != buf.total:
+            pyramid = None
+        first = min(-offset, 0) if pyramid is not None else 0
+        start = min(max(int(np.floor(xmin)), first), size)
+        stop = min(max(int(np.ceil(xmax)) + 1, first), size)
+        pixels = max(int(pixels), 1)
+
+        def raw(lo, hi):
+            """ samples lo..hi of the channel (sample numbers) """
+            if lo >= offset or older is None:
+                return values[max(lo - offset, 0):max(hi - offset, 0)]
+            return np.concatenate((older(lo, min(hi, offset)),
+                                   values[:max(hi - offset, 0)]))
+
+        if pyramid is not None and stop - start > 2 * pixels:
+            points = self._from_pyramid(pyramid, raw, offset, start, stop,
+                                        pixels, channel or 0)
+            if points is not None:
+                return points
+        if start < 0 and older is None:
+            # only bins are known before the buffer
+            start, stop = 0, max(stop, 0)
+        elif start < 0:
+            block = raw(start + offset, stop + offset)
+            if len(block) <= 2 * pixels:
+                return np.arange(start, stop, dtype=float), block
+            width = len(block) // pixels
+            count = len(block) // width * width
+            x, y = interleave(*[np.concatenate(column) for column in zip(
+                bin_extremes(block[:count].reshape(-1, width),
+                             start + offset),
+                self._partial(block, start + offset, count, len(block)))])
+            return x - offset, y
+        if stop - start <= 2 * pixels:
+            return np.arange(start, stop, dtype=float), values[start:stop]
+        width = (stop - start) // pixels
+        key = (buf.epoch, size, width)
+        if key != self.key:
+            self.reset()
+            self.key = key
+        # bins holding visible samples, bins entirely in the buffer and
+        # complete (no more samples to come)
+        low = (offset + start) // width
+        high = -(-(offset + stop) // width)
+        inside = -(-offset // width)
+        complete = buf.total // width
+        full_start, full_stop = max(low, inside), min(high, complete)
+        self._update_cache(values, offset, full_start, full_stop, width)
+        parts = [self._partial(values, offset, 0,
+                               inside * width - offset)
+                 if low < inside else [np.zeros((0,))] * 4,
+                 self.cache,
+                 self._partial(values, offset, complete * width - offset,
+                               min(high * width - offset, size))
+                 if high > complete else [np.zeros((0,))] * 4]
+        x, y = interleave(*[np.concatenate(column)
+                            for column in zip(*parts)])
+        return x - offset, y
@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+
+"""
+
+ Project     : The poorman's data logger.
+ File        : tools/fakearduino.py
+ Version     : 1.0
+ Description : Pseudo terminal acting like an Arduino running
+               logger_sketch3, for tests without a board (POSIX only).
+
+ Usage       : python3 -m tools.fakearduino
+               then open the printed port (/dev/pts/N) from datalogger or
+               server.py --serial /dev/pts/N
+
+
+ This program is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ This program is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import math
+import os
+import select
+import time
+import tty
+from tools.decoders import encode_frame, FRAME_SAMPLES
+
+MULTIPLIERS = {'m': 1, 's': 1000, 'M': 60000}
+
+
+class FakeArduino():
+    """ Answer sketch commands on a pty and send samples
+        Samples are a slow sine wave (10 bits values) so that a plot
+        shows something, shifted by a quarter of period on every other
+        channel; every sample due is written at once, at most every
+        10 ms.
+    """
+
+    def __init__(self):
+        self.master, self.slave = os.openpty()
+        # no echo, no line ending translation
+        tty.setraw(self.slave)
+        self.port = os.ttyname(self.slave)
+        self.delay = 0.001
+        self.running = False
+        self.binary = False
+        self.channels = 1
+        self.seq = 0
+        self.sent = 0
+        self.frame = []
+
+    def value(self, index, channel=0):
+        return int(512 + 400 * math.sin(2 * math.pi * (index / 1000
+                                                       + channel / 4)))
+
+    def set_channels(self, text):
+        """ "4R" reads 4 channels, like setChannels() """
+        try:
+            self.channels = min(max(int(text[:-1]), 1), 8)
+        except ValueError:
+            self.channels = 1
+
+    def command(self, text):
+        """ same parsing as setParams(): last character """
+        last = text[-1:]
+        if last in MULTIPLIERS:
+            self.delay = max(float(text[:-1] or 0), 1) * \
+                MULTIPLIERS[last] / 1000
+        elif last == 'R':
+            self.set_channels(text)
+            self.binary = False
+            self.start()
+        elif last == 'B':
+            self.set_channels(text)
+            os.write(self.master, b'BIN\r\n')
+            self.binary = True
+            self.start()
+        elif last == 'C':
+            self.send_frame()
+            self.running = False
+
+    def start(self):
+        self.running = True
+        self.frame = []
+        self.start_time = time.monotonic()
+        self.done = 0
+
+    def send_frame(self):
+        if self.frame:
+            os.write(self.master, encode_frame(self.seq, self.frame))
+            self.seq = (self.seq + 1) & 0xff
+            self.frame = []
+
+    def send_samples(self):
+        """ write every sample due """
+        due = int((time.monotonic() - self.start_time) / self.delay) + 1
+        out = []
+        for index in range(self.done, due):
+            vals = [self.value(self.sent, channel)
+                    for channel in range(self.channels)]
+            self.sent += 1
+            if not self.binary:
+                out.append((','.join(map(str, vals)) + '\r\n')
+                           .encode('ascii'))
+                continue
+            self.frame.extend(vals)
+            # whole samples only, slow sampling: don't wait for a full
+            # frame
+            if len(self.frame) + self.channels > FRAME_SAMPLES or \
+                    self.delay >= 0.02:
+                out.append(encode_frame(self.seq, self.frame))
+                self.seq = (self.seq + 1) & 0xff
+                self.frame = []
+        self.done = due
+        if out:
+            os.write(self.master, b''.join(out))
+
+    def run(self):
+        while True:
+            timeout = 0.01 if self.running else None
+            readable, _, _ = select.select([self.master], [], [], timeout)
+            if readable:
+                self.command(os.read(self.master, 1024).decode(
+                    'ascii', 'replace').strip())
+            if self.running:
+                self.send_samples()
+
+
+if __name__ == '__main__':
+    fake = FakeArduino()
+    print(f'fake arduino on {fake.port} (CTRL+C to exit)', flush=True)
+    try:
+        fake.run()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,210 @@
+# -*- coding: utf-8 -*-
+
+"""
+
+ Project     : The poorman's data logger.
+ File        : tools/filterchain.py
+ Version     : 1.0
+ Description : Chain of stateful filters applied to the stream of samples
+               (moving average, low-pass, median, decimation,
+               calibration).
+
+
+ This program is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ This program is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+ Stages take (samples, channels) arrays and keep what they need of past
+ samples, so a stream can be filtered chunk by chunk. The result doesn't
+ depend on how the stream is cut: every output sample is computed with
+ the same operations, in the same order, whether samples come one at a
+ time or in large chunks (bit for bit).
+ Stages have process(values) and reset(), windows are filled with the
+ first sample at start.
+"""
+
+import numpy as np
+from numpy.lib.stride_tricks import as_strided
+
+# low-pass samples are computed by blocks of BLOCK samples aligned on
+# sample numbers
+BLOCK = 256
+
+
+def windows(data, length):
+    """ (len(data) - length + 1, length, channels) read-only view of
+        every run of `length` samples of data (samples, channels)
+    """
+    count = len(data) - length + 1
+    return as_strided(data, shape=(count, length, data.shape[1]),
+                      strides=(data.strides[0],) + data.strides,
+                      writeable=False)
+
+
+class MovingAverage():
+    """ mean of the last `length` samples """
+
+    def __init__(self, length):
+        self.length = max(int(length), 1)
+        self.reset()
+
+    def reset(self):
+        self.history = None     # last length - 1 samples
+
+    def process(self, values):
+        if not len(values):
+            return values
+        if self.history is None:
+            self.history = np.repeat(values[:1], self.length - 1, axis=0)
+        data = np.concatenate((self.history, values))
+        count = len(values)
+        # added in sample order, whatever the chunk
+        total = data[:count].copy()
+        for shift in range(1, self.length):
+            total += data[shift:shift + count]
+        self.history = data[len(data) - self.length + 1:]
+        return total / self.length
+
+
+class LowPass():
+    """ exponential (first order IIR) low-pass
+        y[n] = y[n - 1] + alpha * (x[n] - y[n - 1])
+        alpha = 1 - exp(-2 pi cutoff / sample rate)
+        The recurrence is solved by a prefix scan over blocks of BLOCK
+        samples aligned on sample numbers: a sample only depends on the
+        samples before it in its block and on the output at the end of
+        the previous block, so incomplete blocks give the same values as
+        complete ones.
+    """
+
+    def __init__(self, alpha):
+        self.alpha = float(alpha)
+        self.reset()
+
+    def reset(self):
+        self.start = None       # output before the current block
+        self.pending = None     # samples of the current block
+
+    def process(self, values):
+        if not len(values):
+            return values
+        if self.start is None:
+            self.start = values[0].copy()
+            self.pending = values[:0]
+        data = np.concatenate((self.pending, values))
+        blocks = -(-len(data) // BLOCK)
+        channels = data.shape[1]
+        # y = a * y_before + b for every sample, composed along the block
+        a = np.full((blocks, BLOCK, channels), 1.0 - self.alpha)
+        b = np.zeros((blocks, BLOCK, channels))
+        b.reshape(-1, channels)[:len(data)] = self.alpha * data
+        step = 1
+        while step < BLOCK:
+            a_next, b_next = a.copy(), b.copy()
+            a_next[:, step:] = a[:, step:] * a[:, :-step]
+            b_next[:, step:] = a[:, step:] * b[:, :-step] + b[:, step:]
+            a, b = a_next, b_next
+            step *= 2
+        out = np.empty((blocks, BLOCK, channels))
+        start = self.start
+        for block in range(blocks):
+            out[block] = a[block] * start + b[block]
+            start = out[block, -1]
+        complete = len(data) // BLOCK
+        if complete:
+            self.start = out[complete - 1, -1].copy()
+        self.pending = data[complete * BLOCK:]
+        return out.reshape(-1, channels)[len(data) - len(values):len(data)]
+
+
+class RunningMedian():
+    """ median of the last `length` samples (spike removal) """
+
+    def __init__(self, length):
+        self.length = max(int(length), 1)
+        self.reset()
+
+    def reset(self):
+        self.history = None     # last length - 1 samples
+
+    def process(self, values):
+        if not len(values):
+            return values
+        if self.history is None:
+            self.history = np.repeat(values[:1], self.length - 1, axis=0)
+        data = np.concatenate((self.history, values))
+        self.history = data[len(data) - self.length + 1:]
+        return np.median(windows(data, self.length), axis=1)
+
+
+class Decimate():
+    """ keep one sample out of `factor` (samples 0, factor, 2 factor...)
+        use a low-pass or a moving average before to avoid aliasing
+    """
+
+    def __init__(self, factor):
+        self.factor = max(int(factor), 1)
+        self.reset()
+
+    def reset(self):
+        self.phase = 0          # samples seen, modulo factor
+
+    def process(self, values):
+        first = -self.phase % self.factor
+        self.phase = (self.phase + len(values)) % self.factor
+        return values[first::self.factor]
+
+
+class Polynomial():
+    """ calibration y = c0 + c1 x + c2 x^2 ... (coefficients from c0) """
+
+    def __init__(self, coefficients):
+        self.coefficients = [float(c) for c in coefficients] or [0.0]
+
+    def reset(self):
+        pass
+
+    def process(self, values):
+        out = np.full(values.shape, self.coefficients[-1])
+        for coefficient in reversed(self.coefficients[:-1]):
+            out = out * values + coefficient
+        return out
+
+
+class FilterChain():
+    """ stages applied in order to chunks of samples
+        Usage : chain = FilterChain([MovingAverage(8), Decimate(4)])
+                filtered = chain.process(values)    # every chunk
+                chain.reset()                       # new acquisition
+        values are 1-D (single channel) or (samples, channels) arrays.
+    """
+
+    def __init__(self, stages=()):
+        self.stages = list(stages)
+
+    def __len__(self):
+        return len(self.stages)
+
+    def reset(self):
+        for stage in self.stages:
+            stage.reset()
+
+    def process(self, values):
+        if not self.stages:
+            return values
+        values = np.asarray(values, dtype=float)
+        flat = values.ndim == 1
+        if flat:
+            values = values.reshape(-1, 1)
+        for stage in self.stages:
+            values = stage.process(values)
+        return values.ravel() if flat else values
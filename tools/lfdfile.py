@@ -0,0 +1,262 @@
+# -*- coding: utf-8 -*-
+
+"""
+
+ Project     : The poorman's data logger.
+ File        : tools/lfdfile.py
+ Version     : 1.0
+ Description : Read and write datalogger (.lfd) files.
+
+
+ This program is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ This program is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+ File formats
+ ------------
+ v1 (text):
+    Datalogger v1.0
+    title
+    buffersize
+    sample value,unit (m, s or M)
+    pmin,pmax
+    one sample per line, channels separated by commas...
+
+ v2 (binary):
+    'Datalogger v2.0\\n' followed by a JSON dictionary holding the same
+    metadata plus the data type and number of channels, padded with
+    spaces up to HEADER_SIZE bytes, followed by the raw samples
+    (channels interleaved). The samples can be mapped with np.memmap,
+    the number of samples is given by the file size so a recording can
+    be appended to without rewriting the header.
+    A recording closed with its level of detail pyramid (see
+    tools/pyramid.py) gives the number of samples ('samples') in its
+    header, the pyramid levels follow the samples at 'lod_offset',
+    smallest bins first.
+
+ Samples are 1-D arrays for a single channel, (samples, channels)
+ arrays otherwise.
+"""
+
+import json
+import os
+import numpy as np
+
+MAGIC_V1 = b'Datalogger v1.0'
+MAGIC_V2 = b'Datalogger v2.0\n'
+HEADER_SIZE = 1024
+DTYPE = '<f8'
+# samples encoded and written at once by save functions
+CHUNK = 1 << 20
+
+
+def make_meta(title='', buffersize=0, sample_val=1, unit='s', pmin=0,
+              pmax=6, channels=1):
+    """ metadata dictionary stored in file headers """
+    return {'title': title, 'buffersize': int(buffersize),
+            'sample_val': int(sample_val), 'unit': unit,
+            'pmin': float(pmin), 'pmax': float(pmax),
+            'channels': int(channels)}
+
+
+def channel_count(data):
+    """ number of channels of a samples array """
+    return 1 if np.ndim(data) == 1 else np.shape(data)[1]
+
+
+def shape_samples(values, channels):
+    """ flat values as samples: 1-D or (samples, channels) """
+    if channels == 1:
+        return values
+    return values[:len(values) // channels * channels].reshape(-1, channels)
+
+
+def write_header(file, meta, dtype=DTYPE):
+    """ write a v2 header to a file opened in binary mode """
+    header = dict(meta, version=2, dtype=np.dtype(dtype).str)
+    header = MAGIC_V2 + json.dumps(header).encode('utf-8') + b'\n'
+    if len(header) > HEADER_SIZE:
+        raise ValueError('lfd header too long (title?)')
+    file.write(header.ljust(HEADER_SIZE, b' '))
+
+
+def read_header(file):
+    """ read a v2 header, return (meta, dtype) """
+    header = file.read(HEADER_SIZE)
+    if not header.startswith(MAGIC_V2):
+        raise ValueError('not a datalogger v2 file')
+    meta = json.loads(header[len(MAGIC_V2):].decode('utf-8'))
+    dtype = np.dtype(meta.pop('dtype', DTYPE))
+    meta.pop('version', None)
+    return meta, dtype
+
+
+def file_version(filename):
+    """ 1 or 2, 0 if not a datalogger file """
+    with open(filename, 'rb') as file:
+        start = file.read(len(MAGIC_V2))
+    if start == MAGIC_V2:
+        return 2
+    if start.startswith(MAGIC_V1):
+        return 1
+    return 0
+
+
+def write_chunks(file, data, encode, progress=None):
+    """ write data by chunks, encode(chunk, start) returns what to write
+        progress(fraction) is called after each chunk
+    """
+    total = len(data)
+    for start in range(0, total, CHUNK):
+        file.write(encode(data[start:start + CHUNK], start))
+        if progress is not None:
+            progress(min(start + CHUNK, total) / total)
+
+
+def save_v2(filename, data, meta, progress=None):
+    """ save samples as a binary v2 file """
+    with open(filename, 'wb') as file:
+        write_header(file, dict(meta, channels=channel_count(data)))
+        write_chunks(file, data,
+                     lambda chunk, start: np.asarray(chunk,
+                                                     dtype=DTYPE).tobytes(),
+                     progress)
+
+
+def load_v2(filename, mmap=True):
+    """ load a v2 file, samples are memory mapped unless mmap is False """
+    with open(filename, 'rb') as file:
+        meta, dtype = read_header(file)
+    channels = meta.setdefault('channels', 1)
+    count = (os.path.getsize(filename) - HEADER_SIZE) // dtype.itemsize
+    # a recording may end with a partial sample, or with its pyramid
+    count = min(count // channels, meta.get('samples', count)) * channels
+    if count <= 0:
+        return meta, shape_samples(np.zeros((0,), dtype=dtype), channels)
+    if mmap:
+        data = np.memmap(filename, dtype=dtype, mode='r',
+                         offset=HEADER_SIZE, shape=(count,))
+    else:
+        data = np.fromfile(filename, dtype=dtype, count=count,
+                           offset=HEADER_SIZE)
+    return meta, shape_samples(data, channels)
+
+
+def format_values(data):
+    """ str() of every value, as written by the former per-value code
+        Data from the Arduino only holds a few distinct values (10 bits
+        converter): each one is formatted once and picked back by numpy.
+    """
+    data = np.ascontiguousarray(data, dtype=float)
+    # compare bit patterns so that -0.0 and 0.0 stay different
+    bits, inverse = np.unique(data.view(np.int64), return_inverse=True)
+    if len(bits) * 2 > len(data):
+        return list(map(str, data.tolist()))
+    strs = np.array(list(map(str, bits.view(float).tolist())), dtype=object)
+    return strs[inverse.ravel()].tolist()
+
+
+def format_samples(chunk):
+    """ one string per sample, channels separated by commas """
+    strs = format_values(np.ravel(chunk))
+    channels = channel_count(chunk)
+    if channels == 1:
+        return strs
+    return map(','.join, zip(*[iter(strs)] * channels))
+
+
+def _text_lines(chunk, start):
+    """ one sample per line """
+    return '\r\n'.join(format_samples(chunk)) + '\r\n'
+
+
+def _csv_rows(chunk, start):
+    """ sample number,values rows """
+    rows = map(','.join, zip(map(str, range(start, start + len(chunk))),
+                             format_samples(chunk)))
+    return '\r\n'.join(rows) + '\r\n'
+
+
+def save_v1(filename, data, meta, progress=None):
+    """ save samples as a v1 text file """
+    with open(filename, 'w') as file:
+        # write app name and version
+        file.write('Datalogger v1.0\r\n')
+        # add dataset name
+        file.write(meta['title'] + '\r\n')
+        # write used buffersize
+        file.write(str(meta['buffersize']) + '\r\n')
+        # write delay unit and value
+        file.write(str(meta['sample_val']) + ',' + meta['unit'] + '\r\n')
+        # write values
+        file.write(str(meta['pmin']) + ',' + str(meta['pmax']) + '\r\n')
+        # write data, one sample per line
+        write_chunks(file, data[:meta['buffersize']], _text_lines, progress)
+
+
+def load_v1(filename):
+    """ load a v1 text file """
+    with open(filename, 'r') as file:
+        # read app name : not used
+        file.readline()
+        # read dataset name
+        title = file.readline().strip()
+        # read buffesize
+        buffersize = int(file.readline().strip())
+        # get delay unit and value
+        val = file.readline().strip().split(',')
+        sample_val, unit = int(val[0]), val[1]
+        # read values range
+        val = file.readline().strip().split(',')
+        meta = make_meta(title, buffersize, sample_val, unit,
+                         float(val[0]), float(val[1]))
+        # read data, samples are separated by line ends and channels
+        # by commas
+        body = file.read()
+    meta['channels'] = body.split('\n', 1)[0].count(',') + 1
+    data = shape_samples(np.fromstring(body.replace(',', ' '), dtype=float,
+                                       sep=' '), meta['channels'])
+    if len(data) < buffersize:
+        raise ValueError(f'{buffersize} values expected, {len(data)} found')
+    return meta, data[:buffersize]
+
+
+def save_csv(filename, data, progress=None):
+    """ export samples as a Samples,Values csv file
+        (Samples,Channel 1,Channel 2... with several channels)
+    """
+    channels = channel_count(data)
+    header = ['Values'] if channels == 1 else \
+        [f'Channel {channel + 1}' for channel in range(channels)]
+    with open(filename, 'w+') as file:
+        file.write(','.join(['Samples'] + header) + '\r\n')
+        write_chunks(file, data, _csv_rows, progress)
+
+
+def load_csv(filename):
+    """ load samples from a csv file written by save_csv """
+    with open(filename, 'r') as file:
+        columns = file.readline().count(',') + 1
+        body = file.read()
+    if columns < 2:
+        raise ValueError('not a datalogger csv file')
+    data = np.fromstring(body.replace(',', ' '), dtype=float, sep=' ')
+    # first column is the sample number
+    data = shape_samples(data, columns)[:, 1:]
+    return data[:, 0].copy() if columns == 2 else data
+
+
+def load_lfd(filename):
+    """ load a datalogger file (any version), return (meta, samples) """
+    if file_version(filename) == 2:
+        return load_v2(filename)
+    return load_v1(filename)
@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+
+"""
+
+ Project     : The poorman's data logger.
+ File        : tools/multisource.py
+ Version     : 1.0
+ Description : Window logging several sources at the same time
+               (see tools/acquisition.py).
+
+
+ This program is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ This program is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import numpy as np
+import pyqtgraph as pg
+from PyQt5.QtCore import QTimer
+from PyQt5.QtWidgets import (QWidget, QGridLayout, QLabel, QLineEdit,
+                             QPushButton, QComboBox, QCheckBox,
+                             QTableWidget, QTableWidgetItem, QHeaderView,
+                             QMessageBox)
+from PyQt5.QtGui import QIcon
+from tools.acquisition import (AcquisitionEngine, SerialSource, TcpSource,
+                               UdpSource, sample_period)
+
+COLORS = [(100, 200, 100), (230, 120, 60), (80, 150, 240), (220, 200, 60),
+          (200, 90, 200), (90, 210, 210)]
+
+
+class MultiSourceWindow(QWidget):
+    """ Add serial boards and network nodes, plot them together
+        Every source is read by one AcquisitionEngine thread; the plot
+        shows all of them against the same time axis (seconds since the
+        window was opened, remote clocks corrected).
+        transform is applied to every chunk of values (filter).
+    """
+
+    def __init__(self, buffersize=100000, transform=None, baudrate=57600,
+                 fps=30):
+        super(MultiSourceWindow, self).__init__()
+        self.buffersize = buffersize
+        self.transform = transform
+        self.baudrate = baudrate
+        self.engine = None
+        self.curves = {}
+        self.setWindowTitle('Multi-source acquisition')
+        self.setWindowIcon(QIcon('resources/images/icon.png'))
+        self.resize(900, 600)
+        self.initUI()
+        self.timer = QTimer(self)
+        self.timer.setInterval(int(1000 / fps))
+        self.timer.timeout.connect(self.refresh)
+
+    def initUI(self):
+        self.kind = QComboBox()
+        self.kind.addItems(['Serial', 'TCP', 'UDP'])
+        self.address = QLineEdit()
+        self.address.setPlaceholderText('/dev/ttyUSB0, COM3 or host:port')
+        self.period = QLineEdit('10m')
+        self.period.setToolTip('Sample period: 10m = 10 ms, 2s, 1M = 1 min')
+        self.binary = QCheckBox('Binary')
+        self.btnadd = QPushButton(QIcon.fromTheme('list-add'), 'Add')
+        self.btnadd.clicked.connect(self.add_source)
+        self.btnremove = QPushButton(QIcon.fromTheme('list-remove'),
+                                     'Remove')
+        self.btnremove.clicked.connect(self.remove_source)
+
+        self.table = QTableWidget(0, 5)
+        self.table.setHorizontalHeaderLabels(['Source', 'Samples',
+                                              'Samples/s', 'Lost', 'Status'])
+        self.table.horizontalHeader().setSectionResizeMode(
+            QHeaderView.Stretch)
+        self.table.setSelectionBehavior(QTableWidget.SelectRows)
+
+        self.pw = pg.PlotWidget()
+        self.pw.addLegend()
+        self.pw.setLabel('bottom', 'Time', units='s')
+        self.pw.showGrid(x=True, y=True)
+
+        grid = QGridLayout()
+        grid.addWidget(QLabel('Source:'), 0, 0)
+        grid.addWidget(self.kind, 0, 1)
+        grid.addWidget(self.address, 0, 2)
+        grid.addWidget(QLabel('Period:'), 0, 3)
+        grid.addWidget(self.period, 0, 4)
+        grid.addWidget(self.binary, 0, 5)
+        grid.addWidget(self.btnadd, 0, 6)
+        grid.addWidget(self.btnremove, 0, 7)
+        grid.addWidget(self.table, 1, 0, 1, 8)
+        grid.addWidget(self.pw, 2, 0, 1, 8)
+        grid.setRowStretch(2, 3)
+        grid.setRowStretch(1, 1)
+        self.setLayout(grid)
+
+    def make_source(self):
+        """ source described by the form, ValueError if invalid """
+        period = sample_period(self.period.text().strip())
+        address = self.address.text().strip()
+        if not address:
+            raise ValueError('No address')
+        kind = self.kind.currentText()
+        if kind == 'Serial':
+            return SerialSource(address, self.baudrate,
+                                self.period.text().strip(),
+                                self.binary.isChecked(), self.buffersize)
+        host, _, port = address.rpartition(':')
+        if not host:
+            raise ValueError('Network address must be host:port')
+        source_class = TcpSource if kind == 'TCP' else UdpSource
+        return source_class(host, int(port), period, self.buffersize)
+
+    def add_source(self):
+        try:
+            source = self.make_source()
+        except ValueError as e:
+            QMessageBox.about(self, 'Source', str(e))
+            return
+        if self.engine is None:
+            self.engine = AcquisitionEngine(self.transform)
+            self.engine.start()
+            self.timer.start()
+        color = COLORS[len(self.curves) % len(COLORS)]
+        self.curves[source] = self.pw.plot(pen=color, name=source.name)
+        self.engine.add(source)
+        self.table.insertRow(self.table.rowCount())
+        self.refresh()
+
+    def remove_source(self):
+        rows = sorted({index.row() for index
+                       in self.table.selectedIndexes()}, reverse=True)
+        sources = list(self.curves)
+        for row in rows:
+            source = sources[row]
+            self.engine.remove(source)
+            self.pw.removeItem(self.curves.pop(source))
+            self.table.removeRow(row)
+
+    def refresh(self):
+        """ timer callback, plot and table """
+        if self.engine is None:
+            return
+        rows = {source: (times, values) for source, times, values
+                in self.engine.snapshot()}
+        for row, (source, curve) in enumerate(self.curves.items()):
+            times, values = rows.get(source, (np.zeros((0,)),
+                                              np.zeros((0,))))
+            curve.setData(times - self.engine.start_time, values)
+            rate = 0.0
+            if len(times) > 1 and times[-1] > times[0]:
+                recent = times[times > times[-1] - 1]
+                rate = (len(recent) - 1) / max(recent[-1] - recent[0], 1e-9)
+            for column, text in enumerate((source.name,
+                                           str(source.times.total),
+                                           f'{rate:.0f}', str(source.lost),
+                                           source.status)):
+                self.table.setItem(row, column, QTableWidgetItem(text))
+
+    def closeEvent(self, event):
+        """ stop every source """
+        self.timer.stop()
+        if self.engine is not None:
+            self.engine.stop()
+            self.engine = None
+            self.curves.clear()
+            self.pw.clear()
+            self.table.setRowCount(0)
+        event.accept()
@@ -0,0 +1,267 @@
+# -*- coding: utf-8 -*-
+
+"""
+
+ Project     : The poorman's data logger.
+ File        : tools/netprotocol.py
+ Version     : 1.0
+ Description : Framed messages between server.py and the TCP client.
+
+
+ This program is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ This program is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+ Wire format
+ -----------
+ Every message is a frame: payload length (4 bytes, big endian) then the
+ payload. The first payload byte gives the message kind:
+    b'C'  command, utf-8 text (send, stream <period>, close...)
+    b'S'  samples, n * (timestamp, value) little endian doubles
+
+ Frame lengths are below MAX_FRAME so a frame always starts with a null
+ byte: the server tells framed clients from the former text protocol
+ (bare "send" / "close" strings) by the first byte received.
+
+ UDP
+ ---
+ Clients send one command frame per datagram (stream <period> again at
+ least every few seconds to stay subscribed, close). Samples come back in
+ datagrams: 'DU', sequence number (4 bytes, big endian), number of
+ samples (2 bytes, big endian) then the samples as above, at most
+ DATAGRAM_SAMPLES per datagram.
+"""
+
+import struct
+import time
+import numpy as np
+
+LENGTH = struct.Struct('>I')
+MAX_FRAME = 1 << 24
+COMMAND = b'C'
+SAMPLES = b'S'
+SAMPLE_DTYPE = np.dtype([('t', '<f8'), ('v', '<f8')])
+DATAGRAM = struct.Struct('>2sIH')
+DATAGRAM_MAGIC = b'DU'
+# 1032 bytes datagrams, below usual MTUs
+DATAGRAM_SAMPLES = 64
+# datagram numbers wrap at 2 ** 32
+SEQ_WRAP = 1 << 32
+SEQ_HALF = 1 << 31
+
+
+def frame(kind, body=b''):
+    """ frame a payload """
+    if len(body) + 1 > MAX_FRAME:
+        raise ValueError('frame too long')
+    return LENGTH.pack(len(body) + 1) + kind + body
+
+
+def command(text):
+    """ framed command """
+    return frame(COMMAND, text.encode('utf-8'))
+
+
+def samples(times, values):
+    """ framed samples, times and values are sequences of equal length """
+    body = np.empty(len(values), dtype=SAMPLE_DTYPE)
+    body['t'] = times
+    body['v'] = values
+    return frame(SAMPLES, body.tobytes())
+
+
+def split_samples(body):
+    """ (times, values) arrays from a samples payload """
+    body = np.frombuffer(body, dtype=SAMPLE_DTYPE,
+                         count=len(body) // SAMPLE_DTYPE.itemsize)
+    return body['t'], body['v']
+
+
+class FrameReader():
+    """ Reassemble frames from a byte stream
+        Usage : reader = FrameReader()
+                for kind, body in reader.feed(sock.recv(65536)):
+                    ...
+        TCP may split or merge frames anyhow: partial frames are kept
+        until the rest is received. A corrupted length raises ValueError,
+        the stream can't be resynchronized and must be closed.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        """ forget any partial frame """
+        self.buffer = bytearray()
+
+    def feed(self, data):
+        """ add received bytes, return a list of (kind, body) """
+        self.buffer += data
+        messages = []
+        pos = 0
+        end = len(self.buffer)
+        while end - pos >= LENGTH.size:
+            size, = LENGTH.unpack_from(self.buffer, pos)
+            if size == 0 or size > MAX_FRAME:
+                raise ValueError(f'bad frame length {size}')
+            if end - pos - LENGTH.size < size:
+                break
+            start = pos + LENGTH.size
+            messages.append((bytes(self.buffer[start:start + 1]),
+                             bytes(self.buffer[start + 1:start + size])))
+            pos = start + size
+        del self.buffer[:pos]
+        return messages
+
+
+def read_command(datagram):
+    """ command text of a datagram, None if it isn't a command frame """
+    try:
+        messages = FrameReader().feed(datagram)
+    except ValueError:
+        return None
+    if len(messages) != 1 or messages[0][0] != COMMAND:
+        return None
+    return messages[0][1].decode('utf-8', 'replace')
+
+
+def datagrams(seq, times, values):
+    """ list of sample datagrams numbered from seq """
+    result = []
+    for start in range(0, len(values), DATAGRAM_SAMPLES):
+        body = np.empty(min(DATAGRAM_SAMPLES, len(values) - start),
+                        dtype=SAMPLE_DTYPE)
+        body['t'] = times[start:start + len(body)]
+        body['v'] = values[start:start + len(body)]
+        result.append(DATAGRAM.pack(DATAGRAM_MAGIC, (seq + len(result))
+                                    % SEQ_WRAP, len(body))
+                      + body.tobytes())
+    return result
+
+
+def split_datagram(datagram):
+    """ (seq, times, values) of a sample datagram, ValueError if bad """
+    if len(datagram) < DATAGRAM.size:
+        raise ValueError('datagram too short')
+    magic, seq, count = DATAGRAM.unpack_from(datagram)
+    if magic != DATAGRAM_MAGIC or \
+            len(datagram) != DATAGRAM.size + count * SAMPLE_DTYPE.itemsize:
+        raise ValueError('bad datagram')
+    body = np.frombuffer(datagram, dtype=SAMPLE_DTYPE, offset=DATAGRAM.size)
+    return seq, body['t'], body['v']
+
+
+class SequenceTracker():
+    """ Put datagrams back in order, count lost and reordered ones
+        Usage : tracker = SequenceTracker()
+                times, values = tracker.feed(sock.recv(2048))
+                ...
+                times, values = tracker.flush()     # when idle
+        A datagram coming after a gap is held until the missing ones
+        arrive (reordered), or until `window` datagrams are waiting or the
+        oldest waited for `max_delay` seconds: the missing ones are then
+        counted as lost. Datagrams arriving after that are late (dropped).
+        Sequence numbers are compared modulo 2 ** 32 (they wrap). One more
+        than `window` behind starts a new stream (sender restarted):
+        pending datagrams are delivered and the stream goes on from it.
+    """
+
+    def __init__(self, window=8, max_delay=0.05):
+        self.window = window
+        self.max_delay = max_delay
+        self.reset()
+
+    def reset(self):
+        """ forget pending datagrams and counters """
+        self.expected = None
+        self.pending = {}       # seq: (arrival time, times, values)
+        self.received = 0
+        self.lost = 0
+        self.reordered = 0
+        self.late = 0
+        self.duplicates = 0
+        self.errors = 0
+        self.restarts = 0
+
+    def stats(self):
+        return {'received': self.received, 'lost': self.lost,
+                'reordered': self.reordered, 'late': self.late,
+                'duplicates': self.duplicates, 'errors': self.errors,
+                'restarts': self.restarts}
+
+    def feed(self, datagram, now=None):
+        """ add a datagram, return (times, values) now in order """
+        now = time.monotonic() if now is None else now
+        try:
+            seq, times, values = split_datagram(datagram)
+        except ValueError:
+            self.errors += 1
+            return self.flush(now)
+        self.received += 1
+        if self.expected is None:
+            self.expected = seq
+        # distance to the expected one, modulo 2 ** 32
+        seq = self.expected + (seq - self.expected + SEQ_HALF) % SEQ_WRAP \
+            - SEQ_HALF
+        if seq < self.expected - self.window:
+            # the sender started again from another number
+            self.restarts += 1
+            head = self._release(now, force=True)
+            self.expected = seq
+            self.pending[seq] = (now, times, values)
+            tail = self._release(now)
+            return (np.concatenate((head[0], tail[0])),
+                    np.concatenate((head[1], tail[1])))
+        if seq < self.expected:
+            self.late += 1
+        elif seq in self.pending:
+            self.duplicates += 1
+        else:
+            # overtaken by a datagram sent after it
+            if seq < max(self.pending, default=seq):
+                self.reordered += 1
+            self.pending[seq] = (now, times, values)
+        return self.flush(now)
+
+    def resync(self, now=None):
+        """ pending (times, values), the next datagram starts a new
+            stream (subscription sent again), counters are kept
+        """
+        chunk = self._release(time.monotonic() if now is None else now,
+                              force=True)
+        self.expected = None
+        return chunk
+
+    def flush(self, now=None):
+        """ (times, values) deliverable, giving up on old gaps """
+        return self._release(time.monotonic() if now is None else now)
+
+    def _release(self, now, force=False):
+        """ (times, values) in order, every pending one if force """
+        chunks = []
+        while self.pending:
+            if self.expected not in self.pending:
+                oldest = min(arrival for arrival, _, _
+                             in self.pending.values())
+                if not force and len(self.pending) < self.window and \
+                        now - oldest < self.max_delay:
+                    break
+                nxt = min(self.pending)
+                self.lost += nxt - self.expected
+                self.expected = nxt
+            _, times, values = self.pending.pop(self.expected)
+            chunks.append((times, values))
+            self.expected += 1
+        if not chunks:
+            return np.zeros((0,)), np.zeros((0,))
+        return (np.concatenate([chunk[0] for chunk in chunks]),
+                np.concatenate([chunk[1] for chunk in chunks]))
@@ -0,0 +1,251 @@
+# -*- coding: utf-8 -*-
+
+"""
+
+ Project     : The poorman's data logger.
+ File        : tools/pyramid.py
+ Version     : 1.0
+ Description : Level of detail pyramid (min, max, mean of power of two
+               bins) to plot long recordings at any zoom level.
+
+
+ This program is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ This program is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import numpy as np
+from tools.envelope import interleave
+
+# smallest bins hold 2 ** BASE samples: below that, raw samples are
+# cheap enough to scan
+BASE = 8
+
+
+def lod_dtype(channels):
+    """ one bin: min, max and sum of every channel, and whether the min
+        comes before the max
+    """
+    return np.dtype([('min', '<f8', (channels,)), ('max', '<f8', (channels,)),
+                     ('sum', '<f8', (channels,)), ('first', '?', (channels,))])
+
+
+def merge_bins(a, b):
+    """ bins made of a followed by b (record arrays of equal length) """
+    out = np.empty(len(a), dtype=a.dtype)
+    # ties keep the first occurrence, like argmin / argmax
+    min_left = a['min'] <= b['min']
+    max_left = a['max'] >= b['max']
+    out['min'] = np.where(min_left, a['min'], b['min'])
+    out['max'] = np.where(max_left, a['max'], b['max'])
+    out['sum'] = a['sum'] + b['sum']
+    out['first'] = np.where(min_left == max_left,
+                            np.where(min_left, a['first'], b['first']),
+                            min_left)
+    return out
+
+
+def raw_bins(block):
+    """ bins of a (bins, samples, channels) array """
+    bins = np.empty(len(block), dtype=lod_dtype(block.shape[2]))
+    bins['min'] = block.min(axis=1)
+    bins['max'] = block.max(axis=1)
+    bins['sum'] = block.sum(axis=1)
+    bins['first'] = block.argmin(axis=1) <= block.argmax(axis=1)
+    return bins
+
+
+class LodPyramid():
+    """ Min, max and sum of samples by bins of 2 ** k samples, every k
+        from `base` up
+        Usage : pyramid = LodPyramid(channels=1)
+                pyramid.extend(values)      # with every chunk
+                x, y = pyramid.envelope(start, stop, pixels, raw)
+        Bins are aligned on sample numbers (0 is the first sample given)
+        and updated incrementally: a chunk adds bins at the bottom level,
+        completed pairs of bins are merged into the level above. Levels
+        only grow, keeping the whole history at about
+        50 / 2 ** base bytes per sample and channel.
+        envelope() picks the level whose bins are at most one pixel wide
+        and returns min/max points like EnvelopeDecimator, in a time
+        that doesn't depend on the number of samples. raw(lo, hi) gives
+        samples lo..hi of the channel, for the ends of the range that
+        don't fill a bottom level bin.
+    """
+
+    def __init__(self, channels=1, base=BASE):
+        self.channels = channels
+        self.base = base
+        self.dtype = lod_dtype(channels)
+        self.reset()
+
+    def reset(self):
+        """ forget all samples """
+        self.levels = []        # bins of 2 ** (base + i) samples
+        self.counts = []        # complete bins in levels[i]
+        self.pending = np.zeros((0, self.channels))
+        self.total = 0
+
+    def _append(self, index, bins):
+        """ add bins to level index, growing its storage if needed """
+        if index == len(self.levels):
+            self.levels.append(np.empty((max(16, len(bins)),), self.dtype))
+            self.counts.append(0)
+        count = self.counts[index]
+        level = self.levels[index]
+        if count + len(bins) > len(level):
+            grown = np.empty((max(2 * len(level), count + len(bins)),),
+                             self.dtype)
+            grown[:count] = level[:count]
+            self.levels[index] = level = grown
+        level[count:count + len(bins)] = bins
+        self.counts[index] = count + len(bins)
+
+    def extend(self, values):
+        """ add samples, (n, channels) or 1-D for a single channel """
+        values = np.asarray(values, dtype=float).reshape(-1, self.channels)
+        self.total += len(values)
+        values = np.concatenate((self.pending, values))
+        width = 1 << self.base
+        nb = len(values) // width
+        self.pending = values[nb * width:]
+        if not nb:
+            return
+        self._append(0, raw_bins(values[:nb * width].reshape(
+            nb, width, self.channels)))
+        # merge the pairs completed at every level
+        index = 0
+        while True:
+            done = self.counts[index + 1] \
+                if index + 1 < len(self.counts) else 0
+            new = self.counts[index] // 2 - done
+            if new <= 0:
+                break
+            children = self.levels[index][2 * done:2 * (done + new)]
+            self._append(index + 1, merge_bins(children[0::2],
+                                               children[1::2]))
+            index += 1
+
+    def _span(self, lo, hi, raw, channel):
+        """ (min, max, sum, min first) of samples lo..hi, from the
+            biggest bins fitting in, raw samples at the ends
+        """
+        pieces = []
+        width = 1 << self.base
+        head = min(hi, -(-lo // width) * width)
+        if head > lo:
+            pieces.append(raw(lo, head))
+        pos = head
+        while hi - pos >= width:
+            index = 0
+            while index + 1 < len(self.counts):
+                size = width << (index + 1)
+                if pos % size or pos + size > hi:
+                    break
+                index += 1
+            size = width << index
+            pieces.append(self.levels[index][pos // size])
+            pos += size
+        if hi > pos:
+            pieces.append(raw(pos, hi))
+        result = None
+        for piece in pieces:
+            if isinstance(piece, np.ndarray) and piece.dtype != self.dtype:
+                if not len(piece):
+                    continue
+                piece = (piece.min(), piece.max(), piece.sum(),
+                         piece.argmin() <= piece.argmax())
+            else:
+                piece = (piece['min'][channel], piece['max'][channel],
+                         piece['sum'][channel], piece['first'][channel])
+            if result is None:
+                result = piece
+                continue
+            min_left = result[0] <= piece[0]
+            max_left = result[1] >= piece[1]
+            first = (result[3] if min_left else piece[3]) \
+                if min_left == max_left else min_left
+            result = (min(result[0], piece[0]), max(result[1], piece[1]),
+                      result[2] + piece[2], first)
+        return result
+
+    def summary(self, lo, hi, raw, channel=0):
+        """ min, max and mean of samples lo..hi (dictionary) """
+        span = self._span(lo, hi, raw, channel)
+        if span is None:
+            return None
+        return {'count': hi - lo, 'min': span[0], 'max': span[1],
+                'mean': span[2] / (hi - lo)}
+
+    def envelope(self, start, stop, pixels, raw, channel=0):
+        """ (x, y) min/max points of samples start..stop for `pixels`
+            pixels, None if bins would be smaller than the bottom level
+        """
+        stop = min(stop, self.total)
+        width = (stop - start) // max(int(pixels), 1)
+        if width < 1 << self.base or not self.counts:
+            return None
+        index = min(int(width).bit_length() - 1 - self.base,
+                    len(self.counts) - 1)
+        size = 1 << (self.base + index)
+        first = -(-start // size)
+        last = min(stop // size, self.counts[index])
+        bins = self.levels[index][first:last]
+        starts = [(first + np.arange(len(bins))) * size]
+        ends = [starts[0] + size]
+        vmin = [bins['min'][:, channel]]
+        vmax = [bins['max'][:, channel]]
+        min_first = [bins['first'][:, channel]]
+        # partial bins at both ends
+        for lo, hi, at_end in ((start, first * size, False),
+                               (last * size, stop, True)):
+            span = self._span(lo, hi, raw, channel)
+            if span is not None:
+                where = len(starts) if at_end else 0
+                starts.insert(where, [lo])
+                ends.insert(where, [hi])
+                vmin.insert(where, [span[0]])
+                vmax.insert(where, [span[1]])
+                min_first.insert(where, [span[3]])
+        starts, ends, vmin, vmax, min_first = map(
+            np.concatenate, (starts, ends, vmin, vmax, min_first))
+        # points at a quarter and three quarters of every bin
+        quarter = (ends - starts) / 4
+        early, late = starts + quarter, ends - quarter
+        return interleave(np.where(min_first, early, late), vmin,
+                          np.where(min_first, late, early), vmax)
+
+    def tofile(self, file):
+        """ write every complete bin, bottom level first """
+        for level, count in zip(self.levels, self.counts):
+            file.write(level[:count].tobytes())
+
+    @classmethod
+    def fromfile(cls, filename, meta, data):
+        """ pyramid stored in a recording (see tools/lfdfile.py), levels
+            are memory mapped; data are the recorded samples
+        """
+        pyramid = cls(meta.get('channels', 1), meta['lod_base'])
+        pos = meta['lod_offset']
+        count = len(data) >> pyramid.base
+        while count:
+            pyramid.levels.append(np.memmap(filename, dtype=pyramid.dtype,
+                                            mode='r', offset=pos,
+                                            shape=(count,)))
+            pyramid.counts.append(count)
+            pos += count * pyramid.dtype.itemsize
+            count //= 2
+        pyramid.total = len(data)
+        pending = data[(len(data) >> pyramid.base) << pyramid.base:]
+        pyramid.pending = np.array(pending, dtype=float).reshape(
+            -1, pyramid.channels)
+        return pyramid
@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+
+"""
+
+ Project     : The poorman's data logger.
+ File        : tools/recorder.py
+ Version     : 1.0
+ Description : Stream samples to disk from a background thread.
+
+
+ This program is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ This program is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import os
+import queue
+import threading
+import time
+import numpy as np
+from tools.lfdfile import write_header, DTYPE
+from tools.pyramid import LodPyramid
+
+
+class StreamRecorder(threading.Thread):
+    """ Append every sample to a file, without blocking the caller
+        Usage : recorder = StreamRecorder('run.lfd', meta)
+                recorder.start()
+                recorder.write(values)      # from the data slot
+                ...
+                recorder.close()
+        Samples are appended to a v2 .lfd file (see tools/lfdfile.py),
+        without header if meta is None. Chunks wait in a bounded
+        queue: if the disk can't keep up, new chunks are dropped and
+        counted instead of growing memory or stalling the GUI.
+        The file is flushed to disk every `flush_interval` seconds.
+        Other sample types (numpy records...) can be given as dtype;
+        append adds to an existing file instead of replacing it.
+        With lod_base, a level of detail pyramid of the samples is built
+        while recording and stored at the end of the file when it is
+        closed (new files with a header only).
+        A write error ends the thread, error tells which: later samples
+        are counted as dropped.
+    """
+
+    def __init__(self, filename, meta=None, flush_interval=1.0,
+                 max_chunks=4096, dtype=DTYPE, append=False, lod_base=None):
+        super(StreamRecorder, self).__init__(daemon=True)
+        self.filename = filename
+        self.flush_interval = flush_interval
+        self.queue = queue.Queue(maxsize=max_chunks)
+        self.written = 0        # samples on disk
+        self.dropped = 0        # samples lost because the queue was full
+        self.error = None
+        self.stopping = threading.Event()
+        self.dtype = np.dtype(dtype)
+        self.meta = meta
+        self.pyramid = None
+        if lod_base is not None and meta is not None and not append:
+            self.pyramid = LodPyramid(meta.get('channels', 1), lod_base)
+        self.file = open(self.filename, 'ab' if append else 'wb')
+        if meta is not None:
+            try:
+                write_header(self.file, meta, self.dtype)
+            except ValueError:
+                self.file.close()
+                raise
+
+    def write(self, values):
+        """ queue samples for writing, never blocks """
+        values = np.asarray(values, dtype=self.dtype)
+        if self.error is not None:
+            self.dropped += len(values)
+            return
+        try:
+            self.queue.put_nowait(values)
+        except queue.Full:
+            self.dropped += len(values)
+
+    def close(self):
+        """ write pending samples then close file (in the background),
+            never blocks
+        """
+        self.stopping.set()
+        try:
+            # wakes the writer up at once
+            self.queue.put_nowait(None)
+        except queue.Full:
+            pass
+
+    def run(self):
+        """ writer loop """
+        last_flush = time.monotonic()
+        try:
+            while True:
+                try:
+                    values = self.queue.get(timeout=self.flush_interval)
+                except queue.Empty:
+                    if self.stopping.is_set():
+                        break
+                    values = ()
+                if values is None:
+                    break
+                if len(values):
+                    self.file.write(values.tobytes())
+                    self.written += len(values)
+                    if self.pyramid is not None:
+                        self.pyramid.extend(values)
+                if time.monotonic() - last_flush >= self.flush_interval:
+                    self.flush()
+                    last_flush = time.monotonic()
+            if self.pyramid is not None:
+                self.write_pyramid()
+        except OSError as e:
+            self.error = e
+        finally:
+            self.flush()
+            self.file.close()
+
+    def write_pyramid(self):
+        """ append the pyramid, tell where it is in the header """
+        offset = self.file.tell()
+        self.pyramid.tofile(self.file)
+        self.file.seek(0)
+        write_header(self.file, dict(self.meta,
+                                     samples=self.pyramid.total,
+                                     lod_base=self.pyramid.base,
+                                     lod_offset=offset), self.dtype)
+
+    def flush(self):
+        try:
+            self.file.flush()
+            os.fsync(self.file.fileno())
+        except (OSError, ValueError):
+            pass
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+
+"""
+
+ Project     : The poorman's data logger.
+ File        : tools/render.py
+ Version     : 1.0
+ Description : Frame rate limited display refresh.
+
+
+ This program is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ This program is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import time
+from PyQt5.QtCore import QObject, QTimer, pyqtSignal
+
+
+class RenderScheduler(QObject):
+    """ Ask for a display refresh at most `fps` times a second
+        Usage : renderer = RenderScheduler(fps=30)
+                renderer.render.connect(my_redraw)
+                renderer.start()
+                ...
+                renderer.notify(nb_new_samples)   # from the data slot
+        A frame is only requested when new samples arrived since the
+        previous one. Measured frames/s and samples/s are sent every
+        second through the rates signal.
+    """
+
+    render = pyqtSignal()
+    rates = pyqtSignal(float, float)
+
+    def __init__(self, fps=30, parent=None):
+        super(RenderScheduler, self).__init__(parent)
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self._tick)
+        self.dirty = False
+        self.frames = 0
+        self.samples = 0
+        self.fps = 0
+        self.last_report = time.perf_counter()
+        self.set_fps(fps)
+
+    def set_fps(self, fps):
+        """ set maximum refresh rate """
+        self.fps = max(1, int(fps))
+        self.timer.setInterval(int(1000 / self.fps))
+
+    def start(self):
+        self.last_report = time.perf_counter()
+        self.frames = self.samples = 0
+        self.timer.start()
+
+    def stop(self):
+        self.timer.stop()
+
+    def notify(self, nb=1):
+        """ new samples are waiting to be displayed """
+        self.dirty = True
+        self.samples += nb
+
+    def _tick(self):
+        """ timer callback """
+        if self.dirty:
+            self.dirty = False
+            self.frames += 1
+            self.render.emit()
+        now = time.perf_counter()
+        elapsed = now - self.last_report
+        if elapsed >= 1:
+            self.rates.emit(self.frames / elapsed, self.samples / elapsed)
+            self.frames = self.samples = 0
+            self.last_report = now
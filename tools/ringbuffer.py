@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+
+"""
+
+ Project     : The poorman's data logger.
+ File        : tools/ringbuffer.py
+ Version     : 1.0
+ Description : Fixed size sample buffer with O(1) append.
+
+
+ This program is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ This program is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import numpy as np
+
+
+class RingBuffer():
+    """ A ring buffer holding the last `size` samples
+        Usage : buf = RingBuffer(1200)
+                buf.append(value)
+                plot.setData(buf.view())
+
+        Every sample is written twice, at index i and i + size, so the
+        samples ordered from oldest to newest are always available as a
+        contiguous slice of the storage: view() never copies data.
+        The window starts filled with zeros and new samples come in on
+        the right, exactly like the former shift-left array.
+        RingBuffer(1200, channels=4) holds 4 values per sample stored
+        column-wise, one row of the (channels, 2 * size) storage per
+        channel: view()[channel] is contiguous. Samples are given as
+        (n, channels) arrays.
+    """
+
+    def __init__(self, size, dtype=float, channels=None):
+        self.dtype = dtype
+        self.channels = channels
+        self.resize(size, keep=False)
+
+    def __len__(self):
+        return self.size
+
+    def resize(self, size, keep=True):
+        """ change buffer size, keep the newest samples if asked to """
+        size = max(int(size), 1)
+        old = self.valid().T.copy() if keep and hasattr(self, 'storage') \
+            else None
+        self.size = size
+        shape = (2 * size,) if self.channels is None \
+            else (self.channels, 2 * size)
+        self.storage = np.zeros(shape, dtype=self.dtype)
+        self.head = 0           # index of the oldest sample in the window
+        self.count = 0          # number of valid samples (<= size)
+        self.total = 0          # samples appended since last clear
+        # changed whenever samples are replaced: caches of past samples
+        # are stale
+        self.epoch = getattr(self, 'epoch', 0) + 1
+        if old is not None and len(old):
+            self.extend(old)
+
+    def clear(self):
+        """ erase all samples """
+        self.storage[:] = 0
+        self.head = 0
+        self.count = self.total = 0
+        self.epoch += 1
+
+    def _samples(self, values):
+        """ values as stored: 1-D, or (channels, n) for several channels """
+        values = np.asarray(values, dtype=self.dtype)
+        if self.channels is None:
+            return values.ravel()
+        return values.reshape(-1, self.channels).T
+
+    def append(self, value):
+        """ add one sample, overwriting the oldest one """
+        self.storage[..., self.head] = value
+        self.storage[..., self.head + self.size] = value
+        self.head += 1
+        if self.head == self.size:
+            self.head = 0
+        if self.count < self.size:
+            self.count += 1
+        self.total += 1
+
+    def extend(self, values):
+        """ add an array of samples in one go """
+        values = self._samples(values)
+        nb = values.shape[-1]
+        if nb == 0:
+            return
+        self.total += nb
+        self.count = min(self.count + nb, self.size)
+        if nb >= self.size:
+            self.storage[..., :self.size] = values[..., -self.size:]
+            self.storage[..., self.size:] = values[..., -self.size:]
+            self.head = 0
+            return
+        # at most two contiguous pieces: up to the end of the ring,
+        # then from its beginning
+        first = min(nb, self.size - self.head)
+        self.storage[..., self.head:self.head + first] = values[..., :first]
+        self.storage[..., self.head + self.size:
+                     self.head + self.size + first] = values[..., :first]
+        rest = nb - first
+        if rest:
+            self.storage[..., :rest] = values[..., first:]
+            self.storage[..., self.size:self.size + rest] = \
+                values[..., first:]
+        self.head = (self.head + nb) % self.size
+
+    def load(self, values, total=None):
+        """ replace buffer content with values (size is adjusted)
+            total: number of samples up to the last value, when values
+            are the end of a longer recording
+        """
+        values = self._samples(values)
+        if values.shape[-1] != self.size:
+            self.resize(values.shape[-1], keep=False)
+        else:
+            self.clear()
+        self.extend(values.T)
+        if total is not None:
+            self.total = total
+
+    def view(self):
+        """ whole window ordered from oldest to newest (no copy)
+            (channels, size) with several channels
+        """
+        return self.storage[..., self.head:self.head + self.size]
+
+    def valid(self):
+        """ only the samples acquired so far (no copy) """
+        return self.view()[..., self.size - self.count:]
+
+    def last(self):
+        """ newest sample (one value per channel) """
+        return self.storage[..., self.head + self.size - 1]
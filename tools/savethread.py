@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+
+"""
+
+ Project     : The poorman's data logger.
+ File        : tools/savethread.py
+ Version     : 1.0
+ Description : Save a snapshot of the data buffer in the background.
+
+
+ This program is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ This program is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+from PyQt5.QtCore import QThread, pyqtSignal
+from tools.lfdfile import save_v1, save_v2, save_csv
+
+
+class SaveThread(QThread):
+    """ Write .lfd (and optional csv) files from a worker thread
+        Usage : saver = SaveThread()
+                saver.progress.connect(progressbar.setValue)
+                saver.done.connect(my_callback)
+                saver.save(filename, data.copy(), meta)
+        data must not change while saving: pass a snapshot.
+        done sends an error message, empty if everything went fine.
+    """
+
+    progress = pyqtSignal(int)
+    done = pyqtSignal(str)
+
+    def __init__(self, parent=None):
+        super(SaveThread, self).__init__(parent)
+        self.filename = None
+        self.csvname = None
+        self.data = None
+        self.meta = None
+        self.version = 2
+
+    def save(self, filename, data, meta, version=2, csvname=None):
+        """ start saving """
+        self.filename = filename
+        self.data = data
+        self.meta = meta
+        self.version = version
+        self.csvname = csvname
+        self.start()
+
+    def run(self):
+        """ code to execute """
+        steps = 2 if self.csvname else 1
+
+        def step_progress(step):
+            return lambda fraction: self.progress.emit(
+                int(100 * (step + fraction) / steps))
+
+        try:
+            if self.version == 1:
+                save_v1(self.filename, self.data, self.meta,
+                        step_progress(0))
+            else:
+                save_v2(self.filename, self.data, self.meta,
+                        step_progress(0))
+            if self.csvname:
+                save_csv(self.csvname, self.data, step_progress(1))
+        except (OSError, ValueError) as e:
+            self.done.emit(str(e))
+        else:
+            self.done.emit('')
+        finally:
+            # release snapshot
+            self.data = None
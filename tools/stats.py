@@ -24,7 +24,6 @@
 
 import sys
 import numpy as np
-from statistics import fmean, median, pstdev, pvariance, StatisticsError
 from PyQt5.QtCore import pyqtSignal, QLocale, Qt
 from PyQt5.QtWidgets import (QDialog, QDialogButtonBox, QGridLayout, QLabel,
                              QCheckBox, QSpinBox, QPushButton, QComboBox,
@@ -33,9 +32,135 @@ from PyQt5.QtGui import QIcon
 from tools.langtranslate import loadLanguage
 
 
+def compute_stats(data):
+    """ statistics of a numpy array, computed by numpy in bulk
+        returns a dictionary (None if there is no data): count, mean,
+        median, variance and stdev (population), min, max, rms and
+        quartiles (q1, q3)
+    """
+    data = np.asarray(data, dtype=float)
+    count = data.size
+    if count == 0:
+        return None
+    mean = data.sum() / count
+    deviation = data - mean
+    # population variance, same as statistics.pvariance
+    variance = np.dot(deviation, deviation) / count
+    # a single partial sort gives min, max, median and quartiles
+    # (linear interpolation, like statistics.median for even sizes)
+    pos = np.array([0.25, 0.5, 0.75]) * (count - 1)
+    low = np.floor(pos).astype(int)
+    high = np.ceil(pos).astype(int)
+    part = np.partition(data, np.unique(np.concatenate(
+        ([0, count - 1], low, high))))
+    q1, median, q3 = part[low] + (part[high] - part[low]) * (pos - low)
+    return {'count': count, 'mean': mean, 'median': median,
+            'variance': variance, 'stdev': np.sqrt(variance),
+            'min': part[0], 'max': part[-1],
+            'rms': np.sqrt(np.dot(data, data) / count), 'q1': q1, 'q3': q3}
+
+
+class RunningStats():
+    """ Statistics updated chunk by chunk while logging
+        Usage : stats = RunningStats()
+                stats.update(values)        # for every incoming chunk
+                stats.result()              # same keys as compute_stats
+        Mean and variance are merged with Welford's method (Chan's
+        formula for chunks), min, max and rms are exact. Median and
+        quartiles come from a histogram of `bins` bins whose range
+        doubles when needed: they are exact within one bin width.
+    """
+
+    bins = 4096
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        """ forget all samples """
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.sumsq = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+        self.hist = None
+        self.low = 0.0
+        self.width = 1.0
+
+    def update(self, values):
+        """ add a chunk of samples, O(len(values)) """
+        values = np.asarray(values, dtype=float).ravel()
+        values = values[np.isfinite(values)]
+        count = len(values)
+        if count == 0:
+            return
+        mean = values.sum() / count
+        deviation = values - mean
+        m2 = np.dot(deviation, deviation)
+        # merge chunk mean and variance
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean += delta * count / total
+        self.m2 += m2 + delta * delta * self.count * count / total
+        self.count = total
+        self.sumsq += np.dot(values, values)
+        vmin, vmax = values.min(), values.max()
+        self.min = min(self.min, vmin)
+        self.max = max(self.max, vmax)
+        self._add_to_histogram(values, vmin, vmax)
+
+    def _add_to_histogram(self, values, vmin, vmax):
+        if self.hist is None:
+            self.hist = np.zeros((self.bins,))
+            self.low = vmin
+            self.width = (vmax - vmin) / self.bins or \
+                max(abs(vmin), 1.0) * 1e-9
+        # widen range until values fit: bins are merged two by two
+        while vmin < self.low or vmax >= self.low + self.width * self.bins:
+            half = self.bins // 2
+            merged = self.hist.reshape(half, 2).sum(axis=1)
+            self.hist = np.zeros((self.bins,))
+            self.width *= 2
+            if vmin < self.low:
+                self.hist[half:] = merged
+                self.low -= half * self.width
+            else:
+                self.hist[:half] = merged
+        index = ((values - self.low) / self.width).astype(int)
+        np.clip(index, 0, self.bins - 1, out=index)
+        self.hist += np.bincount(index, minlength=self.bins)
+
+    def quantile(self, q):
+        """ approximate q quantile (0 <= q <= 1) """
+        if self.count == 0:
+            return np.nan
+        cumul = np.cumsum(self.hist)
+        target = q * self.count
+        pos = min(int(np.searchsorted(cumul, target)), self.bins - 1)
+        before = cumul[pos - 1] if pos else 0.0
+        fraction = (target - before) / self.hist[pos] if self.hist[pos] \
+            else 0.5
+        value = self.low + (pos + fraction) * self.width
+        return min(max(value, self.min), self.max)
+
+    def result(self):
+        """ dictionary like compute_stats, None if there is no data """
+        if self.count == 0:
+            return None
+        variance = self.m2 / self.count
+        return {'count': self.count, 'mean': self.mean,
+                'median': self.quantile(0.5), 'variance': variance,
+                'stdev': np.sqrt(variance), 'min': self.min,
+                'max': self.max, 'rms': np.sqrt(self.sumsq / self.count),
+                'q1': self.quantile(0.25), 'q3': self.quantile(0.75)}
+
+
 class StatsDialog(QDialog):
     data = np.zeros((1,))
     size = 0
+    # the displayed channel was changed (channel index)
+    channelChanged = pyqtSignal(int)
 
     def __init__(self, parent=None):
         super(StatsDialog, self).__init__()
@@ -49,7 +174,7 @@ class StatsDialog(QDialog):
     def setupUI(self):
         # set window icon
         self.setWindowIcon(QIcon('resources/images/icon.png'))
-        self.setFixedSize(300, 200)
+        self.setFixedSize(300, 330)
 
         # ok and cancel buttons
         self.buttonBox = QDialogButtonBox(QDialogButtonBox.Ok)
@@ -58,6 +183,11 @@ class StatsDialog(QDialog):
         # labels
         self.title_label = QLabel("Data statistics")
         self.title_label.setStyleSheet('color : blue; border: 1px solid back; padding:2px;')
+        # channel selection, hidden for a single channel
+        self.channel_label = QLabel("Channel : ")
+        self.channel_label.setAlignment(Qt.AlignRight)
+        self.channel_box = QComboBox()
+        self.channel_box.currentIndexChanged.connect(self.channelChanged)
         self.mean_label = QLabel("Mean value : ")
         self.mean_label.setStyleSheet('color : #D55; border: 1px solid black;')
         self.mean_label.setAlignment(Qt.AlignRight)
@@ -78,6 +208,21 @@ class StatsDialog(QDialog):
         self.var_val_label.setStyleSheet('color : D55; border: 1px solid black;')
         self.std_var_val_label = QLabel("")
         self.std_var_val_label.setStyleSheet('color : #55D; border: 1px solid black;')
+        self.minmax_label = QLabel("Min / Max : ")
+        self.minmax_label.setStyleSheet('color : #D55; border: 1px solid black;')
+        self.minmax_label.setAlignment(Qt.AlignRight)
+        self.quartiles_label = QLabel("Quartiles : ")
+        self.quartiles_label.setStyleSheet('color : #55D; border: 1px solid black;')
+        self.quartiles_label.setAlignment(Qt.AlignRight)
+        self.rms_label = QLabel("RMS value : ")
+        self.rms_label.setStyleSheet('color : #D55; border: 1px solid black;')
+        self.rms_label.setAlignment(Qt.AlignRight)
+        self.minmax_val_label = QLabel("")
+        self.minmax_val_label.setStyleSheet('color : #D55; border: 1px solid black;')
+        self.quartiles_val_label = QLabel("")
+        self.quartiles_val_label.setStyleSheet('color : #55D; border: 1px solid black;')
+        self.rms_val_label = QLabel("")
+        self.rms_val_label.setStyleSheet('color : #D55; border: 1px solid black;')
 
         # separator
         self.line = QFrame()
@@ -88,28 +233,64 @@ class StatsDialog(QDialog):
         self.grid = QGridLayout()
         self.setLayout(self.grid)
         self.grid.addWidget(self.title_label, 0, 0, 1, 2, Qt.AlignCenter)
-        self.grid.addWidget(self.mean_label, 1, 0)
-        self.grid.addWidget(self.mean_val_label, 1, 1)
-        self.grid.addWidget(self.median_label, 2, 0)
-        self.grid.addWidget(self.median_val_label, 2, 1)
-        self.grid.addWidget(self.variance_label, 3, 0)
-        self.grid.addWidget(self.var_val_label, 3, 1)
-        self.grid.addWidget(self.std_var_label, 4, 0)
-        self.grid.addWidget(self.std_var_val_label, 4, 1)
-        self.grid.addWidget(self.line, 5, 0, 1, 2)
-        self.grid.addWidget(self.buttonBox, 6, 1)
+        self.grid.addWidget(self.channel_label, 1, 0)
+        self.grid.addWidget(self.channel_box, 1, 1)
+        self.grid.addWidget(self.mean_label, 2, 0)
+        self.grid.addWidget(self.mean_val_label, 2, 1)
+        self.grid.addWidget(self.median_label, 3, 0)
+        self.grid.addWidget(self.median_val_label, 3, 1)
+        self.grid.addWidget(self.variance_label, 4, 0)
+        self.grid.addWidget(self.var_val_label, 4, 1)
+        self.grid.addWidget(self.std_var_label, 5, 0)
+        self.grid.addWidget(self.std_var_val_label, 5, 1)
+        self.grid.addWidget(self.minmax_label, 6, 0)
+        self.grid.addWidget(self.minmax_val_label, 6, 1)
+        self.grid.addWidget(self.quartiles_label, 7, 0)
+        self.grid.addWidget(self.quartiles_val_label, 7, 1)
+        self.grid.addWidget(self.rms_label, 8, 0)
+        self.grid.addWidget(self.rms_val_label, 8, 1)
+        self.grid.addWidget(self.line, 9, 0, 1, 2)
+        self.grid.addWidget(self.buttonBox, 10, 1)
+        self.set_channels(1)
+
+    def set_channels(self, channels):
+        """ number of channels to choose from """
+        self.channel_box.blockSignals(True)
+        self.channel_box.clear()
+        self.channel_box.addItems([f'Channel {channel + 1}'
+                                   for channel in range(channels)])
+        self.channel_box.blockSignals(False)
+        self.channel_label.setVisible(channels > 1)
+        self.channel_box.setVisible(channels > 1)
+
+    def channel(self):
+        """ index of the displayed channel """
+        return max(self.channel_box.currentIndex(), 0)
 
     def update(self, data):
         self.data = data
-        try:
-            meanval = fmean(self.data)
-            caption = f"{meanval:.3f}"
-            self.mean_val_label.setText(caption)
-            caption = f"{median(self.data):.3f}"
-            self.median_val_label.setText(caption)
-            caption = f"{pvariance(self.data, mu=meanval):.3f}"
-            self.var_val_label.setText(caption)
-            caption = f"{pstdev(self.data, mu=meanval):.3f}"
-            self.std_var_val_label.setText(caption)
-        except StatisticsError:
-            pass
+        stats = compute_stats(self.data)
+        if stats is None:
+            return
+        self.show_stats(stats)
+
+    def set_live(self, live):
+        """ tell if displayed values are updated while logging """
+        if live:
+            self.title_label.setText("Data statistics (live)")
+        else:
+            self.title_label.setText("Data statistics")
+
+    def show_stats(self, stats):
+        """ display a dictionary returned by compute_stats """
+        if stats is None:
+            return
+        self.mean_val_label.setText(f"{stats['mean']:.3f}")
+        self.median_val_label.setText(f"{stats['median']:.3f}")
+        self.var_val_label.setText(f"{stats['variance']:.3f}")
+        self.std_var_val_label.setText(f"{stats['stdev']:.3f}")
+        self.minmax_val_label.setText(
+            f"{stats['min']:.3f} / {stats['max']:.3f}")
+        self.quartiles_val_label.setText(
+            f"{stats['q1']:.3f} / {stats['q3']:.3f}")
+        self.rms_val_label.setText(f"{stats['rms']:.3f}")
@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+
+"""
+
+ Project     : The poorman's data logger.
+ File        : tools/timing.py
+ Version     : 1.0
+ Description : Drift free periodic timer for polling loops.
+
+
+ This program is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ This program is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import math
+import threading
+import time
+import numpy as np
+
+
+class DeadlineTimer():
+    """ A periodic timer on an absolute monotonic timeline
+        Usage : timer = DeadlineTimer(period)
+                timer.start()
+                while timer.wait():     # sleeps until next deadline
+                    do_something()
+                ...
+                timer.cancel()          # from another thread
+        Deadlines are start + n * period, so the time spent working
+        between two calls doesn't shift the next ones. When late by one
+        period or more, the missed deadlines are skipped and counted as
+        overruns. The thread sleeps (no busy loop) and cancel() wakes it
+        up at once.
+    """
+
+    def __init__(self, period=0.1):
+        if not period > 0:
+            raise ValueError(f'timer period must be positive, not {period}')
+        self.period = period
+        self.cancelled = threading.Event()
+        self.start()
+
+    def set_period(self, period):
+        """ new period, applied from now on """
+        if not period > 0:
+            raise ValueError(f'timer period must be positive, not {period}')
+        self.period = period
+        self.start_time = time.monotonic() - self.tick * self.period
+
+    def start(self):
+        """ start timeline and statistics """
+        self.cancelled.clear()
+        self.start_time = time.monotonic()
+        self.tick = 0
+        self.overruns = 0
+        self.late_count = 0
+        self.late_sum = 0.0
+        self.late_sumsq = 0.0
+        self.late_max = 0.0
+        self.cpu_start = time.thread_time()
+        self.wall_start = time.perf_counter()
+
+    def cancel(self):
+        """ wake up a waiting thread, wait() returns False """
+        self.cancelled.set()
+
+    def wait(self):
+        """ sleep until next deadline, False if cancelled """
+        self.tick += 1
+        deadline = self.start_time + self.tick * self.period
+        now = time.monotonic()
+        if now - deadline >= self.period:
+            missed = math.floor((now - deadline) / self.period)
+            self.tick += missed
+            self.overruns += missed
+            deadline += missed * self.period
+        if self.cancelled.wait(max(0.0, deadline - now)):
+            return False
+        late = max(0.0, time.monotonic() - deadline)
+        self.late_count += 1
+        self.late_sum += late
+        self.late_sumsq += late * late
+        self.late_max = max(self.late_max, late)
+        return True
+
+    def stats(self):
+        """ jitter (seconds past deadlines), overruns and cpu load of the
+            calling thread since start
+        """
+        count = max(self.late_count, 1)
+        mean = self.late_sum / count
+        wall = time.perf_counter() - self.wall_start
+        return {'period': self.period, 'ticks': self.late_count,
+                'jitter_mean': mean,
+                'jitter_std': math.sqrt(max(0.0, self.late_sumsq / count
+                                            - mean * mean)),
+                'jitter_max': self.late_max, 'overruns': self.overruns,
+                'cpu': (time.thread_time() - self.cpu_start) / wall
+                if wall > 0 else 0.0}
+
+
+class ArrivalClock():
+    """ Timestamps for samples sent without (Arduino sketch)
+        Usage : clock = ArrivalClock(period)
+                times = clock.stamp(len(values))    # when values arrive
+        A chunk gets timestamps one period apart ending at its arrival
+        time, closer if needed so that they keep increasing.
+    """
+
+    def __init__(self, period):
+        self.period = period
+        self.last_time = None
+
+    def stamp(self, nb, now=None):
+        """ wall clock timestamps of nb samples received now """
+        now = time.time() if now is None else now
+        step = self.period
+        if self.last_time is not None and nb:
+            step = min(step, (now - self.last_time) / nb)
+        self.last_time = now
+        return now - np.arange(nb - 1, -1, -1) * step